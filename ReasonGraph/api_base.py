@@ -1,10 +1,17 @@
 from abc import ABC, abstractmethod
 import logging
 import requests
-from openai import OpenAI
-from typing import Optional, Dict, Any, List
+import importlib
+import threading
+from typing import Optional, Dict, Any, List, Iterator, Callable, Union
+import json
 from dataclasses import dataclass
 import os
+from http_pool import HTTPPool, get_http_pool
+from client_cache import ClientCache, ClientLease
+from rate_limit import get_rate_limiter
+from retry import call_with_retry, get_latency_tracker, get_retry_policy
+from deadline import DeadlineExceeded, clip_timeout, expired
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,20 +35,46 @@ class APIError(Exception):
         self.status_code = status_code
         super().__init__(f"{provider} API Error: {message} (Status: {status_code})")
 
+def iter_sse_data(response: requests.Response) -> Iterator[str]:
+    """Yield the data payloads of a server-sent events response"""
+    # SSE is always UTF-8, but requests assumes ISO-8859-1 for text/* without a charset
+    response.encoding = "utf-8"
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield line[5:].strip()
+
+def openai_client(**kwargs):
+    """Create an OpenAI SDK client; the SDK is only imported on first use, as it is slow to import"""
+    from openai import OpenAI
+    return OpenAI(**kwargs)
+
 class BaseAPI(ABC):
     """Abstract base class for API interactions"""
+
+    # Whether the client's request methods take a per-call timeout= keyword (OpenAI SDK)
+    sdk_timeout = False
     
-    def __init__(self, api_key: str, model: str):
+    def __init__(self, api_key: str, model: str, http_pool: Optional[HTTPPool] = None):
         self.api_key = api_key
         self.model = model
         self.provider_name = "base"  # Override in subclasses
+        # Key of the provider in APIFactory, set when it builds the instance; rate limits
+        # are configured by it, as several providers may share an API class and provider_name
+        self.provider: Optional[str] = None
+        self.http = http_pool or get_http_pool()  # Shared keep-alive transport
         
     @abstractmethod
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the API"""
         pass
 
+    @staticmethod
+    def _sampling_params(temperature: Optional[float]) -> Dict[str, float]:
+        """Extra request parameters for a sampling temperature (provider default when None)"""
+        return {} if temperature is None else {"temperature": temperature}
+
     def _format_prompt(self, question: str, prompt_format: Optional[str] = None) -> str:
         """Format the prompt using custom format if provided"""
         if prompt_format:
@@ -73,8 +106,76 @@ Note:
 3. The final answer must be wrapped in <answer> tags
 """
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream the response text in chunks (providers without streaming yield it whole)"""
+        yield self.generate_response(prompt, max_tokens, prompt_format)
+
+    def _stream_chat_completions(self, formatted_prompt: str, max_tokens: int) -> Iterator[str]:
+        """Stream text deltas from an OpenAI-style chat completions client"""
+        stream = self._call_stream(self.client.chat.completions.create,
+            model=self.model,
+            messages=[{"role": "user", "content": formatted_prompt}],
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _call(self, request: Callable[..., Any], *args, **kwargs) -> Any:
+        """Issue a provider request through the rate limiter, retrying transient failures (hedged if enabled)"""
+        return self._call_with_retry(request, args, kwargs, hedge=True)
+
+    def _call_stream(self, request: Callable[..., Any], *args, **kwargs) -> Any:
+        """Like _call for requests opening a stream, which are never hedged"""
+        return self._call_with_retry(request, args, kwargs, hedge=False)
+
+    @property
+    def limit_key(self) -> str:
+        """Provider name the rate limiter and latency tracker of this instance are keyed by"""
+        return self.provider or self.provider_name
+
+    def _call_with_retry(self, request: Callable[..., Any], args: tuple, kwargs: dict, hedge: bool) -> Any:
+        limiter = get_rate_limiter(self.limit_key, self.model)
+        tracker = get_latency_tracker(self.limit_key, self.model) if hedge else None
+        if self.sdk_timeout:
+            request = self._with_timeout(request)
+        if tracker is not None:
+            # Latency of the provider call itself, excluding time queued in the limiter
+            request = tracker.timed(request)
+        return call_with_retry(
+            lambda: limiter.call(request, *args, **kwargs),
+            get_retry_policy(),
+            tracker=tracker,
+            hedge=hedge,
+            name=self.provider_name
+        )
+
+    def _request_timeout(self) -> float:
+        """Read timeout of the next provider call, bounded by the request deadline"""
+        return clip_timeout(self.http.config.read_timeout)
+
+    def _with_timeout(self, request: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap an SDK request to pass each call its own timeout"""
+        def request_with_timeout(*args, **kwargs):
+            return request(*args, timeout=self._request_timeout(), **kwargs)
+        return request_with_timeout
+
+    def close(self) -> None:
+        """Release the SDK client, if any (the shared HTTP pool is left open)"""
+        client = getattr(self, "client", None)
+        close = getattr(client, "close", None)
+        if callable(close):
+            close()
+
     def _handle_error(self, error: Exception, context: str = "") -> None:
         """Standardized error handling"""
+        if isinstance(error, DeadlineExceeded):
+            raise error
+        if expired():
+            # The provider call was cut short by the request deadline
+            raise DeadlineExceeded() from error
         error_msg = f"{self.provider_name} API error in {context}: {str(error)}"
         logger.error(error_msg)
         raise APIError(str(error), self.provider_name)
@@ -82,8 +183,9 @@ Note:
 class AnthropicAPI(BaseAPI):
     """Class to handle interactions with the Anthropic API"""
     
-    def __init__(self, api_key: str, model: str = "claude-3-opus-20240229"):
-        super().__init__(api_key, model)
+    def __init__(self, api_key: str, model: str = "claude-3-opus-20240229",
+                 http_pool: Optional[HTTPPool] = None):
+        super().__init__(api_key, model, http_pool)
         self.provider_name = "Anthropic"
         self.base_url = "https://api.anthropic.com/v1/messages"
         self.headers = {
@@ -93,18 +195,20 @@ class AnthropicAPI(BaseAPI):
         }
 
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the Anthropic API"""
         try:
             formatted_prompt = self._format_prompt(prompt, prompt_format)
             data = {
                 "model": self.model,
                 "messages": [{"role": "user", "content": formatted_prompt}],
-                "max_tokens": max_tokens
+                "max_tokens": max_tokens,
+                **self._sampling_params(temperature)
             }
             
             logger.info(f"Sending request to Anthropic API with model {self.model}")
-            response = requests.post(self.base_url, headers=self.headers, json=data)
+            response = self._call(self.http.post, self.base_url, headers=self.headers, json=data)
             response.raise_for_status()
             
             response_data = response.json()
@@ -117,28 +221,60 @@ class AnthropicAPI(BaseAPI):
         except Exception as e:
             self._handle_error(e, "unexpected")
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream a response from the Anthropic API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            data = {
+                "model": self.model,
+                "messages": [{"role": "user", "content": formatted_prompt}],
+                "max_tokens": max_tokens,
+                "stream": True
+            }
+            
+            logger.info(f"Streaming request to Anthropic API with model {self.model}")
+            response = self._call_stream(self.http.post, self.base_url, headers=self.headers, json=data, stream=True)
+            with response:
+                response.raise_for_status()
+                for payload in iter_sse_data(response):
+                    event = json.loads(payload)
+                    if event.get("type") == "content_block_delta":
+                        text = event["delta"].get("text")
+                        if text:
+                            yield text
+            
+        except requests.exceptions.RequestException as e:
+            self._handle_error(e, "streaming request")
+        except (KeyError, ValueError) as e:
+            self._handle_error(e, "stream parsing")
+
 class OpenAIAPI(BaseAPI):
     """Class to handle interactions with the OpenAI API"""
+    sdk_timeout = True
     
-    def __init__(self, api_key: str, model: str = "gpt-4-turbo-preview"):
-        super().__init__(api_key, model)
+    def __init__(self, api_key: str, model: str = "gpt-4-turbo-preview",
+                 http_pool: Optional[HTTPPool] = None):
+        super().__init__(api_key, model, http_pool)
         self.provider_name = "OpenAI"
         try:
-            self.client = OpenAI(api_key=api_key)
+            self.client = openai_client(api_key=api_key)
         except Exception as e:
             self._handle_error(e, "initialization")
 
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the OpenAI API"""
         try:
             formatted_prompt = self._format_prompt(prompt, prompt_format)
             
             logger.info(f"Sending request to OpenAI API with model {self.model}")
-            response = self.client.chat.completions.create(
+            response = self._call(self.client.chat.completions.create,
                 model=self.model,
                 messages=[{"role": "user", "content": formatted_prompt}],
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                **self._sampling_params(temperature)
             )
             
             return response.choices[0].message.content
@@ -146,11 +282,24 @@ class OpenAIAPI(BaseAPI):
         except Exception as e:
             self._handle_error(e, "request or response processing")
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream a response from the OpenAI API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            
+            logger.info(f"Streaming request to OpenAI API with model {self.model}")
+            yield from self._stream_chat_completions(formatted_prompt, max_tokens)
+            
+        except Exception as e:
+            self._handle_error(e, "streaming")
+
 class GeminiAPI(BaseAPI):
     """Class to handle interactions with the Google Gemini API"""
     
-    def __init__(self, api_key: str, model: str = "gemini-2.0-flash"):
-        super().__init__(api_key, model)
+    def __init__(self, api_key: str, model: str = "gemini-2.0-flash",
+                 http_pool: Optional[HTTPPool] = None):
+        super().__init__(api_key, model, http_pool)
         self.provider_name = "Gemini"
         try:
             from google import genai
@@ -159,19 +308,21 @@ class GeminiAPI(BaseAPI):
             self._handle_error(e, "initialization")
 
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the Gemini API"""
         try:
             from google.genai import types
             formatted_prompt = self._format_prompt(prompt, prompt_format)
             
             logger.info(f"Sending request to Gemini API with model {self.model}")
-            response = self.client.models.generate_content(
+            response = self._call(self.client.models.generate_content,
                 model=self.model,
                 contents=[formatted_prompt],
                 config=types.GenerateContentConfig(
                     max_output_tokens=max_tokens,
-                    temperature=0.7
+                    temperature=0.7 if temperature is None else temperature,
+                    http_options=types.HttpOptions(timeout=int(self._request_timeout() * 1000))
                 )
             )
             
@@ -183,29 +334,56 @@ class GeminiAPI(BaseAPI):
         except Exception as e:
             self._handle_error(e, "request or response processing")
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream a response from the Gemini API"""
+        try:
+            from google.genai import types
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            
+            logger.info(f"Streaming request to Gemini API with model {self.model}")
+            for chunk in self._call_stream(self.client.models.generate_content_stream,
+                model=self.model,
+                contents=[formatted_prompt],
+                config=types.GenerateContentConfig(
+                    max_output_tokens=max_tokens,
+                    temperature=0.7,
+                    http_options=types.HttpOptions(timeout=int(self._request_timeout() * 1000))
+                )
+            ):
+                if chunk.text:
+                    yield chunk.text
+            
+        except Exception as e:
+            self._handle_error(e, "streaming")
+
 class TogetherAPI(BaseAPI):
     """Class to handle interactions with the Together AI API"""
     
-    def __init__(self, api_key: str, model: str = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"):
-        super().__init__(api_key, model)
+    def __init__(self, api_key: str, model: str = "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo",
+                 http_pool: Optional[HTTPPool] = None):
+        super().__init__(api_key, model, http_pool)
         self.provider_name = "Together"
         try:
             from together import Together
-            self.client = Together(api_key=api_key)
+            # The SDK has no per-call timeout, so bound every call by the read timeout
+            self.client = Together(api_key=api_key, timeout=self.http.config.read_timeout)
         except Exception as e:
             self._handle_error(e, "initialization")
 
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the Together AI API"""
         try:
             formatted_prompt = self._format_prompt(prompt, prompt_format)
             
             logger.info(f"Sending request to Together AI API with model {self.model}")
-            response = self.client.chat.completions.create(
+            response = self._call(self.client.chat.completions.create,
                 model=self.model,
                 messages=[{"role": "user", "content": formatted_prompt}],
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                **self._sampling_params(temperature)
             )
             
             # Robust response extraction
@@ -220,30 +398,46 @@ class TogetherAPI(BaseAPI):
         except Exception as e:
             self._handle_error(e, "request or response processing")
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream a response from the Together AI API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            
+            logger.info(f"Streaming request to Together AI API with model {self.model}")
+            yield from self._stream_chat_completions(formatted_prompt, max_tokens)
+            
+        except Exception as e:
+            self._handle_error(e, "streaming")
+
 class DeepSeekAPI(BaseAPI):
     """Class to handle interactions with the DeepSeek API"""
+    sdk_timeout = True
     
-    def __init__(self, api_key: str, model: str = "deepseek-chat"):
-        super().__init__(api_key, model)
+    def __init__(self, api_key: str, model: str = "deepseek-chat",
+                 http_pool: Optional[HTTPPool] = None):
+        super().__init__(api_key, model, http_pool)
         self.provider_name = "DeepSeek"
         try:
-            self.client = OpenAI(api_key=api_key, base_url="https://api.deepseek.com")
+            self.client = openai_client(api_key=api_key, base_url="https://api.deepseek.com")
         except Exception as e:
             self._handle_error(e, "initialization")
 
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the DeepSeek API"""
         try:
             formatted_prompt = self._format_prompt(prompt, prompt_format)
             
             logger.info(f"Sending request to DeepSeek API with model {self.model}")
-            response = self.client.chat.completions.create(
+            response = self._call(self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {"role": "user", "content": formatted_prompt}
                 ],
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                **self._sampling_params(temperature)
             )
             
             return response.choices[0].message.content
@@ -251,14 +445,28 @@ class DeepSeekAPI(BaseAPI):
         except Exception as e:
             self._handle_error(e, "request or response processing")
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream a response from the DeepSeek API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            
+            logger.info(f"Streaming request to DeepSeek API with model {self.model}")
+            yield from self._stream_chat_completions(formatted_prompt, max_tokens)
+            
+        except Exception as e:
+            self._handle_error(e, "streaming")
+
 class QwenAPI(BaseAPI):
     """Class to handle interactions with the Qwen API"""
+    sdk_timeout = True
     
-    def __init__(self, api_key: str, model: str = "qwen-plus"):
-        super().__init__(api_key, model)
+    def __init__(self, api_key: str, model: str = "qwen-plus",
+                 http_pool: Optional[HTTPPool] = None):
+        super().__init__(api_key, model, http_pool)
         self.provider_name = "Qwen"
         try:
-            self.client = OpenAI(
+            self.client = openai_client(
                 api_key=api_key,
                 base_url="https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
             )
@@ -266,18 +474,20 @@ class QwenAPI(BaseAPI):
             self._handle_error(e, "initialization")
 
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the Qwen API"""
         try:
             formatted_prompt = self._format_prompt(prompt, prompt_format)
             
             logger.info(f"Sending request to Qwen API with model {self.model}")
-            response = self.client.chat.completions.create(
+            response = self._call(self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {"role": "user", "content": formatted_prompt}
                 ],
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                **self._sampling_params(temperature)
             )
             
             return response.choices[0].message.content
@@ -285,14 +495,28 @@ class QwenAPI(BaseAPI):
         except Exception as e:
             self._handle_error(e, "request or response processing")
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream a response from the Qwen API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            
+            logger.info(f"Streaming request to Qwen API with model {self.model}")
+            yield from self._stream_chat_completions(formatted_prompt, max_tokens)
+            
+        except Exception as e:
+            self._handle_error(e, "streaming")
+
 class GrokAPI(BaseAPI):
     """Class to handle interactions with the Grok API"""
+    sdk_timeout = True
     
-    def __init__(self, api_key: str, model: str = "grok-2-latest"):
-        super().__init__(api_key, model)
+    def __init__(self, api_key: str, model: str = "grok-2-latest",
+                 http_pool: Optional[HTTPPool] = None):
+        super().__init__(api_key, model, http_pool)
         self.provider_name = "Grok"
         try:
-            self.client = OpenAI(
+            self.client = openai_client(
                 api_key=api_key,
                 base_url="https://api.x.ai/v1"
             )
@@ -300,18 +524,20 @@ class GrokAPI(BaseAPI):
             self._handle_error(e, "initialization")
 
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the Grok API"""
         try:
             formatted_prompt = self._format_prompt(prompt, prompt_format)
             
             logger.info(f"Sending request to Grok API with model {self.model}")
-            response = self.client.chat.completions.create(
+            response = self._call(self.client.chat.completions.create,
                 model=self.model,
                 messages=[
                     {"role": "user", "content": formatted_prompt}
                 ],
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                **self._sampling_params(temperature)
             )
             
             return response.choices[0].message.content
@@ -319,11 +545,24 @@ class GrokAPI(BaseAPI):
         except Exception as e:
             self._handle_error(e, "request or response processing")
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream a response from the Grok API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            
+            logger.info(f"Streaming request to Grok API with model {self.model}")
+            yield from self._stream_chat_completions(formatted_prompt, max_tokens)
+            
+        except Exception as e:
+            self._handle_error(e, "streaming")
+
 class TyAPI(BaseAPI):
     """Class to handle interactions with the Qwen API"""
     
-    def __init__(self, api_key: str, model: str = "qwen-plus"):
-        super().__init__(api_key, model)
+    def __init__(self, api_key: str, model: str = "qwen-plus",
+                 http_pool: Optional[HTTPPool] = None):
+        super().__init__(api_key, model, http_pool)
         try:
             self.provider_name = "DashScope"
             print( os.getenv('DASHSCOPE_API_KEY'))
@@ -336,7 +575,8 @@ class TyAPI(BaseAPI):
             self._handle_error(e, "initialization")
 
     def generate_response(self, prompt: str, max_tokens: int = 1024, 
-                         prompt_format: Optional[str] = None) -> str:
+                         prompt_format: Optional[str] = None,
+                         temperature: Optional[float] = None) -> str:
         """Generate a response using the Qwen API"""
         try:
             formatted_prompt = self._format_prompt(prompt, prompt_format)
@@ -344,12 +584,13 @@ class TyAPI(BaseAPI):
                 "model": self.model,
                 "messages": [{"role": "user", "content": formatted_prompt}],
                 # "max_tokens": max_tokens
+                **self._sampling_params(temperature)
             }
 
             
             logger.info(f"Sending request to API with model {self.model}")
             print(self.base_url, self.headers,data)
-            response = requests.post(self.base_url, headers=self.headers, json=data)
+            response = self._call(self.http.post, self.base_url, headers=self.headers, json=data)
             response.raise_for_status()
             response_data = response.json()
             logger.info(f"Received response from Anthropic API: {response_data}")
@@ -359,60 +600,163 @@ class TyAPI(BaseAPI):
         except Exception as e:
             self._handle_error(e, "request or response processing")
 
+    def stream_response(self, prompt: str, max_tokens: int = 1024,
+                        prompt_format: Optional[str] = None) -> Iterator[str]:
+        """Stream a response from the DashScope API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            data = {
+                "model": self.model,
+                "messages": [{"role": "user", "content": formatted_prompt}],
+                "stream": True
+            }
+            
+            logger.info(f"Streaming request to API with model {self.model}")
+            response = self._call_stream(self.http.post, self.base_url, headers=self.headers, json=data, stream=True)
+            with response:
+                response.raise_for_status()
+                for payload in iter_sse_data(response):
+                    if payload == "[DONE]":
+                        break
+                    chunk = json.loads(payload)
+                    if chunk.get("choices"):
+                        text = chunk["choices"][0]["delta"].get("content")
+                        if text:
+                            yield text
+            
+        except Exception as e:
+            self._handle_error(e, "streaming")
+
 
 class APIFactory:
     """Factory class for creating API instances"""
     
+    _client_cache = ClientCache(maxsize=64, ttl=900.0)
+    
+    # "class" is an API class, or "module:ClassName" to import it on first use (see register_provider);
+    # the built-ins are references too, and become classes once resolved
     _providers = {
         "anthropic": {
-            "class": TyAPI,
+            "class": "api_base:TyAPI",
             "default_model": "claude-3-7-sonnet-20250219"
         },
         "openai": {
-            "class": TyAPI,
+            "class": "api_base:TyAPI",
             "default_model": "gpt-4-turbo-preview"
         },
         "google": {
-            "class": TyAPI,
+            "class": "api_base:TyAPI",
             "default_model": "gemini-2.0-flash"
         },
         "together": {
-            "class": TyAPI,
+            "class": "api_base:TyAPI",
             "default_model": "meta-llama/Meta-Llama-3.1-405B-Instruct-Turbo"
         },
         "deepseek": {
-            "class": TyAPI,
+            "class": "api_base:TyAPI",
             "default_model": "deepseek-chat"
         },
         "qwen": {
-            "class": TyAPI,
+            "class": "api_base:TyAPI",
             "default_model": "qwen-plus"
         },
         "grok": {
-            "class": TyAPI,
+            "class": "api_base:TyAPI",
             "default_model": "grok-2-latest"
         }
     }
     
+    _providers_lock = threading.Lock()
+    
+    @classmethod
+    def register_provider(cls, provider: str, api_class: Union[type, str], default_model: str) -> None:
+        """
+        Add or replace a provider.
+        
+        api_class may be a "module:ClassName" reference, imported when the provider
+        is first used, so that providers (and their SDKs) cost nothing at startup.
+        """
+        with cls._providers_lock:
+            cls._providers[provider.lower()] = {"class": api_class, "default_model": default_model}
+    
+    @classmethod
+    def _load_class(cls, provider: str) -> type:
+        """Get the API class of a provider, importing it on first use"""
+        provider_info = cls._providers[provider]
+        api_class = provider_info["class"]
+        if isinstance(api_class, str):
+            module_name, _, class_name = api_class.partition(":")
+            try:
+                api_class = getattr(importlib.import_module(module_name), class_name)
+            except (ImportError, AttributeError) as e:
+                raise APIError(f"Cannot load {api_class}: {str(e)}", provider)
+            with cls._providers_lock:
+                provider_info["class"] = api_class
+        return api_class
+    
     @classmethod
     def supported_providers(cls) -> List[str]:
         """Get list of supported providers"""
         return list(cls._providers.keys())
     
     @classmethod
-    def create_api(cls, provider: str, api_key: str, model: Optional[str] = None) -> BaseAPI:
-        """Factory method to create appropriate API instance"""
+    def http_pool(cls) -> HTTPPool:
+        """Get the connection pool shared by all API instances"""
+        return get_http_pool()
+    
+    @classmethod
+    def _resolve(cls, provider: str, model: Optional[str]):
+        """Validate provider and get its API class and effective model"""
         provider = provider.lower()
         if provider not in cls._providers:
             raise ValueError(f"Unsupported provider: {provider}. "
                            f"Supported providers are: {', '.join(cls.supported_providers())}")
         
         provider_info = cls._providers[provider]
-        api_class = provider_info["class"]
-        model = model or provider_info["default_model"]
-        
+        return provider, cls._load_class(provider), model or provider_info["default_model"]
+    
+    @classmethod
+    def _build(cls, provider: str, api_class: type, api_key: str, model: str) -> BaseAPI:
         logger.info(f"Creating API instance for provider: {provider}, model: {model}")
-        return api_class(api_key=api_key, model=model)
+        api = api_class(api_key=api_key, model=model, http_pool=cls.http_pool())
+        api.provider = provider
+        return api
+    
+    @classmethod
+    def create_api(cls, provider: str, api_key: str, model: Optional[str] = None) -> BaseAPI:
+        """
+        Factory method to create a new, uncached API instance owned by the caller.
+
+        Cached instances are only handed out through lease_api(), as an unleased
+        one could be closed by an eviction while it is still in use.
+        """
+        provider, api_class, model = cls._resolve(provider, model)
+        return cls._build(provider, api_class, api_key, model)
+    
+    @classmethod
+    def lease_api(cls, provider: str, api_key: str, model: Optional[str] = None) -> ClientLease:
+        """Get a cached API instance that will not be closed by eviction until the lease ends"""
+        provider, api_class, model = cls._resolve(provider, model)
+        return cls._client_cache.lease(
+            ClientCache.make_key(provider, model, api_key),
+            lambda: cls._build(provider, api_class, api_key, model)
+        )
+    
+    @classmethod
+    def evict_client(cls, provider: str, api_key: str, model: Optional[str] = None) -> bool:
+        """Explicitly evict (and close) a cached API instance"""
+        provider, _, model = cls._resolve(provider, model)
+        return cls._client_cache.evict(ClientCache.make_key(provider, model, api_key))
+    
+    @classmethod
+    def clear_clients(cls) -> None:
+        """Evict (and close) every cached API instance"""
+        cls._client_cache.clear()
+    
+    @classmethod
+    def client_cache_stats(cls) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters of the client cache"""
+        return cls._client_cache.stats()
 
 # def create_api(provider: str, api_key: str, model: Optional[str] = None) -> BaseAPI:
 #     """Convenience function to create API instance"""
@@ -422,6 +766,10 @@ def create_api(provider: str, api_key: str, model: Optional[str] = None) -> Base
     """Convenience function to create API instance"""
     return APIFactory.create_api(provider, api_key, model)
 
+def lease_api(provider: str, api_key: str, model: Optional[str] = None) -> ClientLease:
+    """Convenience function to lease a cached API instance"""
+    return APIFactory.lease_api(provider, api_key, model)
+
 
 # Example usage:
 if __name__ == "__main__":
@@ -1,32 +1,35 @@
-from flask import Flask, render_template, request, jsonify
-from api_base import create_api  # New import for API factory
-from cot_reasoning import (
-    VisualizationConfig,
-    create_mermaid_diagram as create_cot_diagram,
-    parse_cot_response
-)
-from tot_reasoning import (
-    create_mermaid_diagram as create_tot_diagram,
-    parse_tot_response
-)
-from l2m_reasoning import (
-    create_mermaid_diagram as create_l2m_diagram,
-    parse_l2m_response
-)
-from selfconsistency_reasoning import (
-    create_mermaid_diagram as create_scr_diagram,
-    parse_scr_response
-)
-from selfrefine_reasoning import (
-    create_mermaid_diagram as create_srf_diagram,
-    parse_selfrefine_response
-)
-from bs_reasoning import (
-    create_mermaid_diagram as create_bs_diagram,
-    parse_bs_response
-)
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+from api_base import APIFactory, lease_api  # New import for API factory
+from client_cache import key_fingerprint
+from http_pool import get_http_pool
+from rate_limit import rate_limit_stats
+from retry import retry_stats
+from deadline import DeadlineExceeded, cancel_scope, check_deadline, deadline_scope, request_timeout
+from response_cache import ResponseCache, get_response_cache
+from tag_parser import TagTokenizer, ElementEvent
+from cot_reasoning import VisualizationConfig
+from selfconsistency_reasoning import generate_parallel_paths
+from method_selector import MethodSelection, select_method_locally
+from selection_cache import get_selection_cache
+from reasoning_methods import REASONING_METHODS
+from batch import BatchSettings, MAX_SERVER_CONCURRENCY, MAX_SERVER_QUESTIONS, MAX_SERVER_RETRIES, run_batch
+from tree_search import TreeSearchEngine, serialize_tree
 from configs import config
+from config_payloads import JSONPayload, get_config_payloads
+from config_watcher import get_config_watcher, watch_config
+from svg_renderer import get_svg_renderer
+from static_assets import IMMUTABLE_CACHE_CONTROL, Asset, get_asset_pipeline
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import contextlib
+import contextvars
+import dataclasses
+import json
 import logging
+import re
+import threading
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -38,32 +41,624 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 
+@app.before_request
+def pin_config():
+    """Serve each request from the configuration snapshot current when it arrived"""
+    g.config_token = config.pin()
+
+@app.teardown_request
+def unpin_config(error=None):
+    token = g.pop('config_token', None)
+    if token is not None:
+        config.unpin(token)
+
+def pinned_stream(stream: Iterator[str]) -> Iterator[str]:
+    """Produce a streamed response body under the configuration snapshot of its request"""
+    snapshot = config.snapshot()
+    try:
+        while True:
+            with config.pinned(snapshot):
+                try:
+                    chunk = next(stream)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        # A client that disconnects closes the body early; the stream cleans up under the same snapshot
+        with config.pinned(snapshot):
+            stream.close()
+
+# Templates link static files by their content-hashed URLs, see static_assets
+app.jinja_env.globals['asset_url'] = lambda path: get_asset_pipeline().url(path)
+
+# How /select-method may pick a method, see GeneralConfig.method_selector
+SELECTORS = ('auto', 'local', 'llm')
+
+# Speculative runs of /select-and-solve, started while the model selects a method;
+# requests arriving while MAX_SPECULATIONS runs are in flight do not speculate
+MAX_SPECULATIONS = 16
+_speculation_executor = ThreadPoolExecutor(max_workers=MAX_SPECULATIONS, thread_name_prefix='speculate')
+_speculation_slots = threading.BoundedSemaphore(MAX_SPECULATIONS)
+
+# How diagrams are returned: Mermaid code rendered by the browser, or also as an SVG rendered here
+RENDER_MODES = ('mermaid', 'svg')
+
+# Upper bound on the self-consistency paths one request may sample, each a billed provider call
+MAX_NUM_PATHS = 20
+
+# Execution modes other than a single completion, per reasoning method
+EXECUTION_MODES = {
+    'scr': ('fanout',),
+    'tot': ('engine',),
+    'bs': ('engine',),
+}
+
+@dataclass
+class ProcessRequest:
+    """Validated parameters of a reasoning request"""
+    api_key: str
+    question: str
+    provider: str
+    model: str
+    max_tokens: int
+    prompt_format: Optional[str]
+    reasoning_method: str
+    chars_per_line: int
+    max_lines: int
+    execution_mode: str = 'single'
+    num_paths: Optional[int] = None
+    temperature: Optional[float] = None
+    early_stopping: Optional[bool] = None
+    use_cache: bool = True
+    timeout: Optional[float] = None  # Seconds until the request deadline, None for no deadline
+    render: str = 'mermaid'  # One of RENDER_MODES
+
+    @classmethod
+    def from_json(cls, data: Optional[dict]) -> 'ProcessRequest':
+        """Build from a request body, raising ValueError for missing or invalid fields"""
+        if not data:
+            raise ValueError('No data provided')
+        if not data.get('api_key'):
+            raise ValueError('API key is required')
+        if not data.get('question'):
+            raise ValueError('Question is required')
+
+        reasoning_method = data.get('reasoning_method', 'cot')
+        execution_mode = data.get('execution_mode', 'single')
+        if execution_mode != 'single' and execution_mode not in EXECUTION_MODES.get(reasoning_method, ()):
+            raise ValueError(f"Execution mode '{execution_mode}' is not supported for method '{reasoning_method}'")
+
+        return cls(
+            api_key=data['api_key'],
+            question=data['question'],
+            provider=data.get('provider', 'anthropic'),
+            model=data.get('model', config.general.available_models[0]),
+            max_tokens=int(data.get('max_tokens', config.general.max_tokens)),
+            prompt_format=data.get('prompt_format'),
+            reasoning_method=reasoning_method,
+            chars_per_line=parse_positive_int(data, 'chars_per_line', config.general.chars_per_line),
+            max_lines=parse_positive_int(data, 'max_lines', config.general.max_lines),
+            execution_mode=execution_mode,
+            num_paths=parse_num_paths(data),
+            temperature=float(data['temperature']) if data.get('temperature') is not None else None,
+            early_stopping=data.get('early_stopping'),
+            use_cache=parse_flag(data, 'cache'),
+            timeout=request_timeout(data),
+            render=parse_render_mode(data)
+        )
+
+    @property
+    def cache_key(self) -> str:
+        """
+        Response cache key: every field that changes the model output, but no visualization setting.
+
+        Responses are only shared between requests with the same API key, so a
+        made-up key never gets a response someone else paid for.
+        """
+        return ResponseCache.make_key(
+            api_key=key_fingerprint(self.api_key),
+            provider=self.provider,
+            model=self.model,
+            method=self.reasoning_method,
+            prompt_format=self.prompt_format,
+            question=self.question,
+            max_tokens=self.max_tokens,
+            execution_mode=self.execution_mode,
+            num_paths=self.num_paths,
+            temperature=self.temperature,
+            early_stopping=self.early_stopping
+        )
+
+    @property
+    def viz_config(self) -> VisualizationConfig:
+        return VisualizationConfig(
+            max_chars_per_line=self.chars_per_line,
+            max_lines=self.max_lines
+        )
+
+@dataclass
+class SelectionRequest:
+    """Validated parameters of a method selection request"""
+    question: str
+    api_key: Optional[str]
+    provider: str
+    model: Optional[str]
+    selector: str
+    use_cache: bool = True
+    timeout: Optional[float] = None
+
+    @classmethod
+    def from_json(cls, data: Optional[dict]) -> 'SelectionRequest':
+        """Build from a request body, raising ValueError for missing or invalid fields"""
+        if not data:
+            raise ValueError('No data provided')
+        if not data.get('question'):
+            raise ValueError('Missing required parameters')
+        return cls(
+            question=data['question'],
+            api_key=data.get('api_key'),
+            provider=data.get('provider', 'anthropic'),
+            model=data.get('model'),
+            selector=parse_selector(data),
+            use_cache=parse_flag(data, 'cache'),
+            timeout=request_timeout(data)
+        )
+
+    @property
+    def has_credentials(self) -> bool:
+        return bool(self.api_key and self.model)
+
+    @property
+    def cache_scope(self) -> tuple:
+        return selection_scope(self.provider, self.model, self.api_key)
+
+def timeout_error(error: DeadlineExceeded) -> dict:
+    """Error payload of a request that ran past its deadline (sent with status 504)"""
+    return {
+        'success': False,
+        'error': str(error),
+        'error_type': 'timeout',
+        'timeout': None if error.timeout is None else round(error.timeout, 3)
+    }
+
+def api_error(error: Exception) -> Tuple[dict, int]:
+    """Error payload and status of a failed provider call"""
+    if isinstance(error, DeadlineExceeded):
+        return timeout_error(error), 504
+    return {'success': False, 'error': f'API call failed: {str(error)}'}, 500
+
+def parse_render_mode(data: dict) -> str:
+    """Render mode of a request body, raising ValueError for an unknown one"""
+    render_mode = data.get('render', 'mermaid')
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Render mode must be one of: {', '.join(RENDER_MODES)}")
+    return render_mode
+
+def parse_flag(data: dict, name: str, default: bool = True) -> bool:
+    """A boolean field of a request body: true/false, 1/0 or their strings, raising ValueError otherwise"""
+    value = data.get(name)
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = {'true': True, 'false': False, '1': True, '0': False}.get(value.strip().lower(), value)
+    if value in (True, False):
+        return bool(value)
+    raise ValueError(f"{name} must be true or false")
+
+def parse_positive_int(data: dict, name: str, default: int) -> int:
+    """A positive integer field of a request body, raising ValueError otherwise"""
+    value = data.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = 0
+    if isinstance(value, bool) or number <= 0:
+        raise ValueError(f"{name} must be a positive integer")
+    return number
+
+def parse_num_paths(data: dict) -> Optional[int]:
+    """Number of paths of a request body, clamped to MAX_NUM_PATHS; raising ValueError unless positive"""
+    if data.get('num_paths') is None:
+        return None
+    num_paths = int(data['num_paths'])
+    if num_paths <= 0:
+        raise ValueError('Number of paths must be positive')
+    return min(num_paths, MAX_NUM_PATHS)
+
+def render_svg(visualization: Optional[str], render_mode: str) -> Optional[str]:
+    """SVG of a diagram if the request asked for one, None if not or if it cannot be rendered here"""
+    if render_mode != 'svg' or not visualization:
+        return None
+    if visualization.count('\n') + 1 < config.general.svg_min_lines:
+        return None
+    return get_svg_renderer().render(visualization)
+
+def parse_selector(data: dict) -> str:
+    """Method selector requested by a /select-method body, raising ValueError if unknown"""
+    selector = data.get('selector') or config.general.method_selector
+    if selector not in SELECTORS:
+        raise ValueError(f"Unknown selector '{selector}', expected one of: {', '.join(SELECTORS)}")
+    return selector
+
+def needs_model_selection(selection: MethodSelection, selector: str, has_credentials: bool) -> bool:
+    """Whether to ask the model after the local classifier selected a method"""
+    return (selector == 'auto' and has_credentials
+            and selection.confidence < config.general.method_selector_threshold)
+
+def selection_result(selection: MethodSelection) -> dict:
+    """Response payload of a method selected by the local classifier"""
+    return {
+        'success': True,
+        'selected_method': selection.method,
+        'selector': selection.source,
+        'confidence': round(selection.confidence, 3)
+    }
+
+def selection_scope(provider: str, model: str, api_key: str) -> tuple:
+    """
+    Selection cache scope of a request: selections are only shared between
+    requests to the same provider and model with the same API key.
+    """
+    return (provider.lower(), model, key_fingerprint(api_key))
+
+def cached_selection(use_cache: bool, question: str, scope: tuple) -> Optional[dict]:
+    """Response payload of an earlier model selection for the same or a similar question"""
+    if not use_cache:
+        return None
+    selection, match = get_selection_cache().get(question, scope)
+    return None if selection is None else {**selection, 'cache': match}
+
+def store_selection(use_cache: bool, question: str, scope: tuple, selection: dict) -> None:
+    if use_cache:
+        # The model's raw response belongs to the request that paid for it
+        get_selection_cache().set(question, scope, {
+            key: value for key, value in selection.items() if key != 'raw_response'
+        })
+
+def begin_selection(params: SelectionRequest) -> Tuple[Optional[MethodSelection], Optional[dict]]:
+    """
+    (local selection, response payload) of a selection request before asking the model.
+
+    The payload is set when the local classifier or the selection cache
+    answers the request. Raises ValueError if the model has to be asked but
+    the request has no credentials.
+    """
+    selection = None if params.selector == 'llm' else select_method_locally(params.question, config.methods)
+    if selection is not None and not needs_model_selection(selection, params.selector, params.has_credentials):
+        return selection, selection_result(selection)
+    if not params.has_credentials:
+        raise ValueError('Missing required parameters')
+    # Reuse the model's selection for a repeated question
+    return selection, cached_selection(params.use_cache, params.question, params.cache_scope)
+
+def selection_fallback(selection: Optional[MethodSelection], error: Optional[Exception] = None) -> Tuple[dict, int]:
+    """Payload and status when the model call failed (or named no valid method if error is None)"""
+    if selection is not None:
+        logger.warning(f"Method selection failed ({str(error) if error else 'invalid method'}), using the local selection")
+        return selection_result(selection), 200
+    if error is None:
+        return {'success': False, 'error': 'Invalid method selection in response'}, 400
+    return api_error(error)
+
+def model_selection(api, use_cache: bool, question: str, scope: tuple) -> Optional[dict]:
+    """Ask the model to select a method: the response payload, None if it named no valid method"""
+    response = api.generate_response(build_selection_prompt(question), max_tokens=100)
+    return selection_from_response(response, use_cache, question, scope)
+
+def selection_from_response(response: str, use_cache: bool, question: str, scope: tuple) -> Optional[dict]:
+    """Response payload of the model's selection, None if it named no valid method"""
+    selected_method = extract_selected_method(response)
+    if not selected_method:
+        return None
+    result = {
+        'success': True,
+        'selected_method': selected_method,
+        'selector': 'llm',
+        'raw_response': response
+    }
+    store_selection(use_cache, question, scope, result)
+    return result
+
+def build_selection_prompt(question: str) -> str:
+    """Create the prompt asking the model to pick a reasoning method"""
+    methods = config.methods
+    return f"""Given this question: "{question}"
+
+Please select the most appropriate reasoning method from the following options to solve it:
+
+{chr(10).join(f'- {method_id}: {method_config.name}' for method_id, method_config in methods.items())}
+
+Consider the characteristics of each method and the nature of the question.
+Output your selection in exactly this format:
+<selected_method>method_id</selected_method>
+where method_id is strictly one of: {', '.join(methods.keys())}.
+Do not use the method or words that are not in {', '.join(methods.keys())}."""
+
+def extract_selected_method(response: str) -> Optional[str]:
+    """Extract the method ID from the selection response, None if invalid"""
+    match = re.search(r'<selected_method>(\w+)</selected_method>', response or '')
+    if match and match.group(1) in config.methods:
+        return match.group(1)
+    return None
+
+def generate_fanout_response(api, params: ProcessRequest) -> str:
+    """Sample Self-consistency paths with concurrent provider calls, returning the combined raw output"""
+    scr_config = config.methods['scr']
+    temperature = scr_config.temperature if params.temperature is None else params.temperature
+
+    def generate_path() -> str:
+        return api.generate_response(
+            params.question,
+            max_tokens=params.max_tokens,
+            prompt_format=scr_config.path_prompt_format,
+            temperature=temperature
+        )
+
+    _, raw_output = generate_parallel_paths(
+        generate_path,
+        params.question,
+        num_paths=params.num_paths or scr_config.num_paths,
+        max_workers=scr_config.max_workers,
+        early_stopping=scr_config.early_stopping if params.early_stopping is None else params.early_stopping
+    )
+    return raw_output
+
+def create_tree_search(api, params: ProcessRequest) -> TreeSearchEngine:
+    """Build the multi-call tree search engine for a Tree of Thoughts / Beam Search request"""
+    search_config = config.tree_search
+    temperature = search_config.temperature if params.temperature is None else params.temperature
+
+    def generate(prompt: str, max_tokens: int) -> str:
+        # The engine formats complete prompts itself
+        return api.generate_response(
+            prompt,
+            max_tokens=max_tokens,
+            prompt_format='{question}',
+            temperature=temperature
+        )
+
+    return TreeSearchEngine(generate, params.question, search_config)
+
+def render_tree_search(engine: TreeSearchEngine, snapshot, params: ProcessRequest) -> str:
+    """Render a tree search snapshot with the diagram of the requested method"""
+    create_diagram = REASONING_METHODS[params.reasoning_method][1]
+    if params.reasoning_method == 'tot':
+        snapshot = engine.tot_response(snapshot)
+    return create_diagram(snapshot, params.viz_config)
+
+def generate_raw_response(api, params: ProcessRequest) -> str:
+    """
+    Get the model response for a request in its execution mode.
+
+    Raises DeadlineExceeded if the response arrived after the request
+    deadline, which a provider without per-call timeouts can overrun.
+    """
+    if params.execution_mode == 'fanout':
+        raw_response = generate_fanout_response(api, params)
+    elif params.execution_mode == 'engine':
+        snapshot = None
+        for snapshot in create_tree_search(api, params).run():
+            pass
+        raw_response = serialize_tree(snapshot, params.reasoning_method)
+    else:
+        raw_response = api.generate_response(
+            params.question,
+            max_tokens=params.max_tokens,
+            prompt_format=params.prompt_format,
+            temperature=params.temperature
+        )
+    check_deadline()
+    return raw_response
+
+def lookup_cached_response(params: ProcessRequest):
+    """Get (raw response, cache headers) for a request; the response is None on a miss"""
+    if not params.use_cache:
+        return None, {'X-Cache': 'BYPASS'}
+    raw_response, tier = get_response_cache().get(params.cache_key)
+    if raw_response is None:
+        return None, {'X-Cache': 'MISS'}
+    logger.info(f"Serving cached response from the {tier} tier")
+    return raw_response, {'X-Cache': 'HIT', 'X-Cache-Tier': tier}
+
+def store_cached_response(params: ProcessRequest, raw_response: Optional[str]) -> None:
+    if params.use_cache and raw_response:
+        get_response_cache().set(params.cache_key, raw_response)
+
+def params_for_method(params: ProcessRequest, method: str) -> ProcessRequest:
+    """Parameters for solving a request with a method and its configured prompt format"""
+    modes = EXECUTION_MODES.get(method, ())
+    return dataclasses.replace(
+        params,
+        reasoning_method=method,
+        prompt_format=config.methods[method].prompt_format,
+        execution_mode=params.execution_mode if params.execution_mode in modes else 'single'
+    )
+
+def solve(params: ProcessRequest) -> Tuple[str, dict]:
+    """Get (raw response, cache headers) for a request from the response cache or the model"""
+    raw_response, cache_headers = lookup_cached_response(params)
+    if raw_response is None:
+        with lease_api(params.provider, params.api_key, params.model) as api:
+            raw_response = generate_raw_response(api, params)
+        store_cached_response(params, raw_response)
+    return raw_response, cache_headers
+
+class Speculation:
+    """A request solved in the background, stopped at its next provider call once cancelled"""
+
+    def __init__(self, params: ProcessRequest):
+        self._cancel = threading.Event()
+
+        def run() -> Tuple[str, dict]:
+            with cancel_scope(self._cancel):
+                return solve(params)
+
+        # Runs in the caller's context, e.g. its deadline and pinned configuration
+        self.future = _speculation_executor.submit(contextvars.copy_context().run, run)
+        self.future.add_done_callback(lambda _: _speculation_slots.release())
+
+    @classmethod
+    def start(cls, params: ProcessRequest) -> Optional['Speculation']:
+        """Start solving params, None if MAX_SPECULATIONS runs are already in flight"""
+        if not _speculation_slots.acquire(blocking=False):
+            return None
+        try:
+            return cls(params)
+        except Exception:
+            _speculation_slots.release()
+            raise
+
+    def result(self) -> Tuple[str, dict]:
+        return self.future.result()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        self.future.cancel()
+
+def process_result(params: ProcessRequest, raw_response: str) -> dict:
+    """Response payload of /process: the raw output, its diagram and the SVG if requested"""
+    visualization = build_visualization(
+        params.reasoning_method, raw_response, params.question, params.viz_config
+    )
+    return {
+        'success': True,
+        'raw_output': raw_response,
+        'visualization': visualization,
+        'svg': render_svg(visualization, params.render)
+    }
+
+def build_visualization(reasoning_method: str, raw_response: str, question: str,
+                        viz_config: VisualizationConfig) -> Optional[str]:
+    """Parse the raw response and render its Mermaid diagram, None on failure"""
+    if reasoning_method not in REASONING_METHODS:
+        return None
+    parse_response, create_diagram = REASONING_METHODS[reasoning_method]
+    try:
+        result = parse_response(raw_response, question)
+        visualization = create_diagram(result, viz_config)
+        logger.info("Successfully generated visualization")
+        return visualization
+    except Exception as viz_error:
+        logger.error(f"Visualization generation failed: {str(viz_error)}")
+        # Continue without visualization
+        return None
+
+@app.route('/render', methods=['POST'])
+def render():
+    """Re-visualize a stored raw output without calling the model"""
+    data = request.json
+    if not data:
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+    raw_output = data.get('raw_output')
+    reasoning_method = data.get('reasoning_method', 'cot')
+    if not raw_output:
+        return jsonify({'success': False, 'error': 'Raw output is required'}), 400
+    if reasoning_method not in REASONING_METHODS:
+        return jsonify({'success': False, 'error': f'Unknown reasoning method: {reasoning_method}'}), 400
+
+    try:
+        viz_config = VisualizationConfig(
+            max_chars_per_line=parse_positive_int(data, 'chars_per_line', config.general.chars_per_line),
+            max_lines=parse_positive_int(data, 'max_lines', config.general.max_lines)
+        )
+        render_mode = parse_render_mode(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    parse_response, create_diagram = REASONING_METHODS[reasoning_method]
+    try:
+        start = time.perf_counter()
+        result = parse_response(raw_output, data.get('question', ''))
+        parsed = time.perf_counter()
+        visualization = create_diagram(result, viz_config)
+        rendered = time.perf_counter()
+        svg = render_svg(visualization, render_mode)
+        svg_rendered = time.perf_counter()
+    except Exception as e:
+        logger.error(f"Visualization generation failed: {str(e)}")
+        return jsonify({'success': False, 'error': f'Visualization failed: {str(e)}'}), 500
+
+    parse_ms = (parsed - start) * 1000
+    render_ms = (rendered - parsed) * 1000
+    svg_ms = (svg_rendered - rendered) * 1000
+    return jsonify({
+        'success': True,
+        'visualization': visualization,
+        'svg': svg,
+        'timings': {'parse_ms': round(parse_ms, 3), 'render_ms': round(render_ms, 3), 'svg_ms': round(svg_ms, 3)}
+    }), 200, {'Server-Timing': f'parse;dur={parse_ms:.3f}, render;dur={render_ms:.3f}, svg;dur={svg_ms:.3f}'}
+
+# Index pages rendered once, as they do not depend on the request
+_pages: Dict[str, Asset] = {}
+
+def asset_response(asset: Asset, cache_control: str) -> Response:
+    """Response with the variant of an asset the client accepts, 304 if its If-None-Match names its ETag"""
+    encoding, body = asset.negotiate(request.accept_encodings.quality)
+    response = Response(body, mimetype=asset.mimetype)
+    response.vary.add('Accept-Encoding')
+    if encoding == 'identity':
+        response.set_etag(asset.etag)
+    else:
+        response.headers['Content-Encoding'] = encoding
+        # Each encoding is a different representation, with its own ETag
+        response.set_etag(f'{asset.etag}-{encoding}')
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+def page_response(template: str) -> Response:
+    """A rendered template, re-rendered on every request only while templates may change"""
+    page = _pages.get(template)
+    if page is None:
+        page = Asset.from_bytes(render_template(template).encode('utf-8'), 'text/html')
+        if not (app.debug or app.jinja_env.auto_reload):
+            _pages[template] = page
+    # The page links the current asset URLs, so it must be revalidated
+    return asset_response(page, 'no-cache')
+
 @app.route('/')
 def index():
     """Render the main page"""
-    return render_template('index.html')
+    return page_response('index.html')
 
 @app.route('/index.html')
 def index_direct():
     """Directly render the main page when accessed via index.html"""
-    return render_template('index.html')
+    return page_response('index.html')
 
 @app.route('/index_cn.html')
 def index_cn():
     """Render the Chinese version of the main page"""
-    return render_template('index_cn.html')
+    return page_response('index_cn.html')
+
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    """Serve a static file by its content-hashed name, cached by clients for a year"""
+    asset = get_asset_pipeline().get(filename)
+    if asset is None:
+        return jsonify({"error": "Asset not found"}), 404
+    return asset_response(asset, IMMUTABLE_CACHE_CONTROL)
+
+def payload_response(payload: JSONPayload) -> Response:
+    """Response for a pre-serialized payload, 304 if the client's If-None-Match names its ETag"""
+    response = Response(payload.body, mimetype='application/json')
+    response.set_etag(payload.etag)
+    # Clients may keep the payload but must revalidate it, as the configuration can change
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @app.route('/config')
 def get_config():
     """Get initial configuration"""
-    return jsonify(config.get_initial_values())
+    return payload_response(get_config_payloads().initial())
 
 @app.route('/method-config/<method_id>')
 def get_method_config(method_id):
     """Get configuration for specific method"""
-    method_config = config.get_method_config(method_id)
-    if method_config:
-        return jsonify(method_config)
+    payload = get_config_payloads().method(method_id)
+    if payload:
+        return payload_response(payload)
     return jsonify({"error": "Method not found"}), 404
 
 @app.route('/provider-api-key/<provider>')
@@ -82,63 +677,44 @@ def get_provider_api_key(provider):
             'error': str(e)
         }), 500
 
+@app.route('/metrics')
+def get_metrics():
+    """Get runtime statistics of the provider transport"""
+    return jsonify({
+        'success': True,
+        'http_pool': get_http_pool().stats(),
+        'client_cache': APIFactory.client_cache_stats(),
+        'response_cache': get_response_cache().stats(),
+        'rate_limits': rate_limit_stats(),
+        'retries': retry_stats(),
+        'selection_cache': get_selection_cache().stats(),
+        'svg_renderer': get_svg_renderer().stats(),
+        'config': watcher.stats() if (watcher := get_config_watcher()) else {'watching': False}
+    })
+
 @app.route('/select-method', methods=['POST'])
 def select_method():
-    """Let the model select the most appropriate reasoning method"""
+    """Select the most appropriate reasoning method, locally or by asking the model"""
     try:
-        data = request.json
-        if not data:
-            return jsonify({'success': False, 'error': 'No data provided'}), 400
-
-        # Extract parameters
-        api_key = data.get('api_key')
-        provider = data.get('provider', 'anthropic')
-        model = data.get('model')
-        question = data.get('question')
-
-        if not all([api_key, model, question]):
-            return jsonify({'success': False, 'error': 'Missing required parameters'}), 400
-
-        # Create the selection prompt
-        methods = config.methods
-        prompt = f"""Given this question: "{question}"
-
-Please select the most appropriate reasoning method from the following options to solve it:
-
-{chr(10).join(f'- {method_id}: {config.name}' for method_id, config in methods.items())}
-
-Consider the characteristics of each method and the nature of the question.
-Output your selection in exactly this format:
-<selected_method>method_id</selected_method>
-where method_id is strictly one of: {', '.join(methods.keys())}.
-Do not use the method or words that are not in {', '.join(methods.keys())}."""
+        try:
+            params = SelectionRequest.from_json(request.json)
+            selection, result = begin_selection(params)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if result is not None:
+            return jsonify(result)
 
         # Get model's selection
         try:
-            api = create_api(provider, api_key, model)
-            response = api.generate_response(prompt, max_tokens=100)
-            
-            # Extract method ID using basic string parsing
-            import re
-            match = re.search(r'<selected_method>(\w+)</selected_method>', response)
-            if match and match.group(1) in methods:
-                selected_method = match.group(1)
-                return jsonify({
-                    'success': True,
-                    'selected_method': selected_method,
-                    'raw_response': response
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': 'Invalid method selection in response'
-                }), 400
-                
+            with deadline_scope(params.timeout), lease_api(params.provider, params.api_key, params.model) as api:
+                result = model_selection(api, params.use_cache, params.question, params.cache_scope)
         except Exception as e:
-            return jsonify({
-                'success': False,
-                'error': f'API call failed: {str(e)}'
-            }), 500
+            payload, status = selection_fallback(selection, e)
+            return jsonify(payload), status
+        if result:
+            return jsonify(result)
+        payload, status = selection_fallback(selection)
+        return jsonify(payload), status
 
     except Exception as e:
         logger.error(f"Error in method selection: {str(e)}")
@@ -151,108 +727,310 @@ Do not use the method or words that are not in {', '.join(methods.keys())}."""
 def process():
     """Process the reasoning request"""
     try:
-        # Get request data
-        data = request.json
-        if not data:
+        # Get and validate request data
+        try:
+            params = ProcessRequest.from_json(request.json)
+        except ValueError as e:
             return jsonify({
                 'success': False,
-                'error': 'No data provided'
+                'error': str(e)
             }), 400
+        
+        # Reuse the model response of an identical earlier request
+        raw_response, cache_headers = lookup_cached_response(params)
+        
+        if raw_response is None:
+            # Initialize API with factory function
+            try:
+                api_lease = lease_api(params.provider, params.api_key, params.model)
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': f'Failed to initialize API: {str(e)}'
+                }), 400
+            
+            # Get model response
+            logger.info(f"Generating response for question using {params.provider} {params.model}")
+            try:
+                with deadline_scope(params.timeout), api_lease as api:
+                    raw_response = generate_raw_response(api, params)
+            except Exception as e:
+                payload, status = api_error(e)
+                return jsonify(payload), status
+            store_cached_response(params, raw_response)
+        
+        # Generate visualization based on reasoning method
+        return jsonify(process_result(params, raw_response)), 200, cache_headers
+        
+    except Exception as e:
+        # Log the error and return error response
+        logger.error(f"Error processing request: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
-        # Extract parameters
-        api_key = data.get('api_key')
-        if not api_key:
-            return jsonify({
-                'success': False,
-                'error': 'API key is required'
-            }), 400
+@app.route('/select-and-solve', methods=['POST'])
+def select_and_solve():
+    """
+    Select a reasoning method and solve the question with it in one request.
 
-        question = data.get('question')
-        if not question:
-            return jsonify({
-                'success': False,
-                'error': 'Question is required'
-            }), 400
+    When the model has to be asked for the method, the method the local
+    classifier expects (usually CoT) runs speculatively in the meantime.
+    Its result is used if the model agrees; otherwise it is cancelled,
+    stopping before its next provider call, and the selected method runs.
+    At most MAX_SPECULATIONS runs are in flight; requests beyond that wait
+    for the model's selection without speculating ('speculation': 'skipped').
+    """
+    data = request.json
+    try:
+        if not data:
+            raise ValueError('No data provided')
+        # The execution mode applies only if the selected method supports it
+        params = ProcessRequest.from_json(dict(data, reasoning_method='cot', execution_mode='single'))
+        params.execution_mode = data.get('execution_mode', 'single')
+        selector = parse_selector(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
 
-        # Get optional parameters with defaults
-        provider = data.get('provider', 'anthropic')  # New parameter for provider
-        model = data.get('model', config.general.available_models[0])
-        max_tokens = int(data.get('max_tokens', config.general.max_tokens))
-        prompt_format = data.get('prompt_format')
-        chars_per_line = int(data.get('chars_per_line', config.general.chars_per_line))
-        max_lines = int(data.get('max_lines', config.general.max_lines))
-        reasoning_method = data.get('reasoning_method', 'cot')
-        
-        # Initialize API with factory function
+    speculation = None
+    try:
+        with deadline_scope(params.timeout):
+            local = select_method_locally(params.question, config.methods)
+            ask_model = selector == 'llm' or needs_model_selection(local, selector, True)
+            scope = selection_scope(params.provider, params.model, params.api_key)
+            selection = cached_selection(params.use_cache, params.question, scope) if ask_model else selection_result(local)
+
+            if selection is None:
+                speculative = Speculation.start(params_for_method(params, local.method))
+                speculation = 'miss' if speculative else 'skipped'
+                try:
+                    try:
+                        with lease_api(params.provider, params.api_key, params.model) as api:
+                            selection = model_selection(api, params.use_cache, params.question, scope)
+                    except DeadlineExceeded:
+                        raise
+                    except Exception as e:
+                        logger.warning(f"Method selection call failed ({str(e)}), using the local selection")
+                    if selection is None:
+                        selection = selection_result(local)
+
+                    if speculative and selection['selected_method'] == local.method:
+                        speculation = 'hit'
+                        raw_response, cache_headers = speculative.result()
+                finally:
+                    if speculative and speculation != 'hit':
+                        speculative.cancel()
+
+            method = selection['selected_method']
+            method_params = params_for_method(params, method)
+            if speculation != 'hit':
+                raw_response, cache_headers = solve(method_params)
+    except DeadlineExceeded as e:
+        return jsonify(timeout_error(e)), 504
+    except Exception as e:
+        logger.error(f"Select and solve failed: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'API call failed: {str(e)}'
+        }), 500
+
+    visualization = build_visualization(method, raw_response, params.question, method_params.viz_config)
+    return jsonify({
+        'success': True,
+        'selected_method': method,
+        'selection': {key: value for key, value in selection.items()
+                      if key not in ('success', 'selected_method')},
+        'speculation': speculation,
+        'prompt_format': method_params.prompt_format,
+        'raw_output': raw_response,
+        'visualization': visualization,
+        'svg': render_svg(visualization, params.render)
+    }), 200, cache_headers
+
+class DiagramThrottle:
+    """
+    Spaces the intermediate diagrams of a stream.
+
+    Every diagram re-parses the whole output so far, so rebuilding after each
+    element would be quadratic in the output length. A rebuild waits at least
+    `interval` seconds, and ten times as long as the previous rebuild took, so
+    rebuilding takes at most a tenth of the stream's time however long it grows.
+    """
+    BUILD_TIME_FACTOR = 10
+
+    def __init__(self, interval: float, clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.pending = False  # New elements since the last rebuild
+        self._next = 0.0
+
+    def render(self, build: Callable[[], Optional[str]]) -> Optional[str]:
+        """The diagram from build() if elements are pending and a rebuild is due, else None"""
+        started = self.clock()
+        if not self.pending or started < self._next:
+            return None
+        visualization = build()
+        finished = self.clock()
+        self.pending = False
+        self._next = finished + max(self.interval, self.BUILD_TIME_FACTOR * (finished - started))
+        return visualization
+
+def _sse(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/process-stream', methods=['POST'])
+def process_stream():
+    """
+    Process the reasoning request, streaming progress as server-sent events.
+
+    Events: 'text' for every streamed chunk of model output, 'step' for every
+    reasoning element as soon as its closing tag arrives, 'diagram' with the
+    visualization re-rendered after new elements (at most every
+    stream_diagram_interval seconds, see DiagramThrottle; or after new tree
+    search nodes in 'engine' execution mode), and finally 'done' (same
+    payload as /process) or 'error'.
+    """
+    try:
+        params = ProcessRequest.from_json(request.json)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    cached_response, cache_headers = lookup_cached_response(params)
+    api_lease = None
+    if cached_response is None:
         try:
-            api = create_api(provider, api_key, model)
+            api_lease = lease_api(params.provider, params.api_key, params.model)
         except Exception as e:
             return jsonify({
                 'success': False,
                 'error': f'Failed to initialize API: {str(e)}'
             }), 400
-        
-        # Get model response
-        logger.info(f"Generating response for question using {provider} {model}")
+
+    def generate():
+        chunks = []
+        tokenizer = TagTokenizer()
+        throttle = DiagramThrottle(config.general.stream_diagram_interval)
+        logger.info(f"Streaming response for question using {params.provider} {params.model}")
         try:
-            raw_response = api.generate_response(
-                question,
-                max_tokens=max_tokens,
-                prompt_format=prompt_format
-            )
+            with deadline_scope(params.timeout), api_lease or contextlib.nullcontext() as api:
+                if cached_response is not None:
+                    stream = [cached_response]
+                elif params.execution_mode == 'engine':
+                    # Stream the growing tree instead of text
+                    snapshot = None
+                    engine = create_tree_search(api, params)
+                    for snapshot in engine.run():
+                        yield _sse('diagram', {'visualization': render_tree_search(engine, snapshot, params)})
+                    stream = [serialize_tree(snapshot, params.reasoning_method)]
+                elif params.execution_mode == 'single':
+                    stream = api.stream_response(
+                        params.question,
+                        max_tokens=params.max_tokens,
+                        prompt_format=params.prompt_format
+                    )
+                else:
+                    # Other execution modes report their combined output at once
+                    stream = [generate_raw_response(api, params)]
+                for chunk in stream:
+                    check_deadline()
+                    chunks.append(chunk)
+                    yield _sse('text', {'text': chunk})
+                    # Report top-level elements; nested ones arrive inside their parent
+                    elements = [
+                        event.element for event in tokenizer.feed(chunk)
+                        if isinstance(event, ElementEvent) and event.element.depth == 0
+                    ]
+                    for element in elements:
+                        yield _sse('step', element.to_dict())
+                    throttle.pending = throttle.pending or bool(elements)
+                    visualization = throttle.render(lambda: build_visualization(
+                        params.reasoning_method, ''.join(chunks), params.question, params.viz_config
+                    ))
+                    if visualization:
+                        yield _sse('diagram', {'visualization': visualization})
+        except DeadlineExceeded as e:
+            logger.error(f"Streaming request failed: {str(e)}")
+            yield _sse('error', timeout_error(e))
+            return
         except Exception as e:
-            return jsonify({
-                'success': False,
-                'error': f'API call failed: {str(e)}'
-            }), 500
-        
-        # Create visualization config
-        viz_config = VisualizationConfig(
-            max_chars_per_line=chars_per_line,
-            max_lines=max_lines
+            logger.error(f"Streaming request failed: {str(e)}")
+            yield _sse('error', {'success': False, 'error': f'API call failed: {str(e)}'})
+            return
+
+        raw_response = ''.join(chunks)
+        if cached_response is None:
+            store_cached_response(params, raw_response)
+        visualization = build_visualization(
+            params.reasoning_method, raw_response, params.question, params.viz_config
         )
-        
-        # Generate visualization based on reasoning method
-        visualization = None
-        try:
-            if reasoning_method == 'cot':
-                result = parse_cot_response(raw_response, question)
-                visualization = create_cot_diagram(result, viz_config)
-            elif reasoning_method == 'tot':
-                result = parse_tot_response(raw_response, question)
-                visualization = create_tot_diagram(result, viz_config)
-            elif reasoning_method == 'l2m':
-                result = parse_l2m_response(raw_response, question)
-                visualization = create_l2m_diagram(result, viz_config)
-            elif reasoning_method == 'scr':
-                result = parse_scr_response(raw_response, question)
-                visualization = create_scr_diagram(result, viz_config)
-            elif reasoning_method == 'srf':
-                result = parse_selfrefine_response(raw_response, question)
-                visualization = create_srf_diagram(result, viz_config)
-            elif reasoning_method == 'bs':
-                result = parse_bs_response(raw_response, question)
-                visualization = create_bs_diagram(result, viz_config)
-                
-            logger.info("Successfully generated visualization")
-        except Exception as viz_error:
-            logger.error(f"Visualization generation failed: {str(viz_error)}")
-            # Continue without visualization
-        
-        # Return successful response
-        return jsonify({
+        # Intermediate diagrams are left to the browser; only the final one is rendered here
+        yield _sse('done', {
             'success': True,
             'raw_output': raw_response,
-            'visualization': visualization
+            'visualization': visualization,
+            'svg': render_svg(visualization, params.render)
         })
-        
-    except Exception as e:
-        # Log the error and return error response
-        logger.error(f"Error processing request: {str(e)}")
+
+    return Response(
+        stream_with_context(pinned_stream(generate())),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', **cache_headers}
+    )
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """
+    Run a list of questions through one reasoning method.
+
+    Results are streamed as JSON lines in completion order. To resume an
+    interrupted batch, send the ids that already succeeded in skip_ids.
+    """
+    data = request.json
+    if not data:
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+    if not data.get('api_key'):
+        return jsonify({'success': False, 'error': 'API key is required'}), 400
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions:
+        return jsonify({'success': False, 'error': 'Questions are required'}), 400
+    if len(questions) > MAX_SERVER_QUESTIONS:
         return jsonify({
             'success': False,
-            'error': str(e)
-        }), 500
+            'error': f'At most {MAX_SERVER_QUESTIONS} questions per batch; use batch.py for larger datasets'
+        }), 400
+
+    items = []
+    for index, item in enumerate(questions, 1):
+        if isinstance(item, str):
+            item = {'question': item}
+        if not isinstance(item, dict) or not item.get('question'):
+            return jsonify({'success': False, 'error': f'Question {index} is invalid'}), 400
+        items.append({'id': index, **item})
+
+    try:
+        settings = BatchSettings(
+            method=data.get('reasoning_method', 'cot'),
+            provider=data.get('provider', 'anthropic'),
+            model=data.get('model', config.general.available_models[0]),
+            api_key=data['api_key'],
+            max_tokens=int(data.get('max_tokens', config.general.max_tokens)),
+            prompt_format=data.get('prompt_format'),
+            concurrency=min(int(data.get('concurrency', 4)), MAX_SERVER_CONCURRENCY),
+            retries=min(int(data.get('retries', 2)), MAX_SERVER_RETRIES)
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    skip_ids = {str(item_id) for item_id in data.get('skip_ids', [])}
+    logger.info(f"Running batch of {len(items)} questions using {settings.provider} {settings.model}")
+
+    def generate():
+        for record in run_batch(items, settings, skip_ids):
+            yield json.dumps(record) + '\n'
+
+    return Response(stream_with_context(pinned_stream(generate())), mimetype='application/x-ndjson')
 
 @app.errorhandler(404)
 def not_found_error(error):
@@ -272,6 +1050,8 @@ def internal_error(error):
 
 if __name__ == '__main__':
     try:
+        # Reload api_keys.json and the REASONGRAPH_CONFIG file when they change
+        watch_config()
         # Run the application
         app.run(
             host='0.0.0.0',
@@ -0,0 +1,205 @@
+"""
+ASGI entry point serving /process and /select-method on asyncio.
+
+Provider round trips are awaited instead of holding a worker thread, so a
+single process can keep hundreds of reasoning requests in flight. Every other
+route is delegated to the Flask application. Run with:
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import (
+    app as flask_app,
+    ProcessRequest,
+    SelectionRequest,
+    api_error,
+    begin_selection,
+    build_selection_prompt,
+    selection_fallback,
+    selection_from_response,
+    process_result,
+    generate_raw_response,
+    lookup_cached_response,
+    store_cached_response
+)
+from api_base import lease_api
+from deadline import DeadlineExceeded, deadline_scope
+from async_api import create_async_api
+from configs import config
+from http_pool import close_async_http_client
+from config_watcher import watch_config
+
+logger = logging.getLogger(__name__)
+
+wsgi_application = WsgiToAsgi(flask_app)
+
+# (payload, status) or (payload, status, extra headers)
+RouteResult = Union[Tuple[Dict[str, Any], int], Tuple[Dict[str, Any], int, Dict[str, str]]]
+
+async def _read_json(receive) -> Optional[Dict[str, Any]]:
+    """Read the full request body and decode it as JSON"""
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+async def _send_json(send, payload: Dict[str, Any], status: int,
+                     headers: Optional[Dict[str, str]] = None) -> None:
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii'))
+        ] + [(name.lower().encode('latin-1'), value.encode('latin-1'))
+             for name, value in (headers or {}).items()]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def select_method(data: Optional[Dict[str, Any]]) -> RouteResult:
+    """Select the most appropriate reasoning method, locally or by asking the model"""
+    try:
+        try:
+            params = SelectionRequest.from_json(data)
+            selection, result = begin_selection(params)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400
+        if result is not None:
+            return result, 200
+
+        # Get model's selection
+        try:
+            api = create_async_api(params.provider, params.api_key, params.model)
+            try:
+                response = await _with_deadline(
+                    api.generate_response(build_selection_prompt(params.question), max_tokens=100),
+                    params.timeout
+                )
+            finally:
+                await api.close()
+        except Exception as e:
+            return selection_fallback(selection, e)
+        result = selection_from_response(response, params.use_cache, params.question, params.cache_scope)
+        if result:
+            return result, 200
+        return selection_fallback(selection)
+
+    except Exception as e:
+        logger.error(f"Error in method selection: {str(e)}")
+        return {'success': False, 'error': str(e)}, 500
+
+async def process(data: Optional[Dict[str, Any]]) -> RouteResult:
+    """Process the reasoning request"""
+    try:
+        try:
+            params = ProcessRequest.from_json(data)
+        except ValueError as e:
+            return {'success': False, 'error': str(e)}, 400
+
+        # Reuse the model response of an identical earlier request
+        raw_response, cache_headers = lookup_cached_response(params)
+        if raw_response is not None:
+            return await _process_result(params, raw_response), 200, cache_headers
+
+        if params.execution_mode != 'single':
+            # Multi-call execution modes run on their own thread pool
+            try:
+                raw_response = await asyncio.to_thread(_generate_in_thread, params)
+            except Exception as e:
+                return api_error(e)
+            store_cached_response(params, raw_response)
+            return await _process_result(params, raw_response), 200, cache_headers
+
+        try:
+            api = create_async_api(params.provider, params.api_key, params.model)
+        except Exception as e:
+            return {'success': False, 'error': f'Failed to initialize API: {str(e)}'}, 400
+
+        # Get model response
+        logger.info(f"Generating async response for question using {params.provider} {params.model}")
+        try:
+            raw_response = await _with_deadline(api.generate_response(
+                params.question,
+                max_tokens=params.max_tokens,
+                prompt_format=params.prompt_format,
+                temperature=params.temperature
+            ), params.timeout)
+        except Exception as e:
+            return api_error(e)
+        finally:
+            await api.close()
+
+        store_cached_response(params, raw_response)
+        return await _process_result(params, raw_response), 200, cache_headers
+
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        return {'success': False, 'error': str(e)}, 500
+
+async def _with_deadline(call, timeout: Optional[float]):
+    """Await a provider call, cancelling it when the request deadline passes"""
+    try:
+        return await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(timeout)
+
+def _generate_in_thread(params: ProcessRequest) -> str:
+    # The worker thread bounds its own provider calls by the deadline
+    with deadline_scope(params.timeout), lease_api(params.provider, params.api_key, params.model) as api:
+        return generate_raw_response(api, params)
+
+async def _process_result(params: ProcessRequest, raw_response: str) -> Dict[str, Any]:
+    if params.render == 'svg':
+        # The Mermaid CLI runs for seconds, off the event loop
+        return await asyncio.to_thread(process_result, params, raw_response)
+    return process_result(params, raw_response)
+
+ASYNC_ROUTES = {
+    ('POST', '/process'): process,
+    ('POST', '/select-method'): select_method,
+}
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Reload api_keys.json and the REASONGRAPH_CONFIG file when they change
+            watch_config()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_http_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send) -> None:
+    """ASGI application: async reasoning routes, everything else through Flask"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    route = None
+    if scope['type'] == 'http':
+        route = ASYNC_ROUTES.get((scope['method'], scope['path']))
+    if route is None:
+        await wsgi_application(scope, receive, send)
+        return
+
+    # Like the Flask routes, a request reads the configuration snapshot current when it arrived
+    with config.pinned():
+        payload, status, *headers = await route(await _read_json(receive))
+    await _send_json(send, payload, status, *headers)
@@ -0,0 +1,257 @@
+from abc import ABC, abstractmethod
+import asyncio
+import logging
+import os
+from typing import Optional, Dict
+
+from api_base import (
+    APIFactory,
+    BaseAPI,
+    AnthropicAPI,
+    OpenAIAPI,
+    DeepSeekAPI,
+    QwenAPI,
+    GrokAPI,
+    TyAPI,
+)
+from client_cache import ClientLease
+from http_pool import get_async_http_client
+from rate_limit import get_rate_limiter
+from retry import async_call_with_retry, get_latency_tracker, get_retry_policy
+
+logger = logging.getLogger(__name__)
+
+class AsyncBaseAPI(ABC):
+    """Abstract base class for asyncio-native API interactions"""
+
+    def __init__(self, api_key: str, model: str):
+        self.api_key = api_key
+        self.model = model
+        self.provider_name = "base"  # Override in subclasses
+        self.provider: Optional[str] = None  # Key of the provider in APIFactory, see BaseAPI
+        self.http = get_async_http_client()  # Shared keep-alive transport of this event loop
+
+    @abstractmethod
+    async def generate_response(self, prompt: str, max_tokens: int = 1024,
+                                prompt_format: Optional[str] = None,
+                                temperature: Optional[float] = None) -> str:
+        """Generate a response using the API"""
+        pass
+
+    # Prompt formatting, error reporting and limiter keys are shared with the synchronous classes
+    _format_prompt = BaseAPI._format_prompt
+    _sampling_params = staticmethod(BaseAPI._sampling_params)
+    _handle_error = BaseAPI._handle_error
+    limit_key = BaseAPI.limit_key
+
+    async def _call(self, request, *args, **kwargs):
+        """
+        Await a provider request through the rate limiter shared with the
+        synchronous classes, retrying transient failures (hedged if enabled)
+        """
+        limiter = get_rate_limiter(self.limit_key, self.model)
+        # Latency of the provider call itself, excluding time queued in the limiter
+        tracker = get_latency_tracker(self.limit_key, self.model)
+        request = tracker.timed_async(request)
+        return await async_call_with_retry(
+            lambda: limiter.call_async(request, *args, **kwargs),
+            get_retry_policy(),
+            tracker=tracker,
+            hedge=True,
+            name=self.provider_name
+        )
+
+    async def close(self) -> None:
+        """Release the SDK client, if any (the shared HTTP client is left open)"""
+        client = getattr(self, "client", None)
+        if client is not None and hasattr(client, "close"):
+            await client.close()
+
+class AsyncAnthropicAPI(AsyncBaseAPI):
+    """Async class to handle interactions with the Anthropic API"""
+
+    def __init__(self, api_key: str, model: str = "claude-3-opus-20240229"):
+        super().__init__(api_key, model)
+        self.provider_name = "Anthropic"
+        self.base_url = "https://api.anthropic.com/v1/messages"
+        self.headers = {
+            "x-api-key": api_key,
+            "anthropic-version": "2023-06-01",
+            "content-type": "application/json"
+        }
+
+    async def generate_response(self, prompt: str, max_tokens: int = 1024,
+                                prompt_format: Optional[str] = None,
+                                temperature: Optional[float] = None) -> str:
+        """Generate a response using the Anthropic API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            data = {
+                "model": self.model,
+                "messages": [{"role": "user", "content": formatted_prompt}],
+                "max_tokens": max_tokens,
+                **self._sampling_params(temperature)
+            }
+
+            logger.info(f"Sending async request to Anthropic API with model {self.model}")
+            response = await self._call(self.http.post, self.base_url, headers=self.headers, json=data)
+            response.raise_for_status()
+
+            response_data = response.json()
+            return response_data["content"][0]["text"]
+
+        except (KeyError, IndexError) as e:
+            self._handle_error(e, "response parsing")
+        except Exception as e:
+            self._handle_error(e, "request")
+
+class AsyncOpenAICompatibleAPI(AsyncBaseAPI):
+    """Async class for providers exposing an OpenAI-compatible chat completions API"""
+
+    # provider_name of the instances; "provider" is the APIFactory key, set per instance
+    provider_label = "OpenAI"
+    base_url: Optional[str] = None
+
+    def __init__(self, api_key: str, model: str):
+        super().__init__(api_key, model)
+        self.provider_name = self.provider_label
+        try:
+            from openai import AsyncOpenAI
+            self.client = AsyncOpenAI(api_key=api_key, base_url=self.base_url, http_client=self.http)
+        except Exception as e:
+            self._handle_error(e, "initialization")
+
+    async def generate_response(self, prompt: str, max_tokens: int = 1024,
+                                prompt_format: Optional[str] = None,
+                                temperature: Optional[float] = None) -> str:
+        """Generate a response using the chat completions API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+
+            logger.info(f"Sending async request to {self.provider_name} API with model {self.model}")
+            response = await self._call(self.client.chat.completions.create,
+                model=self.model,
+                messages=[{"role": "user", "content": formatted_prompt}],
+                max_tokens=max_tokens,
+                **self._sampling_params(temperature)
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            self._handle_error(e, "request or response processing")
+
+    async def close(self) -> None:
+        """The SDK client wraps the shared HTTP client, so there is nothing to release"""
+        pass
+
+class AsyncOpenAIAPI(AsyncOpenAICompatibleAPI):
+    """Async class to handle interactions with the OpenAI API"""
+    provider_label = "OpenAI"
+
+class AsyncDeepSeekAPI(AsyncOpenAICompatibleAPI):
+    """Async class to handle interactions with the DeepSeek API"""
+    provider_label = "DeepSeek"
+    base_url = "https://api.deepseek.com"
+
+class AsyncQwenAPI(AsyncOpenAICompatibleAPI):
+    """Async class to handle interactions with the Qwen API"""
+    provider_label = "Qwen"
+    base_url = "https://dashscope-intl.aliyuncs.com/compatible-mode/v1"
+
+class AsyncGrokAPI(AsyncOpenAICompatibleAPI):
+    """Async class to handle interactions with the Grok API"""
+    provider_label = "Grok"
+    base_url = "https://api.x.ai/v1"
+
+class AsyncTyAPI(AsyncBaseAPI):
+    """Async class to handle interactions with the DashScope API"""
+
+    def __init__(self, api_key: str, model: str = "qwen-plus"):
+        super().__init__(api_key, model)
+        self.provider_name = "DashScope"
+        self.base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions"
+        self.headers = {
+            "Authorization": f"Bearer {os.getenv('DASHSCOPE_API_KEY')}",
+            "content-type": "application/json"
+        }
+
+    async def generate_response(self, prompt: str, max_tokens: int = 1024,
+                                prompt_format: Optional[str] = None,
+                                temperature: Optional[float] = None) -> str:
+        """Generate a response using the DashScope API"""
+        try:
+            formatted_prompt = self._format_prompt(prompt, prompt_format)
+            data = {
+                "model": self.model,
+                "messages": [{"role": "user", "content": formatted_prompt}],
+                **self._sampling_params(temperature)
+            }
+
+            logger.info(f"Sending async request to API with model {self.model}")
+            response = await self._call(self.http.post, self.base_url, headers=self.headers, json=data)
+            response.raise_for_status()
+            response_data = response.json()
+
+            return response_data['choices'][0]["message"]['content']
+
+        except Exception as e:
+            self._handle_error(e, "request or response processing")
+
+class AsyncThreadAPI(AsyncBaseAPI):
+    """Async adapter running a leased synchronous API instance in a worker thread"""
+
+    def __init__(self, lease: ClientLease):
+        self.lease = lease
+        self.sync_api = lease.api
+        self.api_key = self.sync_api.api_key
+        self.model = self.sync_api.model
+        self.provider_name = self.sync_api.provider_name
+        self.provider = self.sync_api.provider
+
+    async def generate_response(self, prompt: str, max_tokens: int = 1024,
+                                prompt_format: Optional[str] = None,
+                                temperature: Optional[float] = None) -> str:
+        """Generate a response without blocking the event loop"""
+        return await asyncio.to_thread(
+            self.sync_api.generate_response, prompt, max_tokens, prompt_format, temperature
+        )
+
+    async def close(self) -> None:
+        """End the lease; the cached instance is closed by its eviction, once unleased"""
+        self.lease.release()
+
+class AsyncAPIFactory:
+    """Factory class creating async counterparts of the APIFactory providers"""
+
+    # Async implementation of each synchronous API class
+    _async_classes: Dict[type, type] = {
+        AnthropicAPI: AsyncAnthropicAPI,
+        OpenAIAPI: AsyncOpenAIAPI,
+        DeepSeekAPI: AsyncDeepSeekAPI,
+        QwenAPI: AsyncQwenAPI,
+        GrokAPI: AsyncGrokAPI,
+        TyAPI: AsyncTyAPI,
+    }
+
+    @classmethod
+    def create_api(cls, provider: str, api_key: str, model: Optional[str] = None) -> AsyncBaseAPI:
+        """
+        Create the async API instance for a provider.
+
+        Must be called from within a running event loop. Providers without a
+        native async implementation run their synchronous class in a thread.
+        """
+        provider, api_class, model = APIFactory._resolve(provider, model)
+        async_class = cls._async_classes.get(api_class)
+        if async_class is None:
+            return AsyncThreadAPI(APIFactory.lease_api(provider, api_key, model))
+
+        logger.info(f"Creating async API instance for provider: {provider}, model: {model}")
+        api = async_class(api_key=api_key, model=model)
+        api.provider = provider
+        return api
+
+def create_async_api(provider: str, api_key: str, model: Optional[str] = None) -> AsyncBaseAPI:
+    """Convenience function to create async API instance"""
+    return AsyncAPIFactory.create_api(provider, api_key, model)
@@ -0,0 +1,222 @@
+"""
+Batch reasoning over a dataset of questions.
+
+Runs every question of a JSONL file through one reasoning method with
+bounded concurrency, the provider's shared rate limiter (see rate_limit.py;
+--rate sets its request rate) and retries of transient provider failures
+(see retry.py), and
+appends one JSON result line per question to an output file as soon as it
+finishes. The output file doubles as the checkpoint: re-running the same
+command skips every question that already has a successful result there.
+
+Input lines look like {"id": "q1", "question": "..."}; any other fields are
+copied to the result under "metadata". Lines without an id are numbered by
+their position in the file.
+
+    python batch.py questions.jsonl results.jsonl --method cot --provider anthropic \\
+        --model claude-3-7-sonnet-20250219 --concurrency 8 --rate 2
+"""
+import argparse
+import contextvars
+import dataclasses
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+from api_base import lease_api
+from configs import config
+from rate_limit import configure_rate_limit
+from reasoning_methods import REASONING_METHODS
+from retry import retry_scope
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of what a /batch request may ask for
+MAX_SERVER_CONCURRENCY = 16
+MAX_SERVER_RETRIES = 5
+MAX_SERVER_QUESTIONS = 1000
+
+@dataclass
+class BatchSettings:
+    """Parameters shared by every question of a batch job"""
+    method: str
+    provider: str
+    model: str
+    api_key: str
+    max_tokens: int = 2048
+    prompt_format: Optional[str] = None  # Defaults to the method's configured format
+    concurrency: int = 4
+    retries: int = 2  # Retries of each transient provider failure
+
+    def __post_init__(self):
+        if self.method not in REASONING_METHODS:
+            raise ValueError(f'Unknown reasoning method: {self.method}')
+        if self.concurrency < 1:
+            raise ValueError('Concurrency must be at least 1')
+        if self.retries < 0:
+            raise ValueError('Retries must not be negative')
+        if self.prompt_format is None:
+            self.prompt_format = config.methods[self.method].prompt_format
+
+def read_questions(path: str) -> Iterator[Dict[str, Any]]:
+    """Read the questions of a JSONL file, numbering lines without an id"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f'{path}:{line_number}: invalid JSON: {str(e)}')
+            if isinstance(item, str):
+                item = {'question': item}
+            if not isinstance(item, dict) or not item.get('question'):
+                raise ValueError(f'{path}:{line_number}: question is required')
+            item.setdefault('id', line_number)
+            yield item
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids with a successful result in an existing output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash, its question is run again
+                continue
+            if record.get('status') == 'ok':
+                done.add(str(record.get('id')))
+    return done
+
+def run_question(item: Dict[str, Any], settings: BatchSettings) -> Dict[str, Any]:
+    """Run one question and build its result record; transient provider failures are retried by the API"""
+    record = {
+        'id': item['id'],
+        'question': item['question'],
+        'method': settings.method,
+        'provider': settings.provider,
+        'model': settings.model,
+        'metadata': {key: value for key, value in item.items() if key not in ('id', 'question')}
+    }
+    parse_response = REASONING_METHODS[settings.method][0]
+    start = time.monotonic()
+
+    try:
+        with retry_scope(settings.retries + 1), \
+                lease_api(settings.provider, settings.api_key, settings.model) as api:
+            raw_output = api.generate_response(
+                item['question'],
+                max_tokens=settings.max_tokens,
+                prompt_format=settings.prompt_format
+            )
+    except Exception as e:
+        record.update(status='error', error=str(e),
+                      elapsed_ms=round((time.monotonic() - start) * 1000))
+        return record
+
+    record.update(status='ok', raw_output=raw_output)
+    try:
+        record['result'] = dataclasses.asdict(parse_response(raw_output, item['question']))
+    except Exception as e:
+        record['result'] = None
+        record['parse_error'] = str(e)
+    record['elapsed_ms'] = round((time.monotonic() - start) * 1000)
+    return record
+
+def run_batch(items: Iterable[Dict[str, Any]], settings: BatchSettings,
+              skip_ids: Optional[Set[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Run questions concurrently, yielding result records in completion order.
+
+    At most settings.concurrency questions run at a time and only a small
+    window of the input is read ahead, so arbitrarily large inputs stream.
+    """
+    skip_ids = skip_ids or set()
+    window = settings.concurrency * 2
+    with ThreadPoolExecutor(max_workers=settings.concurrency) as executor:
+        pending = set()
+        for item in items:
+            if str(item['id']) in skip_ids:
+                continue
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            # Questions run in the caller's context, e.g. the configuration pinned for its request
+            pending.add(executor.submit(contextvars.copy_context().run, run_question, item, settings))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def run_batch_file(input_path: str, output_path: str, settings: BatchSettings) -> Dict[str, int]:
+    """Run a JSONL file of questions, appending results to output_path and resuming from it"""
+    skip_ids = completed_ids(output_path)
+    if skip_ids:
+        logger.info(f"Resuming batch: {len(skip_ids)} questions already completed in {output_path}")
+
+    counts = {'ok': 0, 'error': 0, 'skipped': len(skip_ids)}
+    with open(output_path, 'a+', encoding='utf-8') as out:
+        # Terminate a line left incomplete by a crash before appending
+        if out.tell() > 0:
+            out.seek(out.tell() - 1)
+            if out.read(1) != '\n':
+                out.write('\n')
+        for record in run_batch(read_questions(input_path), settings, skip_ids):
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            counts[record['status']] += 1
+            logger.info(f"Question {record['id']}: {record['status']} "
+                        f"({counts['ok'] + counts['error']} done)")
+    return counts
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run a JSONL file of questions through a reasoning method')
+    parser.add_argument('input', help='JSONL file of questions')
+    parser.add_argument('output', help='JSONL file results are appended to; also the resume checkpoint')
+    parser.add_argument('--method', default='cot', choices=sorted(REASONING_METHODS))
+    parser.add_argument('--provider', default=config.general.providers[0])
+    parser.add_argument('--model', default=config.general.available_models[0])
+    parser.add_argument('--api-key', help='defaults to the key configured for the provider')
+    parser.add_argument('--max-tokens', type=int, default=config.general.max_tokens)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, help='maximum requests per second to the provider')
+    parser.add_argument('--retries', type=int, default=2, help='retries of each transient provider failure')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        settings = BatchSettings(
+            method=args.method,
+            provider=args.provider,
+            model=args.model,
+            api_key=args.api_key or config.general.get_default_api_key(args.provider),
+            max_tokens=args.max_tokens,
+            concurrency=args.concurrency,
+            retries=args.retries
+        )
+        if args.rate:
+            configure_rate_limit(args.provider, requests_per_second=args.rate, max_concurrency=args.concurrency)
+        counts = run_batch_file(args.input, args.output, settings)
+    except (OSError, ValueError) as e:
+        logger.error(str(e))
+        return 1
+
+    logger.info(f"Batch finished: {counts['ok']} ok, {counts['error']} failed, "
+                f"{counts['skipped']} skipped")
+    return 0 if counts['error'] == 0 else 2
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Cold-start import time of the server modules.
+
+Imports a module in a fresh interpreter with python -X importtime and
+reports its total import time and the slowest imports under it. Exits with
+status 1 if a provider SDK was imported (they must only load on first use)
+or if the total exceeds --budget milliseconds, so it doubles as a
+regression check. Run from the ReasonGraph directory:
+
+    python benchmarks/import_time.py [--module app] [--top 15] [--budget 1000]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Modules that must not be imported at startup
+LAZY_MODULES = ('openai', 'google.genai', 'together')
+
+_LINE_PATTERN = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) of every import made by importing a module, in import order"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=root, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f'Importing {module} failed:\n{result.stderr}')
+    imports = []
+    for line in result.stderr.splitlines():
+        match = _LINE_PATTERN.match(line)
+        if match:
+            imports.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return imports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--module', default='app', help='Module to import')
+    parser.add_argument('--top', type=int, default=15, help='Number of slowest imports to list')
+    parser.add_argument('--budget', type=float, default=None, help='Maximum total import time in ms')
+    args = parser.parse_args()
+
+    imports = measure(args.module)
+    cumulative: Dict[str, int] = {name: total for name, _, total in imports}
+    total = cumulative.get(args.module, 0) / 1000
+
+    print(f'{"cumulative":>12} {"self":>10}  module')
+    for name, own, total_us in sorted(imports, key=lambda entry: entry[2], reverse=True)[:args.top]:
+        print(f'{total_us / 1000:>10.1f}ms {own / 1000:>8.1f}ms  {name}')
+    print(f'\nimport {args.module}: {total:.1f}ms, {len(imports)} modules')
+
+    failed = False
+    loaded = [name for name in cumulative if name in LAZY_MODULES]
+    if loaded:
+        print(f'FAIL: provider SDKs imported at startup: {", ".join(loaded)}')
+        failed = True
+    if args.budget is not None and total > args.budget:
+        print(f'FAIL: import time {total:.1f}ms exceeds the budget of {args.budget:g}ms')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
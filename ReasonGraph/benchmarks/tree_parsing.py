@@ -0,0 +1,113 @@
+"""
+Scaling of the Tree of Thoughts and Beam Search response parsers.
+
+Generates synthetic responses of 10 to 10,000 nodes and times
+parse_tot_response and parse_bs_response on them, and their answer marking
+step on its own next to the marking the parsers did before: a substring
+search of every node in the answer (ToT), and a walk up the whole parent
+chain from every node on the best path score (BS). Run from the ReasonGraph
+directory:
+
+    python benchmarks/tree_parsing.py [--sizes 10,100,1000,10000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs_reasoning import parse_bs_arena, parse_bs_response
+from tot_reasoning import find_answer_nodes, parse_tot_arena, parse_tot_response
+from tree_arena import MARKED
+
+def make_tot_response(size: int, rng: random.Random) -> str:
+    """A random tree whose answer quotes the contents of a root-to-leaf path"""
+    nodes = [f'<node id="root">\nApproach {rng.random():.6f}\n</node>']
+    parents = {0: None}
+    for number in range(1, size):
+        parent = rng.randrange(number)
+        parents[number] = parent
+        parent_id = 'root' if parent == 0 else f'node{parent}'
+        nodes.append(f'<node id="node{number}" parent="{parent_id}">\n'
+                     f'Consider option {rng.random():.6f} for step {number}\n</node>')
+    path, number = [], size - 1
+    while number is not None:
+        path.append(nodes[number].split('\n')[1])
+        number = parents[number]
+    # A long answer (it grows with the tree) makes every substring test slower
+    answer = ' '.join(reversed(path)) + ' ' + 'so the answer follows. ' * (size // 10 + 10)
+    return '\n'.join(nodes) + f'\n<answer>\n{answer}\n</answer>'
+
+def make_bs_response(size: int) -> str:
+    """A single chain where every node is on the best path score: the worst case for chain walks"""
+    nodes = ['<node id="root" score="0.9" path_score="1.00">\nStart\n</node>']
+    for number in range(1, size):
+        parent_id = 'root' if number == 1 else f'node{number - 1}'
+        node_id = f'result{number}' if number == size - 1 else f'node{number}'
+        nodes.append(f'<node id="{node_id}" parent="{parent_id}" score="0.5" path_score="1.00">\n'
+                     f'Step {number}\n</node>')
+    return '\n'.join(nodes) + '\n<answer>\nBest path (path_score: 1.00):\nStep\n</answer>'
+
+def tot_marking(arena, answer: str) -> None:
+    """Answer detection as parse_tot_arena does it: one Aho-Corasick scan of the answer"""
+    for index in find_answer_nodes(arena.contents, answer):
+        arena.set_flag(index, MARKED)
+
+def naive_tot_marking(arena, answer: str) -> None:
+    """Substring test of every node content against the answer"""
+    stripped_answer = answer.strip()
+    for index, content in enumerate(arena.contents):
+        if content.strip() in stripped_answer:
+            arena.set_flag(index, MARKED)
+
+def bs_marking(arena, best_score: float) -> None:
+    """Best path marking as parse_bs_arena does it: walks stop at marked nodes"""
+    for index in range(len(arena)):
+        path_score = arena.path_score(index)
+        if path_score and abs(path_score - best_score) < 1e-6:
+            arena.mark_path(index, MARKED)
+
+def naive_bs_marking(arena, best_score: float) -> None:
+    """Walk the whole parent chain from every node on the best path score"""
+    for index in range(len(arena)):
+        path_score = arena.path_score(index)
+        if path_score and abs(path_score - best_score) < 1e-6:
+            for node in arena.ancestors(index):
+                arena.set_flag(node, MARKED)
+
+def best_time(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='Comma-separated node counts')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement, the best is reported')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    columns = ['tot parse', 'tot mark', 'tot naive', 'bs parse', 'bs mark', 'bs naive']
+    print(f"{'nodes':>7} " + ' '.join(f'{column:>11}' for column in columns))
+    for size in (int(value) for value in args.sizes.split(',')):
+        tot_text = make_tot_response(size, rng)
+        bs_text = make_bs_response(size)
+        tot_arena, _, answer = parse_tot_arena(tot_text)
+        bs = parse_bs_arena(bs_text)
+        timings = [
+            best_time(lambda: parse_tot_response(tot_text, 'Q'), args.repeat),
+            best_time(lambda: tot_marking(tot_arena, answer), args.repeat),
+            best_time(lambda: naive_tot_marking(tot_arena, answer), args.repeat),
+            best_time(lambda: parse_bs_response(bs_text, 'Q'), args.repeat),
+            best_time(lambda: (bs.arena.clear_flag(MARKED), bs_marking(bs.arena, bs.best_score)), args.repeat),
+            best_time(lambda: (bs.arena.clear_flag(MARKED), naive_bs_marking(bs.arena, bs.best_score)), args.repeat),
+        ]
+        print(f'{size:>7} ' + ' '.join(f'{timing * 1000:>9.2f}ms' for timing in timings))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of diagram text wrapping.
+
+Compares text_wrap.wrap_text, without and with its memo, to the wrap_text
+copies the diagram builders had before: textwrap.wrap over the whole text,
+truncated afterwards. Run from the ReasonGraph directory:
+
+    python benchmarks/wrapping.py [--number 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import textwrap
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_wrap import wrap_text
+
+def full_wrap_text(text: str, max_chars: int = 40, max_lines: int = 4) -> str:
+    """The former tot_reasoning / bs_reasoning wrap_text"""
+    text = text.replace('\n', ' ').replace('"', "'")
+    wrapped_lines = textwrap.wrap(text, width=max_chars)
+    if len(wrapped_lines) > max_lines:
+        wrapped_lines = wrapped_lines[:max_lines]
+        wrapped_lines[-1] = wrapped_lines[-1][:max_chars - 3] + "..."
+    return "<br>".join(wrapped_lines)
+
+def make_text(words: int, rng: random.Random) -> str:
+    vocabulary = ['the', 'answer', 'is', 'therefore', 'consider', 'well-known', 'step', '42', 'apples', 'so']
+    return ' '.join(rng.choice(vocabulary) for _ in range(words))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--number', type=int, default=2000, help='Calls per measurement')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    uncached = wrap_text.__wrapped__
+    print(f"{'words':>7} {'textwrap':>12} {'early exit':>12} {'memoized':>12}")
+    for words in (5, 50, 500, 5000):
+        text = make_text(words, rng)
+        assert uncached(text) == full_wrap_text(text)
+        timings = [
+            timeit.timeit(lambda: full_wrap_text(text), number=args.number),
+            timeit.timeit(lambda: uncached(text), number=args.number),
+            timeit.timeit(lambda: wrap_text(text), number=args.number),
+        ]
+        print(f'{words:>7} ' + ' '.join(f'{timing / args.number * 1e6:>10.1f}us' for timing in timings))
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,15 @@
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Iterator, List, Optional, TextIO
+import io
 import re
-import textwrap
-from cot_reasoning import VisualizationConfig
+from cot_reasoning import VisualizationConfig, wrap_text, write_lines
+from tag_parser import iter_elements
+from tree_arena import MARKED, NO_NODE, TreeArena
 
-@dataclass
+# Answer content naming the winning path score
+_ANSWER_PATTERN = re.compile(r'Best path \(path_score: ([^\)]+)\):\s*(.*)', re.DOTALL)
+
+@dataclass(slots=True)
 class BSNode:
     """Data class representing a node in the Beam Search tree"""
     id: str
@@ -32,113 +37,134 @@ class BSResponse:
         if self.result_nodes is None:
             self.result_nodes = []
 
-def parse_bs_response(response_text: str, question: str) -> BSResponse:
-    """Parse Beam Search response text to extract nodes and build the tree"""
-    # Parse nodes
-    node_pattern = r'<node id="([^"]+)"(?:\s+parent="([^"]+)")?\s*score="([^"]+)"(?:\s+path_score="([^"]+)")?\s*>\s*(.*?)\s*</node>'
-    nodes_dict = {}
-    result_nodes = []
+@dataclass
+class BSArena:
+    """Beam Search tree parsed into arena storage; best path nodes are MARKED"""
+    arena: TreeArena
+    root: int = NO_NODE
+    answer: Optional[str] = None
+    best_score: Optional[float] = None
+
+    @property
+    def result_nodes(self) -> List[int]:
+        return [index for index, node_id in enumerate(self.arena.ids) if node_id.startswith('result')]
+
+def parse_bs_arena(response_text: str) -> BSArena:
+    """Parse Beam Search response text into arena storage"""
+    arena = TreeArena()
+    answer_match = None
     
-    # First pass: create all nodes
-    for match in re.finditer(node_pattern, response_text, re.DOTALL):
-        node_id = match.group(1)
-        parent_id = match.group(2)
-        score = float(match.group(3))
-        path_score = float(match.group(4)) if match.group(4) else None
-        content = match.group(5).strip()
-        
-        node = BSNode(
-            id=node_id, 
-            content=content, 
-            score=score, 
-            parent_id=parent_id,
-            path_score=path_score
-        )
-        nodes_dict[node_id] = node
-        
-        # Collect result nodes
-        if node_id.startswith('result'):
-            result_nodes.append(node)
+    # First pass: store all scored nodes and find the best-path answer
+    for element in iter_elements(response_text):
+        if element.name == 'node':
+            node_id = element.attrs.get('id')
+            score = element.float_attr('score')
+            if not node_id or score is None:
+                continue
+            arena.add(node_id, element.content, element.attrs.get('parent'),
+                      score, element.float_attr('path_score'))
+        elif element.name == 'answer' and answer_match is None:
+            answer_match = _ANSWER_PATTERN.match(element.content)
 
     # Second pass: build tree relationships
-    root = None
-    for node in nodes_dict.values():
-        if node.parent_id is None:
-            root = node
-        else:
-            parent = nodes_dict.get(node.parent_id)
-            if parent:
-                parent.children.append(node)
+    root = arena.link()
 
     # Parse answer if present
-    answer_pattern = r'<answer>\s*Best path \(path_score: ([^\)]+)\):\s*(.*?)\s*</answer>'
-    answer_match = re.search(answer_pattern, response_text, re.DOTALL)
     answer = None
     best_score = None
     
     if answer_match:
-        best_score = float(answer_match.group(1))
+        try:
+            best_score = float(answer_match.group(1))
+        except ValueError:
+            answer_match = None
+    
+    if answer_match:
         answer = answer_match.group(2).strip()
         
         # Mark the best path based on path_score
-        current_path_score = best_score
-        for node in nodes_dict.values():
-            if node.path_score and abs(node.path_score - current_path_score) < 1e-6:
+        for index in range(len(arena)):
+            path_score = arena.path_score(index)
+            if path_score and abs(path_score - best_score) < 1e-6:
                 # Mark all nodes in the path as best
-                current = node
-                while current:
-                    current.is_best_path = True
-                    current = nodes_dict.get(current.parent_id)
+                arena.mark_path(index, MARKED)
+
+    return BSArena(arena=arena, root=root, answer=answer, best_score=best_score)
+
+def to_bs_response(parsed: BSArena, question: str) -> BSResponse:
+    """Convert an arena-backed Beam Search tree to BSNode objects"""
+    arena = parsed.arena
+    built = {}
+
+    def make_node(index: int, children: List[BSNode]) -> BSNode:
+        return BSNode(
+            id=arena.ids[index],
+            content=arena.contents[index],
+            score=arena.scores[index],
+            parent_id=arena.parent_ids[index],
+            children=children,
+            is_best_path=arena.has_flag(index, MARKED),
+            path_score=arena.path_score(index)
+        )
 
+    root = arena.convert(parsed.root, make_node, built) if parsed.root != NO_NODE else None
+    # Result nodes outside the root's tree are converted on their own
+    result_nodes = [built[index] if index in built else arena.convert(index, make_node, built)
+                    for index in parsed.result_nodes]
     return BSResponse(
         question=question, 
         root=root, 
-        answer=answer, 
-        best_score=best_score,
+        answer=parsed.answer, 
+        best_score=parsed.best_score,
         result_nodes=result_nodes
     )
 
-def create_mermaid_diagram(bs_response: BSResponse, config: VisualizationConfig) -> str:
-    """Convert Beam Search response to Mermaid diagram"""
-    diagram = ['<div class="mermaid">', 'graph TD']
+def parse_bs_response(response_text: str, question: str) -> BSResponse:
+    """Parse Beam Search response text to extract nodes and build the tree"""
+    return to_bs_response(parse_bs_arena(response_text), question)
+
+def iter_mermaid_lines(bs_response: BSResponse, config: VisualizationConfig) -> Iterator[str]:
+    """Generate the lines of the Mermaid diagram of a Beam Search response"""
+    yield '<div class="mermaid">'
+    yield 'graph TD'
     
     # Add question node
     question_content = wrap_text(bs_response.question, config)
-    diagram.append(f'    Q["{question_content}"]')
+    yield f'    Q["{question_content}"]'
     
-    def add_node_and_children(node: BSNode, parent_id: Optional[str] = None):
-        # Format content to include scores
-        score_info = f"Score: {node.score:.2f}"
-        if node.path_score:
-            score_info += f"<br>Path Score: {node.path_score:.2f}"
-        node_content = f"{wrap_text(node.content, config)}<br>{score_info}"
-        
-        # Determine node style based on type and path
-        if node.id.startswith('result'):
-            node_style = 'result'
-            if node.is_best_path:
-                node_style = 'best_result'
-        else:
-            node_style = 'intermediate'
-            if node.is_best_path:
-                node_style = 'best_intermediate'
-        
-        # Add node
-        diagram.append(f'    {node.id}["{node_content}"]')
-        diagram.append(f'    class {node.id} {node_style};')
-        
-        # Add connection from parent
-        if parent_id:
-            diagram.append(f'    {parent_id} --> {node.id}')
-        
-        # Process children
-        for child in node.children:
-            add_node_and_children(child, node.id)
-    
-    # Build tree structure
+    # Build tree structure depth-first with an explicit stack, so deep trees need no recursion
     if bs_response.root:
-        diagram.append(f'    Q --> {bs_response.root.id}')
-        add_node_and_children(bs_response.root)
+        yield f'    Q --> {bs_response.root.id}'
+        stack = [(bs_response.root, None)]
+        while stack:
+            node, parent_id = stack.pop()
+            
+            # Format content to include scores
+            score_info = f"Score: {node.score:.2f}"
+            if node.path_score:
+                score_info += f"<br>Path Score: {node.path_score:.2f}"
+            node_content = f"{wrap_text(node.content, config)}<br>{score_info}"
+            
+            # Determine node style based on type and path
+            if node.id.startswith('result'):
+                node_style = 'result'
+                if node.is_best_path:
+                    node_style = 'best_result'
+            else:
+                node_style = 'intermediate'
+                if node.is_best_path:
+                    node_style = 'best_intermediate'
+            
+            # Add node
+            yield f'    {node.id}["{node_content}"]'
+            yield f'    class {node.id} {node_style};'
+            
+            # Add connection from parent
+            if parent_id:
+                yield f'    {parent_id} --> {node.id}'
+            
+            # Process children, first child on top
+            stack.extend((child, node.id) for child in reversed(node.children))
     
     # Add final answer
     if bs_response.answer:
@@ -146,16 +172,16 @@ def create_mermaid_diagram(bs_response: BSResponse, config: VisualizationConfig)
             f"Final Answer (Path Score: {bs_response.best_score:.2f}):<br>{bs_response.answer}",
             config
         )
-        diagram.append(f'    Answer["{answer_content}"]')
+        yield f'    Answer["{answer_content}"]'
         
         # Connect all result nodes to the answer
         for result_node in bs_response.result_nodes:
-            diagram.append(f'    {result_node.id} --> Answer')
+            yield f'    {result_node.id} --> Answer'
         
-        diagram.append('    class Answer final_answer;')
+        yield '    class Answer final_answer;'
     
     # Add styles
-    diagram.extend([
+    yield from [
         '    classDef intermediate fill:#f9f9f9,stroke:#333,stroke-width:2px;',
         '    classDef best_intermediate fill:#f9f9f9,stroke:#333,stroke-width:2px;',
         '    classDef question fill:#e3f2fd,stroke:#1976d2,stroke-width:2px;',
@@ -164,24 +190,16 @@ def create_mermaid_diagram(bs_response: BSResponse, config: VisualizationConfig)
         '    classDef final_answer fill:#d4edda,stroke:#28a745,stroke-width:2px;',
         '    class Q question;',
         '    linkStyle default stroke:#666,stroke-width:2px;'
-    ])
+    ]
     
-    diagram.append('</div>')
-    return '\n'.join(diagram)
+    yield '</div>'
 
-def wrap_text(text: str, config: VisualizationConfig) -> str:
-    """Wrap text to fit within box constraints"""
-    text = text.replace('\n', ' ').replace('"', "'")
-    wrapped_lines = textwrap.wrap(text, width=config.max_chars_per_line)
-    
-    if len(wrapped_lines) > config.max_lines:
-        # Option 1: Simply truncate and add ellipsis to the last line
-        wrapped_lines = wrapped_lines[:config.max_lines]
-        wrapped_lines[-1] = wrapped_lines[-1][:config.max_chars_per_line-3] + "..."
-        
-        # Option 2 (alternative): Include part of the next line to show continuity
-        # original_next_line = wrapped_lines[config.max_lines] if len(wrapped_lines) > config.max_lines else ""
-        # wrapped_lines = wrapped_lines[:config.max_lines-1]
-        # wrapped_lines.append(original_next_line[:config.max_chars_per_line-3] + "...")
-    
-    return "<br>".join(wrapped_lines)
\ No newline at end of file
+def write_mermaid_diagram(bs_response: BSResponse, config: VisualizationConfig, out: TextIO) -> None:
+    """Write the Mermaid diagram of a Beam Search response to a text buffer, line by line"""
+    write_lines(iter_mermaid_lines(bs_response, config), out)
+
+def create_mermaid_diagram(bs_response: BSResponse, config: VisualizationConfig) -> str:
+    """Convert Beam Search response to Mermaid diagram"""
+    out = io.StringIO()
+    write_mermaid_diagram(bs_response, config, out)
+    return out.getvalue()
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional time-to-live.
+
+    Entries beyond maxsize are evicted least-recently-used first, entries
+    older than ttl seconds are dropped on access. The on_evict callback is
+    called with (key, value) for every entry that leaves the cache, outside
+    of the cache lock so it may safely do slow work such as closing clients.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _notify(self, evicted: List[Tuple[Hashable, Any]]) -> None:
+        if self.on_evict:
+            for key, value in evicted:
+                self.on_evict(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value and mark it as recently used"""
+        evicted = []
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and self._expired(entry[1], time.monotonic()):
+                del self._data[key]
+                self.evictions += 1
+                evicted.append((key, entry[0]))
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                value = default
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                value = entry[0]
+        self._notify(evicted)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if needed"""
+        evicted = []
+        with self._lock:
+            old = self._data.pop(key, _MISSING)
+            if old is not _MISSING and old[0] is not value:
+                evicted.append((key, old[0]))
+            self._data[key] = (value, time.monotonic())
+            while len(self._data) > self.maxsize:
+                old_key, (old_value, _) = self._data.popitem(last=False)
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+        self._notify(evicted)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Get a value, creating and storing it with factory() on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Explicitly evict a key, returning its value"""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        self._notify([(key, entry[0])])
+        return entry[0]
+
+    def purge_expired(self) -> int:
+        """Drop all expired entries, returning how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [(key, value) for key, (value, stored_at) in self._data.items()
+                       if self._expired(stored_at, now)]
+            for key, _ in expired:
+                del self._data[key]
+            self.evictions += len(expired)
+        self._notify(expired)
+        return len(expired)
+
+    def clear(self) -> None:
+        """Evict every entry"""
+        with self._lock:
+            evicted = [(key, value) for key, (value, _) in self._data.items()]
+            self._data.clear()
+        self._notify(evicted)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return entry is not _MISSING and not self._expired(entry[1], time.monotonic())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters"""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+from caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+ClientKey = Tuple[str, str, str]
+
+def key_fingerprint(api_key: str) -> str:
+    """Hash an API key so it is never kept as a cache key in plain text"""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+class _CachedClient:
+    """A cached API instance together with its lease bookkeeping"""
+
+    def __init__(self, api: Any):
+        self.api = api
+        self.leases = 0
+        self.retired = False
+
+class ClientLease:
+    """
+    Context manager holding a cached API instance in use.
+
+    The lease is taken when the object is created, so the instance cannot be
+    closed by an eviction between lookup and use; it is returned on exit.
+    """
+
+    def __init__(self, cache: "ClientCache", entry: _CachedClient):
+        self._cache = cache
+        self._entry = entry
+        self._released = False
+
+    @property
+    def api(self) -> Any:
+        return self._entry.api
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._cache._release(self._entry)
+
+    def __enter__(self) -> Any:
+        return self._entry.api
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+class ClientCache:
+    """
+    Bounded LRU/TTL cache of live API instances keyed by
+    (provider, model, API key fingerprint).
+
+    Evicted instances are closed once no lease holds them any more, so a
+    request in flight never has its client closed underneath it.
+    """
+
+    def __init__(self, maxsize: int = 64, ttl: float = 900.0):
+        # Re-entrant: evictions triggered while creating an entry call back into _on_evict
+        self._lock = threading.RLock()
+        self._entries = LRUCache(maxsize=maxsize, ttl=ttl, on_evict=self._on_evict)
+
+    @staticmethod
+    def make_key(provider: str, model: str, api_key: str) -> ClientKey:
+        return (provider.lower(), model, key_fingerprint(api_key))
+
+    def _get_entry(self, key: ClientKey, factory: Callable[[], Any], lease: bool) -> _CachedClient:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _CachedClient(factory())
+                self._entries.set(key, entry)
+                logger.info(f"Cached new API client for provider: {key[0]}, model: {key[1]}")
+            if lease:
+                entry.leases += 1
+            return entry
+
+    def get(self, key: ClientKey, factory: Callable[[], Any]) -> Any:
+        """Get the cached instance for key, creating it with factory() on a miss"""
+        return self._get_entry(key, factory, lease=False).api
+
+    def lease(self, key: ClientKey, factory: Callable[[], Any]) -> ClientLease:
+        """Get the cached instance for key wrapped in a lease"""
+        return ClientLease(self, self._get_entry(key, factory, lease=True))
+
+    def evict(self, key: ClientKey) -> bool:
+        """Explicitly evict one instance, returning whether it was cached"""
+        return self._entries.pop(key) is not None
+
+    def evict_provider(self, provider: str) -> int:
+        """Evict every instance of a provider"""
+        keys = [key for key in self._entries.keys() if key[0] == provider.lower()]
+        for key in keys:
+            self._entries.pop(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        """Evict every cached instance"""
+        self._entries.clear()
+
+    def _on_evict(self, key: ClientKey, entry: _CachedClient) -> None:
+        with self._lock:
+            entry.retired = True
+            close_now = entry.leases == 0
+        if close_now:
+            self._close(key, entry)
+
+    def _release(self, entry: _CachedClient) -> None:
+        with self._lock:
+            entry.leases -= 1
+            close_now = entry.retired and entry.leases == 0
+        if close_now:
+            self._close(None, entry)
+
+    @staticmethod
+    def _close(key, entry: _CachedClient) -> None:
+        try:
+            entry.api.close()
+        except Exception as e:
+            logger.warning(f"Failed to close evicted API client {key}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return self._entries.stats()
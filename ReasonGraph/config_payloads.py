@@ -0,0 +1,79 @@
+"""
+Pre-serialized configuration payloads for the UI.
+
+The /config and /method-config/<id> responses only change when the
+configuration does, so they are serialized once into immutable JSON bytes
+with a strong ETag (a hash of the bytes) and rebuilt only after the
+configuration's version changes (a reload, or ReasoningConfig.changed()).
+Handlers answer If-None-Match requests for an unchanged payload with 304.
+"""
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+@dataclass(frozen=True)
+class JSONPayload:
+    """A serialized JSON response body and its entity tag"""
+    body: bytes
+    etag: str  # Unquoted strong ETag
+
+    @classmethod
+    def from_data(cls, data: Any) -> 'JSONPayload':
+        # Same form as Flask's jsonify outside debug mode
+        body = json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8') + b'\n'
+        return cls(body=body, etag=hashlib.sha256(body).hexdigest()[:32])
+
+class ConfigPayloads:
+    """JSON payloads of a ReasoningConfig, rebuilt whenever its version changes"""
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._version: Optional[Hashable] = None
+        self._initial: Optional[JSONPayload] = None
+        self._methods: Dict[str, JSONPayload] = {}
+        self.builds = 0
+
+    def _current(self) -> None:
+        """Rebuild the payloads if the configuration changed since they were built"""
+        version = self.config.version
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            # Read a single snapshot, even if the configuration is swapped meanwhile
+            snapshot = self.config.snapshot() if hasattr(self.config, 'snapshot') else self.config
+            initial = snapshot.get_initial_values()
+            self._methods = {
+                method_id: JSONPayload.from_data(snapshot.get_method_config(method_id))
+                for method_id in snapshot.methods
+            }
+            self._initial = JSONPayload.from_data(initial)
+            self._version = version
+            self.builds += 1
+
+    def initial(self) -> JSONPayload:
+        """Payload of /config"""
+        self._current()
+        return self._initial
+
+    def method(self, method_id: str) -> Optional[JSONPayload]:
+        """Payload of /method-config/<method_id>, None for an unknown method"""
+        self._current()
+        return self._methods.get(method_id)
+
+_payloads: Optional[ConfigPayloads] = None
+_payloads_lock = threading.Lock()
+
+def get_config_payloads() -> ConfigPayloads:
+    """Get the payloads of the process-wide configuration"""
+    global _payloads
+    if _payloads is None:
+        with _payloads_lock:
+            if _payloads is None:
+                from configs import config
+                _payloads = ConfigPayloads(config)
+    return _payloads
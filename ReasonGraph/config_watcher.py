@@ -0,0 +1,151 @@
+"""
+Hot reloading of the configuration.
+
+A ConfigWatcher polls api_keys.json and the optional external config file
+(REASONGRAPH_CONFIG, JSON or TOML) for changes. On a change it builds a new
+snapshot with configs.build_config() and swaps it into configs.config, so
+keys, models and prompt formats change without a restart and without
+disturbing requests in flight. A file that fails to load is logged and the
+current snapshot stays in place. Caches derived from the configuration are
+dropped by invalidate_derived_caches(), registered as an on_reload callback.
+
+Nothing is watched on import: the entry points (app.py's __main__, the
+ASGI startup in asgi.py) call watch_config().
+"""
+import logging
+import os
+import threading
+from typing import Optional, Tuple
+
+from configs import API_KEYS_FILE, CONFIG_FILE, ConfigProxy, ReasoningConfig, build_config, config
+
+logger = logging.getLogger(__name__)
+
+# (mtime_ns, size) of a file, None if it does not exist
+FileSignature = Optional[Tuple[int, int]]
+
+def _signature(file_path: Optional[str]) -> FileSignature:
+    if not file_path:
+        return None
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+class ConfigWatcher:
+    """Reload a ConfigProxy whenever its key file or config file changes"""
+
+    def __init__(self, proxy: ConfigProxy, config_file: Optional[str] = CONFIG_FILE,
+                 api_keys_file: Optional[str] = API_KEYS_FILE, interval: Optional[float] = None):
+        self.proxy = proxy
+        self.config_file = config_file
+        self.api_keys_file = api_keys_file
+        self.interval = interval  # None: GeneralConfig.config_reload_interval
+        self.reloads = 0
+        self.errors = 0
+        self._seen: Tuple[FileSignature, FileSignature] = (None, None)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _signatures(self) -> Tuple[FileSignature, FileSignature]:
+        return (_signature(self.config_file), _signature(self.api_keys_file))
+
+    def reload(self) -> bool:
+        """Build a snapshot from the files and swap it in; False (keeping the current one) if they are invalid"""
+        try:
+            snapshot = build_config(self.config_file, self.api_keys_file)
+        except (OSError, ValueError, TypeError) as e:
+            self.errors += 1
+            logger.error(f"Configuration not reloaded, keeping the current one: {str(e)}")
+            return False
+        self.proxy.swap(snapshot)
+        self.reloads += 1
+        logger.info("Configuration reloaded")
+        return True
+
+    def check(self) -> bool:
+        """Reload if a watched file changed since the last check; whether a new snapshot was swapped in"""
+        with self._lock:
+            signatures = self._signatures()
+            if signatures == self._seen:
+                return False
+            self._seen = signatures
+            return self.reload()
+
+    def start(self) -> 'ConfigWatcher':
+        """Apply the config file, if any, then poll for changes on a daemon thread"""
+        with self._lock:
+            self._seen = self._signatures()
+            if self.config_file:
+                self.reload()
+        interval = self.interval if self.interval is not None else self.proxy.general.config_reload_interval
+        if interval and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="config-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Configuration check failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "config_file": self.config_file,
+            "api_keys_file": self.api_keys_file,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "watching": self._thread is not None
+        }
+
+def invalidate_derived_caches(old: ReasoningConfig, new: ReasoningConfig) -> None:
+    """Drop the caches and limiters built from settings that changed between two snapshots"""
+    from rate_limit import reset_rate_limiters
+    from response_cache import reset_response_cache
+    from selection_cache import reset_selection_cache
+    from svg_renderer import reset_svg_renderer
+
+    def changed(*names: str) -> bool:
+        return any(getattr(old.general, name) != getattr(new.general, name) for name in names)
+
+    if changed("rate_limits"):
+        reset_rate_limiters()
+    # Cached responses are keyed by prompt format, but not by the tree search settings
+    if (changed("response_cache_size", "response_cache_ttl", "response_cache_path", "response_cache_disk_size",
+                "response_cache_disk_ttl")
+            or old.tree_search != new.tree_search):
+        reset_response_cache()
+    # Model selections depend on the methods offered to the model
+    if (changed("selection_cache_size", "selection_cache_ttl", "selection_cache_similarity")
+            or old.methods.keys() != new.methods.keys()):
+        reset_selection_cache()
+    if changed("mermaid_cli", "svg_render_timeout", "svg_cache_size", "svg_cache_dir"):
+        reset_svg_renderer()
+
+config.on_reload(invalidate_derived_caches)
+
+_watcher: Optional[ConfigWatcher] = None
+_watcher_lock = threading.Lock()
+
+def watch_config() -> ConfigWatcher:
+    """Start watching the configuration files of the process-wide configuration (once)"""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = ConfigWatcher(config).start()
+    return _watcher
+
+def get_config_watcher() -> Optional[ConfigWatcher]:
+    """The process-wide watcher, None if watch_config() was not called"""
+    return _watcher
@@ -1,8 +1,12 @@
-from dataclasses import dataclass, field
-from typing import Dict, Any, Optional, List
+from dataclasses import dataclass, field, fields, replace
+from typing import Callable, Dict, Any, Iterator, Optional, List
+import contextlib
+import contextvars
 import os
 import json
 import logging
+import threading
+import tomllib
 
 # Configure logging
 logging.basicConfig(
@@ -11,7 +15,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def load_api_keys_from_file(file_path: str = "api_keys.json") -> Dict[str, str]:
+# Default locations of the watched files; relative paths are resolved against this directory
+_CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
+API_KEYS_FILE = os.path.join(_CONFIG_DIR, os.environ.get("REASONGRAPH_API_KEYS", "api_keys.json"))
+CONFIG_FILE = (os.path.join(_CONFIG_DIR, os.environ["REASONGRAPH_CONFIG"])
+               if os.environ.get("REASONGRAPH_CONFIG") else None)
+
+def load_api_keys_from_file(file_path: str = API_KEYS_FILE) -> Dict[str, str]:
     """Load API keys from a JSON file"""
     try:
         if os.path.exists(file_path):
@@ -160,10 +170,56 @@ class GeneralConfig:
     max_tokens: int = 2048
     chars_per_line: int = 40
     max_lines: int = 8
+    # Cache of raw model responses for /process
+    response_cache_size: int = 256
+    response_cache_ttl: Optional[float] = 3600.0
+    response_cache_path: Optional[str] = None  # SQLite file of the optional disk tier
+    response_cache_disk_size: int = 10000
+    response_cache_disk_ttl: Optional[float] = 86400.0
+    # Retries of transient provider failures (attempts include the first call)
+    retry_attempts: int = 3
+    retry_base_delay: float = 0.5
+    retry_max_delay: float = 8.0
+    hedge_requests: bool = False  # Fire a second request after the recent p95 latency
+    # Default deadline of /process and /select-method in seconds, None for no deadline
+    request_timeout: Optional[float] = 120.0
+    # How /select-method picks a method: "local" classifier, "llm" call, or "auto"
+    # (local, asking the model only below method_selector_threshold confidence)
+    method_selector: str = "auto"
+    method_selector_threshold: float = 0.5
+    # Model-made method selections, reused for the same or near-identical questions
+    # (estimated Jaccard similarity of character shingles, 1.0 for exact matches only)
+    selection_cache_size: int = 1024
+    selection_cache_ttl: Optional[float] = 86400.0
+    selection_cache_similarity: float = 0.7
+    # Client-side throttling per provider (and per model within it), "default" for unlisted providers.
+    # Keys: requests_per_second, burst, max_concurrency, min_concurrency
+    rate_limits: Dict[str, Dict[str, Any]] = field(default_factory=lambda: {
+        "default": {"max_concurrency": 16},
+    })
+    # Seconds between checks of api_keys.json and the REASONGRAPH_CONFIG file for changes, None to not watch
+    config_reload_interval: Optional[float] = 2.0
+    # Server-side SVG rendering of diagrams for requests with "render": "svg" (Mermaid CLI, see svg_renderer.py)
+    mermaid_cli: str = "mmdc"
+    svg_render_timeout: float = 60.0
+    svg_cache_size: int = 256
+    svg_cache_dir: Optional[str] = None  # Directory of rendered SVGs shared by worker processes
+    svg_min_lines: int = 50  # Smaller diagrams are quick to lay out and are left to the browser
+    # Minimum seconds between the intermediate diagrams of /process-stream (each re-parses the output so far)
+    stream_diagram_interval: float = 0.5
     
-    def __post_init__(self):
-        """Load API keys after initialization"""
-        self.provider_api_keys = load_api_keys_from_file()
+    _provider_api_keys: Optional[Dict[str, str]] = field(default=None, init=False, repr=False)
+
+    @property
+    def provider_api_keys(self) -> Dict[str, str]:
+        """API keys by provider, loaded from api_keys.json on first use"""
+        if self._provider_api_keys is None:
+            self._provider_api_keys = load_api_keys_from_file()
+        return self._provider_api_keys
+
+    @provider_api_keys.setter
+    def provider_api_keys(self, keys: Dict[str, str]) -> None:
+        self._provider_api_keys = keys
 
     def get_default_api_key(self, provider: str) -> str:
         """Get default API key for specific provider"""
@@ -295,6 +351,22 @@ Path 2:
 
 Note: Each path should be independent and may arrive at different answers. The final answer will be determined by majority voting.'''
     example_question: str = "How many r are there in strawberrrrrrrrry?"
+    # Fan-out execution: one independent completion per path
+    path_prompt_format: str = '''Please solve the question with one independent Chain-of-Thought reasoning path.
+
+Question: {question}
+
+<step number="1">
+[First step of reasoning]
+</step>
+... (add more steps as needed)
+<answer>
+[Final answer, as short as possible]
+</answer>'''
+    num_paths: int = 5
+    temperature: float = 0.7
+    max_workers: int = 5
+    early_stopping: bool = True
 
 @dataclass
 class BeamSearchConfig:
@@ -362,10 +434,40 @@ Best path (path_score: [highest_path_score]):
 </answer>'''
     example_question: str = "Give me two suggestions for transitioning from a journalist to a book editor?"
 
+@dataclass
+class TreeSearchConfig:
+    """Configuration of the multi-call Tree of Thoughts / Beam Search engine"""
+    root_prompt_format: str = '''Please start solving the question with tree search reasoning. Give a brief initial analysis of the problem that breaks down its key aspects, and rate how promising it is with a score between 0 and 1.
+
+Question: {question}
+
+<node score="[score]">
+[Initial analysis of the problem]
+</node>'''
+    expansion_prompt_format: str = '''Please continue solving the question with tree search reasoning. Below is the reasoning path explored so far. Propose up to {width} different next steps that each continue this path in their own way, and rate how promising each step is with a score between 0 and 1. If a step reaches the final answer, state the answer in it and mark it final="true".
+
+Question: {question}
+
+Reasoning so far:
+{path}
+
+<node score="[score]" final="[true or false]">
+[Next reasoning step]
+</node>
+... (one node per proposed step)'''
+    beam_width: int = 2  # Nodes kept for expansion at each depth
+    branching: int = 3  # Children requested per expanded node
+    max_depth: int = 3
+    token_budget: int = 16384  # Sum of max_tokens over all provider calls
+    node_max_tokens: int = 512
+    max_workers: int = 6
+    temperature: float = 0.7
+
 class ReasoningConfig:
     """Main configuration class that manages both general and method-specific configs"""
     def __init__(self):
         self.general = GeneralConfig()
+        self.tree_search = TreeSearchConfig()
         self.methods = {
             "cot": ChainOfThoughtsConfig(),
             "tot": TreeOfThoughtsConfig(),
@@ -374,6 +476,14 @@ class ReasoningConfig:
             "l2m": LeastToMostConfig(),
             "bs": BeamSearchConfig(),
         }
+        # Bumped by changed(); derived data such as the serialized UI payloads is rebuilt when it moves
+        self.version = 0
+        # Number of the ConfigProxy.swap() that made this snapshot current
+        self.generation = 0
+    
+    def changed(self) -> None:
+        """Record that the configuration was modified"""
+        self.version += 1
     
     def get_method_config(self, method_id: str) -> Optional[dict]:
         """Get configuration for specific method"""
@@ -414,8 +524,137 @@ class ReasoningConfig:
         """Add a new reasoning method configuration"""
         if method_id not in self.methods:
             self.methods[method_id] = config
+            self.changed()
         else:
             raise ValueError(f"Method {method_id} already exists")
 
+def load_config_file(file_path: str) -> Dict[str, Any]:
+    """Read an external configuration file, TOML if it ends in .toml, else JSON"""
+    if file_path.endswith(".toml"):
+        with open(file_path, "rb") as f:
+            return tomllib.load(f)
+    with open(file_path, "r") as f:
+        return json.load(f)
+
+def _override(section: Any, values: Dict[str, Any], name: str) -> Any:
+    """Copy of a config dataclass with some fields replaced, rejecting unknown fields"""
+    known = {f.name for f in fields(section) if f.init}
+    unknown = set(values) - known
+    if unknown:
+        raise ValueError(f"Unknown {name} settings: {', '.join(sorted(unknown))}")
+    for key, value in values.items():
+        current = getattr(section, key)
+        if current is None or value is None:
+            continue
+        expected = (int, float) if type(current) is float else type(current)
+        if not isinstance(value, expected) or (isinstance(value, bool) and type(current) is not bool):
+            raise ValueError(f"Invalid {name} setting {key}: expected {type(current).__name__}")
+    return replace(section, **values)
+
+def build_config(config_file: Optional[str] = None, api_keys_file: Optional[str] = None) -> ReasoningConfig:
+    """
+    Build a configuration snapshot: the defaults, overridden by a config file.
+
+    The file may override fields of "general" and "tree_search", and of each
+    method under "methods", e.g. {"methods": {"cot": {"prompt_format": "..."}}}.
+    Raises ValueError (or OSError) if the file cannot be read or is invalid.
+    """
+    snapshot = ReasoningConfig()
+    data = load_config_file(config_file) if config_file else {}
+    unknown = set(data) - {"general", "tree_search", "methods"}
+    if unknown:
+        raise ValueError(f"Unknown config sections: {', '.join(sorted(unknown))}")
+    if "general" in data:
+        snapshot.general = _override(snapshot.general, data["general"], "general")
+    if "tree_search" in data:
+        snapshot.tree_search = _override(snapshot.tree_search, data["tree_search"], "tree_search")
+    for method_id, values in data.get("methods", {}).items():
+        if method_id not in snapshot.methods:
+            raise ValueError(f"Unknown reasoning method: {method_id}")
+        snapshot.methods[method_id] = _override(snapshot.methods[method_id], values, method_id)
+    if api_keys_file:
+        snapshot.general.provider_api_keys = load_api_keys_from_file(api_keys_file)
+    return snapshot
+
+# on_reload callback(old snapshot, new snapshot)
+ReloadCallback = Callable[[ReasoningConfig, ReasoningConfig], None]
+
+# Snapshot pinned by ConfigProxy.pin() for the code running in this context, e.g. one request
+_pinned: contextvars.ContextVar[Optional[ReasoningConfig]] = contextvars.ContextVar("pinned_config", default=None)
+
+class ConfigProxy:
+    """
+    The process-wide configuration, as a stand-in for its current snapshot.
+
+    Attribute access is forwarded to the current ReasoningConfig snapshot, so
+    modules can keep the object they imported while swap() replaces the
+    snapshot behind it. Reloads never modify a snapshot in place, and code
+    running within pin() keeps reading the snapshot pinned there: the
+    application pins one per request, so a request in flight sees a single
+    configuration however many times it reads it.
+    """
+
+    def __init__(self, snapshot: ReasoningConfig):
+        object.__setattr__(self, "_snapshot", snapshot)
+        object.__setattr__(self, "_callbacks", [])
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.snapshot(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.snapshot(), name, value)
+
+    @property
+    def version(self) -> tuple:
+        """Version of the snapshot read in this context; changes whenever one is swapped in or changed()"""
+        snapshot = self.snapshot()
+        return (snapshot.generation, snapshot.version)
+
+    def snapshot(self) -> ReasoningConfig:
+        """The pinned snapshot if any, else the current one, to read several settings consistently"""
+        pinned = _pinned.get()
+        return self._snapshot if pinned is None else pinned
+
+    def pin(self, snapshot: Optional[ReasoningConfig] = None) -> contextvars.Token:
+        """Make the current context read snapshot (default: the current one) until unpin(token)"""
+        return _pinned.set(snapshot if snapshot is not None else self.snapshot())
+
+    def unpin(self, token: contextvars.Token) -> None:
+        try:
+            _pinned.reset(token)
+        except ValueError:
+            # Unpinned from another context than the one pinned, e.g. after a streamed response
+            _pinned.set(None)
+
+    @contextlib.contextmanager
+    def pinned(self, snapshot: Optional[ReasoningConfig] = None) -> Iterator[ReasoningConfig]:
+        """Read snapshot (default: the current one) within the block"""
+        token = self.pin(snapshot)
+        try:
+            yield _pinned.get()
+        finally:
+            self.unpin(token)
+
+    def swap(self, snapshot: ReasoningConfig) -> ReasoningConfig:
+        """Make a new snapshot current, notify on_reload callbacks and return the previous one"""
+        with self._lock:
+            old = self._snapshot
+            snapshot.generation = old.generation + 1
+            object.__setattr__(self, "_snapshot", snapshot)
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(old, snapshot)
+            except Exception as e:
+                logger.error(f"Config reload callback {getattr(callback, '__name__', callback)} failed: {str(e)}")
+        return old
+
+    def on_reload(self, callback: ReloadCallback) -> ReloadCallback:
+        """Register a callback called with (old, new) snapshot after every swap; usable as a decorator"""
+        with self._lock:
+            self._callbacks.append(callback)
+        return callback
+
 # Create global config instance
-config = ReasoningConfig()
\ No newline at end of file
+config = ConfigProxy(ReasoningConfig())
\ No newline at end of file
@@ -1,8 +1,8 @@
-import re
 import requests
-import textwrap
+import text_wrap
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Iterable, List, Optional, TextIO
+from tag_parser import iter_elements
 
 @dataclass
 class CoTStep:
@@ -94,19 +94,15 @@ def wrap_text(text: str, config: VisualizationConfig) -> str:
     Returns:
         Wrapped text with line breaks
     """
-    # Clean the text first
-    text = text.replace('\n', ' ').replace('"', "'")
-    
-    # Wrap the text into lines
-    wrapped_lines = textwrap.wrap(text, width=config.max_chars_per_line)
-    
-    # Limit number of lines and add truncation if necessary
-    if len(wrapped_lines) > config.max_lines:
-        wrapped_lines = wrapped_lines[:config.max_lines-1]
-        wrapped_lines.append(wrapped_lines[-1][:config.max_chars_per_line-3] + config.truncation_suffix)
-    
-    # Join with <br> for HTML line breaks in Mermaid
-    return "<br>".join(wrapped_lines)
+    return text_wrap.wrap_text(text, config.max_chars_per_line, config.max_lines, config.truncation_suffix)
+
+def write_lines(lines: Iterable[str], out: TextIO) -> None:
+    """Write lines to a text buffer as they are produced, separated by newlines"""
+    separator = ''
+    for line in lines:
+        out.write(separator)
+        out.write(line)
+        separator = '\n'
 
 def parse_cot_response(response_text: str, question: str) -> CoTResponse:
     """
@@ -119,18 +115,17 @@ def parse_cot_response(response_text: str, question: str) -> CoTResponse:
     Returns:
         CoTResponse object containing question, steps, and answer
     """
-    # Extract all steps
-    step_pattern = r'<step number="(\d+)">\s*(.*?)\s*</step>'
     steps = []
-    for match in re.finditer(step_pattern, response_text, re.DOTALL):
-        number = int(match.group(1))
-        content = match.group(2).strip()
-        steps.append(CoTStep(number=number, content=content))
-    
-    # Extract answer
-    answer_pattern = r'<answer>\s*(.*?)\s*</answer>'
-    answer_match = re.search(answer_pattern, response_text, re.DOTALL)
-    answer = answer_match.group(1).strip() if answer_match else None
+    answer = None
+    for element in iter_elements(response_text):
+        if element.name == 'step':
+            # Extract all numbered steps
+            number = element.int_attr('number')
+            if number is not None:
+                steps.append(CoTStep(number=number, content=element.content))
+        elif element.name == 'answer' and answer is None:
+            # Extract the first answer
+            answer = element.content
     
     # Sort steps by number
     steps.sort(key=lambda x: x.number)
@@ -0,0 +1,124 @@
+"""
+Per-request deadlines.
+
+A request handler opens a deadline_scope(); the deadline lives in a context
+variable, so every provider call made on behalf of the request (including
+retries, and calls on worker threads started with contextvars.copy_context())
+can bound its own timeouts by the time that is left.
+
+Work a request abandons, e.g. a discarded speculative run, is stopped the
+same way: within a cancel_scope() the deadline counts as passed once the
+scope's event is set, so the next provider call or stream chunk raises
+RequestCancelled instead of starting.
+"""
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+_cancel: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar("cancel", default=None)
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs past its deadline"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        message = "Request deadline exceeded"
+        if timeout is not None:
+            message = f"Request timed out after {timeout:g}s"
+        super().__init__(message)
+
+class RequestCancelled(DeadlineExceeded):
+    """Raised in work whose cancel_scope() event was set"""
+
+    def __init__(self):
+        super().__init__()
+        self.args = ("Request cancelled",)
+
+@contextlib.contextmanager
+def deadline_scope(timeout: Optional[float]) -> Iterator[None]:
+    """Run the enclosed code with a deadline timeout seconds from now (None: no deadline)"""
+    if timeout is None:
+        yield
+        return
+    token = _deadline.set(time.monotonic() + timeout)
+    try:
+        yield
+    except DeadlineExceeded as e:
+        if e.timeout is None and not isinstance(e, RequestCancelled):
+            e.timeout = timeout
+            e.args = (f"Request timed out after {timeout:g}s",)
+        raise
+    finally:
+        _deadline.reset(token)
+
+@contextlib.contextmanager
+def cancel_scope(event: threading.Event) -> Iterator[None]:
+    """Run the enclosed code so that setting event ends it like a passed deadline"""
+    token = _cancel.set(event)
+    try:
+        yield
+    finally:
+        _cancel.reset(token)
+
+def cancelled() -> bool:
+    """Whether the event of the current cancel_scope() is set"""
+    event = _cancel.get()
+    return event is not None and event.is_set()
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current deadline, None without one (0.0 once cancelled)"""
+    if cancelled():
+        return 0.0
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+def _expired_error() -> DeadlineExceeded:
+    return RequestCancelled() if cancelled() else DeadlineExceeded()
+
+def check_deadline() -> None:
+    """Raise DeadlineExceeded if the current deadline has passed (RequestCancelled if cancelled)"""
+    if expired():
+        raise _expired_error()
+
+def clip_timeout(timeout: Optional[float]) -> Optional[float]:
+    """Bound a timeout by the current deadline, raising if it has already passed"""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise _expired_error()
+    return left if timeout is None else min(timeout, left)
+
+def clip_timeouts(connect: float, read: float) -> Tuple[float, float]:
+    """Bound a (connect, read) timeout pair by the current deadline"""
+    return clip_timeout(connect), clip_timeout(read)
+
+def request_timeout(data: Optional[Dict[str, Any]]) -> Optional[float]:
+    """
+    Timeout in seconds requested by a request body.
+
+    Taken from its 'timeout' field (seconds) or 'deadline' field (Unix
+    timestamp), else GeneralConfig.request_timeout. Raises ValueError if invalid.
+    """
+    data = data or {}
+    if data.get('timeout') is not None:
+        timeout = float(data['timeout'])
+    elif data.get('deadline') is not None:
+        timeout = float(data['deadline']) - time.time()
+        if timeout <= 0:
+            raise ValueError('Deadline has already passed')
+    else:
+        from configs import config
+        return config.general.request_timeout
+    if timeout <= 0:
+        raise ValueError('Timeout must be positive')
+    return timeout
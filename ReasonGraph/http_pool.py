@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deadline import clip_timeouts
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class HTTPPoolConfig:
+    """Configuration for the shared provider HTTP transport"""
+    pool_connections: int = 16     # Number of per-host pools kept alive
+    pool_maxsize: int = 32         # Keep-alive connections kept per host
+    pool_block: bool = False       # Block instead of opening extra connections when a host pool is full
+    keep_alive: bool = True
+    connect_timeout: float = 10.0
+    read_timeout: float = 300.0
+
+class HTTPPool:
+    """
+    Process-wide, thread-safe pool of keep-alive HTTP connections.
+
+    All threads share one HTTPAdapter (and therefore one urllib3 pool per
+    host), while each thread gets its own requests.Session so that session
+    state such as cookies is never shared between concurrent requests.
+    """
+
+    def __init__(self, config: Optional[HTTPPoolConfig] = None):
+        self.config = config or HTTPPoolConfig()
+        self._adapter = HTTPAdapter(
+            pool_connections=self.config.pool_connections,
+            pool_maxsize=self.config.pool_maxsize,
+            pool_block=self.config.pool_block
+        )
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Counters of host pools that were evicted from the pool manager
+        self._retired = {"requests": 0, "connections": 0}
+
+        pools = self._adapter.poolmanager.pools
+        dispose = pools.dispose_func
+
+        def retire(pool):
+            with self._lock:
+                self._retired["requests"] += pool.num_requests
+                self._retired["connections"] += pool.num_connections
+            if dispose:
+                dispose(pool)
+
+        pools.dispose_func = retire
+
+    @property
+    def timeout(self) -> tuple:
+        """Default (connect, read) timeout tuple"""
+        return (self.config.connect_timeout, self.config.read_timeout)
+
+    def session(self) -> requests.Session:
+        """Get the calling thread's session bound to the shared adapter"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            if not self.config.keep_alive:
+                session.headers["Connection"] = "close"
+            self._local.session = session
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the pool, applying the default timeouts bounded by the request deadline"""
+        if "timeout" not in kwargs:
+            kwargs["timeout"] = clip_timeouts(*self.timeout)
+        return self.session().request(method, url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request through the pool"""
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report connection reuse for every host pool.
+
+        A miss is a request that had to open a new connection, a hit is a
+        request served by an already open keep-alive connection.
+        """
+        pools = self._adapter.poolmanager.pools
+        hosts = {}
+        total_requests = total_connections = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            num_requests, num_connections = pool.num_requests, pool.num_connections
+            total_requests += num_requests
+            total_connections += num_connections
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "requests": num_requests,
+                "hits": max(num_requests - num_connections, 0),
+                "misses": num_connections,
+                "idle_connections": self._idle_connections(pool)
+            }
+
+        with self._lock:
+            total_requests += self._retired["requests"]
+            total_connections += self._retired["connections"]
+
+        return {
+            "requests": total_requests,
+            "hits": max(total_requests - total_connections, 0),
+            "misses": total_connections,
+            "hosts": hosts,
+            "pool_maxsize": self.config.pool_maxsize,
+            "keep_alive": self.config.keep_alive
+        }
+
+    @staticmethod
+    def _idle_connections(pool) -> int:
+        """Count open connections waiting in a host pool (empty slots hold None)"""
+        if pool.pool is None:
+            return 0
+        return sum(1 for conn in list(pool.pool.queue) if conn is not None)
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self._adapter.close()
+
+_pool: Optional[HTTPPool] = None
+_pool_lock = threading.Lock()
+
+def get_http_pool() -> HTTPPool:
+    """Get the process-wide HTTP pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HTTPPool()
+    return _pool
+
+def configure_http_pool(config: HTTPPoolConfig) -> HTTPPool:
+    """Replace the process-wide HTTP pool with one using the given configuration"""
+    global _pool
+    with _pool_lock:
+        old_pool, _pool = _pool, HTTPPool(config)
+    if old_pool is not None:
+        old_pool.close()
+    logger.info(f"Configured HTTP pool: {config}")
+    return _pool
+
+# One httpx.AsyncClient per event loop, since async clients cannot be shared across loops
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+def get_async_http_client():
+    """Get the keep-alive httpx.AsyncClient shared within the running event loop"""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        config = get_http_pool().config
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=None,
+                max_keepalive_connections=config.pool_maxsize if config.keep_alive else 0
+            ),
+            timeout=httpx.Timeout(config.read_timeout, connect=config.connect_timeout)
+        )
+        _async_clients[loop] = client
+    return client
+
+async def close_async_http_client() -> None:
+    """Close the async client of the running event loop, if one was created"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,7 +1,7 @@
-import re
 from dataclasses import dataclass
 from typing import List, Optional
-import textwrap
+from text_wrap import wrap_text
+from tag_parser import iter_elements
 
 @dataclass
 class L2MStep:
@@ -29,43 +29,33 @@ def parse_l2m_response(response_text: str, question: str) -> L2MResponse:
     Returns:
         L2MResponse object containing main question, steps, and final answer
     """
-    # Extract all steps
-    step_pattern = r'<step number="(\d+)">\s*<question>(.*?)</question>\s*<reasoning>(.*?)</reasoning>\s*<answer>(.*?)</answer>\s*</step>'
     steps = []
-    
-    for match in re.finditer(step_pattern, response_text, re.DOTALL):
-        number = int(match.group(1))
-        sub_question = match.group(2).strip()
-        reasoning = match.group(3).strip()
-        answer = match.group(4).strip()
-        steps.append(L2MStep(
-            number=number,
-            question=sub_question,
-            reasoning=reasoning,
-            answer=answer
-        ))
-    
-    # Extract final answer
-    final_answer_pattern = r'<final_answer>\s*(.*?)\s*</final_answer>'
-    final_answer_match = re.search(final_answer_pattern, response_text, re.DOTALL)
-    final_answer = final_answer_match.group(1).strip() if final_answer_match else None
+    final_answer = None
+    
+    for element in iter_elements(response_text):
+        if element.name == 'step':
+            # Extract steps with their sub-question, reasoning and answer
+            number = element.int_attr('number')
+            sub_question = element.child('question')
+            reasoning = element.child('reasoning')
+            answer = element.child('answer')
+            if number is None or not (sub_question and reasoning and answer):
+                continue
+            steps.append(L2MStep(
+                number=number,
+                question=sub_question.content,
+                reasoning=reasoning.content,
+                answer=answer.content
+            ))
+        elif element.name == 'final_answer' and final_answer is None:
+            # Extract final answer
+            final_answer = element.content
     
     # Sort steps by number
     steps.sort(key=lambda x: x.number)
     
     return L2MResponse(main_question=question, steps=steps, final_answer=final_answer)
 
-def wrap_text(text: str, max_chars: int = 40, max_lines: int = 4) -> str:
-    """Wrap text to fit within box constraints with proper line breaks."""
-    text = text.replace('\n', ' ').replace('"', "'")
-    wrapped_lines = textwrap.wrap(text, width=max_chars)
-    
-    if len(wrapped_lines) > max_lines:
-        wrapped_lines = wrapped_lines[:max_lines-1]
-        wrapped_lines.append(wrapped_lines[-1][:max_chars-3] + "...")
-    
-    return "<br>".join(wrapped_lines)
-
 def create_mermaid_diagram(l2m_response: L2MResponse, config: 'VisualizationConfig') -> str:
     """
     Convert L2M steps to Mermaid diagram.
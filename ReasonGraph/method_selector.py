@@ -0,0 +1,147 @@
+"""
+Offline reasoning method selection.
+
+A keyword and feature classifier that picks one of the configured reasoning
+methods from the question text alone, in a few microseconds and without a
+provider call. Every method has a prior and a list of weighted patterns;
+the scores are turned into probabilities with a softmax and the top
+probability is reported as the confidence, so callers can fall back to
+asking the model when the question matches nothing distinctive.
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Used when no method scores above its prior
+DEFAULT_METHOD = 'cot'
+
+# Sharpness of the softmax over method scores
+_TEMPERATURE = 1.0
+
+_PRIORS = {
+    'cot': 0.5,
+    'tot': 0.0,
+    'scr': 0.0,
+    'srf': 0.0,
+    'l2m': 0.0,
+    'bs': 0.0,
+}
+
+# (pattern, weight) per method, matched case-insensitively against the question
+_KEYWORDS = {
+    'cot': [
+        (r'\bhow (?:many|much|long|far|old)\b', 1.0),
+        (r'\b(?:altogether|in total|total|sum|average|remaining|left over)\b', 1.0),
+        (r'\b(?:calculate|compute|solve|evaluate|simplify)\b', 1.0),
+        (r'\b(?:twice|half|double|triple|percent|per cent|ratio)\b|%', 0.8),
+        (r'\b(?:equation|formula|probability|speed|price|cost|profit)\b', 0.6),
+        (r'\b(?:why|explain)\b', 0.5),
+    ],
+    'tot': [
+        (r'\busing (?:the |only )?(?:numbers|digits)\b', 2.0),
+        (r'\bmake (?:exactly )?\d+\b|\b24 game\b', 1.5),
+        (r'\bfind a way\b|\bis it possible\b', 1.0),
+        (r'\b(?:puzzle|riddle|sudoku|crossword|maze|chess|game)\b', 1.5),
+        (r'\b(?:arrange|arrangement|permutation|combination)s?\b', 1.0),
+        (r'\b(?:each|every) (?:number|digit|piece)\b|\bexactly once\b', 1.0),
+        (r'\barithmetic operations?\b', 0.8),
+    ],
+    'scr': [
+        (r'\bhow many (?:[a-z]|letters?|vowels?|consonants?|words?|characters?|syllables?)\b', 2.5),
+        (r'\b(?:count|spell|spelled|spelling)\b', 1.0),
+        (r'\btrue or false\b|\byes or no\b', 1.5),
+        (r'\bwhich (?:is|one is) (?:larger|bigger|greater|smaller|heavier|older)\b', 1.5),
+        (r'\b(?:larger|bigger|greater|smaller) than\b', 0.8),
+    ],
+    'srf': [
+        (r'\b(?:write|compose|draft)\b', 1.5),
+        (r'\b(?:improve|refine|revise|rewrite|polish|edit|proofread|critique)\b', 2.0),
+        (r'\b(?:essay|poem|story|fiction|sentence|paragraph|slogan|email|letter|summary|tweet)\b', 1.0),
+        (r'\b(?:code|function|program|script)\b', 0.8),
+    ],
+    'l2m': [
+        (r'\bhow (?:to|do i|can i|should i|would you)\b', 1.5),
+        (r'\b(?:steps?|procedure|process|guide|tutorial|roadmap)\b', 1.0),
+        (r'\b(?:create|build|set up|setup|make a|design|implement|develop|learn)\b', 1.0),
+        (r'\b(?:break (?:it )?down|sub-?(?:questions?|problems?|tasks?))\b', 1.5),
+        (r'\b(?:first|then|after that|finally)\b', 0.5),
+    ],
+    'bs': [
+        (r'\b(?:suggestions?|recommendations?|recommend|advice|tips|ideas)\b', 2.0),
+        (r'\b(?:options?|alternatives?|strateg(?:y|ies)|approaches)\b', 1.0),
+        (r'\b(?:best way|best approach|which approach|should i|pros and cons|trade-?offs?)\b', 1.5),
+        (r'\b(?:transition(?:ing)?|career|switch(?:ing)?|choose|choosing|decide)\b', 1.0),
+    ],
+}
+
+_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+def _count_numbers(question: str) -> int:
+    return len(_NUMBER_PATTERN.findall(question))
+
+# (method, feature, weight): feature(question, word_count) returns a score in [0, 1]
+_FEATURES: List[Tuple[str, Callable[[str, int], float], float]] = [
+    # Word problems quote several quantities
+    ('cot', lambda q, words: min(_count_numbers(q), 3) / 3, 1.0),
+    # Short questions with a single checkable answer are cheap to sample repeatedly
+    ('scr', lambda q, words: 1.0 if words <= 12 and q.rstrip().endswith('?') else 0.0, 0.3),
+    # Long, multi-part questions benefit from decomposition
+    ('l2m', lambda q, words: min(max(words - 40, 0) / 60, 1.0), 1.0),
+]
+
+_COMPILED = {
+    method: [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in rules]
+    for method, rules in _KEYWORDS.items()
+}
+
+@dataclass
+class MethodSelection:
+    """A selected reasoning method and how sure the selector is about it"""
+    method: str
+    confidence: float  # Probability of the method among the candidates, 0 to 1
+    scores: Dict[str, float]
+    source: str = 'local'  # 'local' classifier or 'llm'
+
+def score_methods(question: str, methods: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Raw classifier score of every candidate method (all known ones by default)"""
+    candidates = [m for m in (methods if methods is not None else _PRIORS) if m in _PRIORS]
+    words = len(question.split())
+    scores = {}
+    for method in candidates:
+        score = _PRIORS[method]
+        for pattern, weight in _COMPILED[method]:
+            if pattern.search(question):
+                score += weight
+        scores[method] = score
+    for method, feature, weight in _FEATURES:
+        if method in scores:
+            scores[method] += weight * feature(question, words)
+    return scores
+
+def select_method_locally(question: str, methods: Optional[Iterable[str]] = None) -> MethodSelection:
+    """
+    Pick a reasoning method for a question without calling a model.
+
+    Args:
+        question: The question text
+        methods: Candidate method ids, e.g. config.methods (all known methods by default)
+
+    Returns:
+        MethodSelection of the best scoring method, DEFAULT_METHOD when every score ties
+    """
+    scores = score_methods(question, methods)
+    if not scores:
+        raise ValueError('No known reasoning method among the candidates')
+
+    best = max(scores, key=scores.get)
+    if DEFAULT_METHOD in scores and scores[DEFAULT_METHOD] == scores[best]:
+        best = DEFAULT_METHOD
+
+    top = scores[best]
+    total = sum(math.exp((score - top) / _TEMPERATURE) for score in scores.values())
+    return MethodSelection(
+        method=best,
+        confidence=1.0 / total,
+        scores={method: round(score, 3) for method, score in scores.items()}
+    )
@@ -0,0 +1,284 @@
+"""
+Client-side throttling of provider calls.
+
+Every (provider, model) pair gets an AdaptiveLimiter combining a token
+bucket (request rate) with an AIMD concurrency limit: each successful call
+raises the concurrency limit additively, each 429 halves it and pauses the
+pair for the Retry-After period. Calls over the limits wait in a queue
+instead of failing, so bursts are smoothed into steady throughput near the
+provider quota. Threads and asyncio tasks share the same limiter: threads
+block on acquire(), tasks await acquire_async().
+"""
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from deadline import DeadlineExceeded, clip_timeout
+
+logger = logging.getLogger(__name__)
+
+# Pause after a 429 without a usable Retry-After header, in seconds
+DEFAULT_THROTTLE_DELAY = 1.0
+
+# How often asyncio tasks waiting for a released slot check again, in seconds
+ASYNC_POLL_INTERVAL = 0.02
+
+class RateLimitTimeout(Exception):
+    """Raised when a call waited longer than its timeout for a slot"""
+    pass
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of a provider error (requests, httpx or SDK exception), None if unknown"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def retry_after(source: Any) -> Optional[float]:
+    """Seconds from the Retry-After header of a response or provider error, None if absent"""
+    response = getattr(source, "response", None) if isinstance(source, BaseException) else source
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class _Slot:
+    """An admitted call; marked throttled when the provider answered 429"""
+    __slots__ = ("throttled", "retry_after")
+
+    def __init__(self):
+        self.throttled = False
+        self.retry_after: Optional[float] = None
+
+    def check(self, result: Any) -> None:
+        """Inspect a raw HTTP response for a 429"""
+        if getattr(result, "status_code", None) == 429:
+            self.throttled = True
+            self.retry_after = retry_after(result)
+
+class AdaptiveLimiter:
+    """
+    Token bucket plus AIMD concurrency limit for one provider and model.
+
+    Waiting callers are woken whenever a slot is released or a pause ends.
+    """
+
+    def __init__(self, name: str, requests_per_second: Optional[float] = None,
+                 burst: Optional[int] = None, max_concurrency: int = 16, min_concurrency: int = 1):
+        self.name = name
+        self.max_rate = requests_per_second
+        self.rate = requests_per_second
+        self.burst = burst or (max(1, int(requests_per_second)) if requests_per_second else 1)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _delay(self, now: float) -> Optional[float]:
+        """Seconds until a call may start, 0 if now, None if it waits for a release"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.in_flight >= max(self.min_concurrency, int(self.limit)):
+            return None
+        if self.rate and self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0.0
+
+    def _try_admit(self, start: float, timeout: Optional[float]) -> Optional[float]:
+        """
+        Admit a call that may start now (0.0), else the seconds to wait before
+        trying again, None to wait for a release. Called with the lock held.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        delay = self._delay(now)
+        if delay == 0.0:
+            if self.rate:
+                self._tokens -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            waited = now - start
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            return 0.0
+        if timeout is not None:
+            remaining = start + timeout - now
+            if remaining <= 0:
+                raise RateLimitTimeout(f"Timed out waiting for a {self.name} request slot")
+            delay = remaining if delay is None else min(delay, remaining)
+        return delay
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """Wait for a slot, returning the time spent queued"""
+        start = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    delay = self._try_admit(start, timeout)
+                    if delay == 0.0:
+                        break
+                    self._cond.wait(delay)
+            finally:
+                self.waiting -= 1
+        return time.monotonic() - start
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> float:
+        """Like acquire, waiting without blocking the event loop"""
+        start = time.monotonic()
+        with self._cond:
+            self.waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_admit(start, timeout)
+                if delay == 0.0:
+                    break
+                # Releases only notify threads, so tasks waiting for one poll
+                await asyncio.sleep(ASYNC_POLL_INTERVAL if delay is None else delay)
+        finally:
+            with self._cond:
+                self.waiting -= 1
+        return time.monotonic() - start
+
+    def release(self, throttled: bool = False, retry_after: Optional[float] = None) -> None:
+        """Return a slot, adapting the limits to the outcome of the call"""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                # Multiplicative decrease and a pause for the provider's Retry-After
+                self.throttled += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                if self.rate:
+                    self.rate = max(self.max_rate / 16, self.rate / 2)
+                    self._tokens = 0.0
+                delay = DEFAULT_THROTTLE_DELAY if retry_after is None else retry_after
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(f"{self.name} throttled: concurrency limit {self.limit:.1f}, "
+                               f"pausing {delay:.1f}s")
+            else:
+                # Additive increase back towards the configured limits
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                if self.rate:
+                    self.rate = min(self.max_rate, self.rate + self.max_rate / 16)
+            self._cond.notify_all()
+
+    def call(self, request, *args, **kwargs):
+        """Run request(*args, **kwargs) within a slot, queueing no longer than the request deadline allows"""
+        try:
+            self.acquire(clip_timeout(None))
+        except RateLimitTimeout:
+            raise DeadlineExceeded()
+        slot = _Slot()
+        try:
+            result = request(*args, **kwargs)
+            slot.check(result)
+            return result
+        except Exception as e:
+            if error_status(e) == 429:
+                slot.throttled = True
+                slot.retry_after = retry_after(e)
+            raise
+        finally:
+            self.release(slot.throttled, slot.retry_after)
+
+    async def call_async(self, request, *args, **kwargs):
+        """Await request(*args, **kwargs) within a slot, like call"""
+        try:
+            await self.acquire_async(clip_timeout(None))
+        except RateLimitTimeout:
+            raise DeadlineExceeded()
+        slot = _Slot()
+        try:
+            result = await request(*args, **kwargs)
+            slot.check(result)
+            return result
+        except Exception as e:
+            if error_status(e) == 429:
+                slot.throttled = True
+                slot.retry_after = retry_after(e)
+            raise
+        finally:
+            self.release(slot.throttled, slot.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "concurrency_limit": round(self.limit, 2),
+                "rate": self.rate,
+                "admitted": self.admitted,
+                "throttled": self.throttled,
+                "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 3) if self.admitted else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3)
+            }
+
+_limiters: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+# Limits set by configure_rate_limit(), taking precedence over the configuration
+_overrides: Dict[str, Dict[str, Any]] = {}
+
+def get_rate_limiter(provider: str, model: str) -> AdaptiveLimiter:
+    """
+    Get the limiter of a provider and model, configured from GeneralConfig.rate_limits.
+
+    provider is the provider's key in APIFactory ("anthropic", "openai", ...).
+    """
+    key = (provider.lower(), model)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                from configs import config
+                limits = config.general.rate_limits
+                settings = _overrides.get(key[0]) or limits.get(key[0], limits.get("default", {}))
+                limiter = _limiters[key] = AdaptiveLimiter(f"{key[0]}/{model}", **settings)
+    return limiter
+
+def configure_rate_limit(provider: str, **settings: Any) -> None:
+    """Set the limits of a provider for this process (e.g. from a command line option), replacing its limiters"""
+    with _limiters_lock:
+        _overrides[provider.lower()] = settings
+        for key in [key for key in _limiters if key[0] == provider.lower()]:
+            del _limiters[key]
+
+def reset_rate_limiters() -> None:
+    """Drop every limiter; the next calls get new ones from the current configuration"""
+    with _limiters_lock:
+        _limiters.clear()
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistics of every limiter, keyed by provider/model"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -0,0 +1,34 @@
+from cot_reasoning import (
+    create_mermaid_diagram as create_cot_diagram,
+    parse_cot_response
+)
+from tot_reasoning import (
+    create_mermaid_diagram as create_tot_diagram,
+    parse_tot_response
+)
+from l2m_reasoning import (
+    create_mermaid_diagram as create_l2m_diagram,
+    parse_l2m_response
+)
+from selfconsistency_reasoning import (
+    create_mermaid_diagram as create_scr_diagram,
+    parse_scr_response
+)
+from selfrefine_reasoning import (
+    create_mermaid_diagram as create_srf_diagram,
+    parse_selfrefine_response
+)
+from bs_reasoning import (
+    create_mermaid_diagram as create_bs_diagram,
+    parse_bs_response
+)
+
+# Response parser and diagram builder of every reasoning method
+REASONING_METHODS = {
+    'cot': (parse_cot_response, create_cot_diagram),
+    'tot': (parse_tot_response, create_tot_diagram),
+    'l2m': (parse_l2m_response, create_l2m_diagram),
+    'scr': (parse_scr_response, create_scr_diagram),
+    'srf': (parse_selfrefine_response, create_srf_diagram),
+    'bs': (parse_bs_response, create_bs_diagram),
+}
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+
+from caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+class ResponseStore(ABC):
+    """Abstract base class of a raw model response store tier"""
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Get a stored response, None on a miss"""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+class MemoryStore(ResponseStore):
+    """In-process LRU tier"""
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 3600.0):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self._cache.set(key, value)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+class SQLiteStore(ResponseStore):
+    """
+    On-disk tier kept in a SQLite file, shared by worker processes and
+    surviving restarts. Entries older than ttl seconds are ignored and the
+    least recently used ones are deleted beyond maxsize.
+    """
+
+    name = "disk"
+
+    def __init__(self, path: str, maxsize: int = 10000, ttl: Optional[float] = 86400.0):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,)
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "path": self.path,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+class ResponseCache:
+    """
+    Tiered cache of raw model responses.
+
+    Lookups try the memory tier first, then the optional disk tier, promoting
+    disk hits into memory. Stores write through to every tier.
+    """
+
+    def __init__(self, memory: Optional[ResponseStore] = None, disk: Optional[ResponseStore] = None):
+        self.tiers = [tier for tier in (memory or MemoryStore(), disk) if tier is not None]
+
+    @staticmethod
+    def make_key(**fields: Any) -> str:
+        """Hash the request fields that determine the model response"""
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Tuple[Optional[str], Optional[str]]:
+        """Get (response, tier name), or (None, None) on a miss"""
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache {tier.name} tier lookup failed: {str(e)}")
+                continue
+            if value is not None:
+                self._store(self.tiers[:index], key, value)
+                return value, tier.name
+        return None, None
+
+    @staticmethod
+    def _store(tiers, key: str, value: str) -> None:
+        for tier in tiers:
+            try:
+                tier.set(key, value)
+            except Exception as e:
+                logger.warning(f"Response cache {tier.name} tier store failed: {str(e)}")
+
+    def set(self, key: str, value: str) -> None:
+        self._store(self.tiers, key, value)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {tier.name: tier.stats() for tier in self.tiers}
+
+    def close(self) -> None:
+        for tier in self.tiers:
+            tier.close()
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+def _cache_from_config() -> ResponseCache:
+    from configs import config
+    general = config.general
+    disk = None
+    if general.response_cache_path:
+        try:
+            disk = SQLiteStore(general.response_cache_path, general.response_cache_disk_size,
+                               general.response_cache_disk_ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache disk tier disabled: {str(e)}")
+    return ResponseCache(MemoryStore(general.response_cache_size, general.response_cache_ttl), disk)
+
+def get_response_cache() -> ResponseCache:
+    """Get the process-wide response cache, creating it from the configuration on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _cache_from_config()
+    return _cache
+
+def configure_response_cache(cache: ResponseCache) -> ResponseCache:
+    """
+    Replace the process-wide response cache.
+
+    The previous cache is not closed: requests in flight may still hold it,
+    and its SQLite connection is closed when it is garbage-collected.
+    """
+    global _cache
+    with _cache_lock:
+        _cache = cache
+    return _cache
+
+def reset_response_cache() -> None:
+    """Drop the process-wide response cache; it is created again from the configuration on next use"""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,315 @@
+"""
+Retries and hedged requests for provider calls.
+
+Transient failures (connection errors, timeouts, 429 and 5xx responses)
+are retried with full-jitter exponential backoff, honouring Retry-After.
+With hedging enabled, a second identical request is fired when the first
+has not answered within the recent p95 latency of its provider and model.
+Whichever succeeds first is used; the other is cancelled (a thread already
+running a synchronous request cannot be interrupted, so its response is
+closed when it arrives).
+
+The configured number of attempts can be overridden for the calls made
+within a retry_scope(), e.g. by a batch job with its own retry budget.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+
+from deadline import DeadlineExceeded, remaining
+from rate_limit import error_status, retry_after
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+_TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+def _sdk_transient_errors() -> Tuple[type, ...]:
+    """Transient errors of the provider SDKs that are loaded (they are imported lazily)"""
+    openai = sys.modules.get("openai")
+    error = getattr(openai, "APIConnectionError", None)  # Includes APITimeoutError
+    return (error,) if error is not None else ()
+
+@dataclass
+class RetryPolicy:
+    """How provider calls are retried and hedged"""
+    attempts: int = 3  # Total attempts, including the first
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 20  # Latency samples needed before hedging starts
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential delay before the next attempt, at least Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether an exception is a transient provider failure"""
+    if isinstance(error, _TRANSIENT_ERRORS + _sdk_transient_errors()):
+        return True
+    status = error_status(error)
+    return status in RETRYABLE_STATUS
+
+def is_retryable_response(result: Any) -> bool:
+    """Whether a raw HTTP response carries a transient error status"""
+    return getattr(result, "status_code", None) in RETRYABLE_STATUS
+
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, window: int = 256):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def timed(self, request: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap request to record the latency of its successful calls"""
+        def timed_request(*args, **kwargs):
+            start = time.monotonic()
+            result = request(*args, **kwargs)
+            if not is_retryable_response(result):
+                self.record(time.monotonic() - start)
+            return result
+        return timed_request
+
+    def timed_async(self, request: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Like timed for a coroutine function"""
+        async def timed_request(*args, **kwargs):
+            start = time.monotonic()
+            result = await request(*args, **kwargs)
+            if not is_retryable_response(result):
+                self.record(time.monotonic() - start)
+            return result
+        return timed_request
+
+    def quantile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+_attempts: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("retry_attempts", default=None)
+
+@contextlib.contextmanager
+def retry_scope(attempts: int) -> Iterator[None]:
+    """Make the provider calls of the enclosed code use attempts total attempts"""
+    token = _attempts.set(max(1, attempts))
+    try:
+        yield
+    finally:
+        _attempts.reset(token)
+
+_trackers: Dict[Tuple[str, str], LatencyTracker] = {}
+_stats = {"calls": 0, "retries": 0, "hedged": 0, "hedge_wins": 0}
+_lock = threading.Lock()
+# Runs both attempts of hedged calls, while the caller waits for the first to succeed
+_hedge_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="hedge")
+
+def get_latency_tracker(provider: str, model: str) -> LatencyTracker:
+    key = (provider.lower(), model)
+    with _lock:
+        tracker = _trackers.get(key)
+        if tracker is None:
+            tracker = _trackers[key] = LatencyTracker()
+        return tracker
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+def _discard(future) -> None:
+    """Close the response of a losing hedged request once it arrives"""
+    if not future.cancelled() and future.exception() is None:
+        close = getattr(future.result(), "close", None)
+        if callable(close):
+            close()
+
+def _succeeded(future) -> bool:
+    return future.exception() is None and not is_retryable_response(future.result())
+
+def _hedged(request: Callable[[], Any], policy: RetryPolicy, tracker: LatencyTracker) -> Any:
+    """
+    Run request on the hedge pool, firing a copy if it is slower than the hedge
+    quantile; the first to succeed is returned and the other cancelled.
+    """
+    delay = tracker.quantile(policy.hedge_quantile, policy.hedge_min_samples)
+    if delay is None:
+        return request()
+
+    # Both attempts run in (a copy of) the caller's context, e.g. its deadline
+    primary = _hedge_executor.submit(contextvars.copy_context().run, request)
+    if wait([primary], timeout=delay).done:
+        return primary.result()
+    hedge = _hedge_executor.submit(contextvars.copy_context().run, request)
+    _count("hedged")
+
+    attempts = [primary, hedge]
+    pending = set(attempts)
+    winner = None
+    while pending and winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        # The primary wins ties
+        winner = next((attempt for attempt in attempts if attempt in done and _succeeded(attempt)), None)
+    for attempt in attempts:
+        if attempt is not winner:
+            # Never started, or its response is closed once it arrives
+            attempt.cancel()
+            attempt.add_done_callback(_discard)
+    if winner is hedge:
+        _count("hedge_wins")
+    # Surface the primary's failure if both failed
+    return (winner or primary).result()
+
+async def _async_hedged(request: Callable[[], Awaitable[Any]], policy: RetryPolicy,
+                        tracker: LatencyTracker) -> Any:
+    """Like _hedged for a coroutine function; the losing attempt is cancelled outright"""
+    delay = tracker.quantile(policy.hedge_quantile, policy.hedge_min_samples)
+    if delay is None:
+        return await request()
+
+    primary = asyncio.ensure_future(request())
+    done, _ = await asyncio.wait([primary], timeout=delay)
+    if done:
+        return primary.result()
+    hedge = asyncio.ensure_future(request())
+    _count("hedged")
+
+    attempts = [primary, hedge]
+    pending = set(attempts)
+    winner = None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((attempt for attempt in attempts if attempt in done and _succeeded(attempt)), None)
+    finally:
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+    if winner is hedge:
+        _count("hedge_wins")
+    return (winner or primary).result()
+
+def _out_of_time(delay: float) -> bool:
+    """Whether the request deadline passes before a retry after delay seconds could start"""
+    left = remaining()
+    return left is not None and left <= delay
+
+def call_with_retry(request: Callable[[], Any], policy: RetryPolicy,
+                    tracker: Optional[LatencyTracker] = None, hedge: bool = False,
+                    name: str = "provider") -> Any:
+    """
+    Run request() until it succeeds, a non-transient error occurs or the attempts run out.
+
+    A raw HTTP response with a retryable status is retried like an exception;
+    after the last attempt it is returned as is for the caller to report.
+    No retry is started that could not begin before the request deadline.
+    Hedging needs the tracker that request records its latencies in.
+    """
+    _count("calls")
+    for attempt in range(policy.attempts):
+        last = attempt == policy.attempts - 1
+        try:
+            if hedge and policy.hedge and tracker is not None:
+                result = _hedged(request, policy, tracker)
+            else:
+                result = request()
+        except Exception as e:
+            if last or not is_retryable_error(e):
+                raise
+            delay = policy.backoff(attempt, retry_after(e))
+            if _out_of_time(delay):
+                raise DeadlineExceeded() from e
+            logger.warning(f"{name} call failed ({str(e)}), retrying in {delay:.2f}s")
+        else:
+            if last or not is_retryable_response(result):
+                return result
+            delay = policy.backoff(attempt, retry_after(result))
+            if _out_of_time(delay):
+                return result
+            logger.warning(f"{name} call returned {result.status_code}, retrying in {delay:.2f}s")
+            close = getattr(result, "close", None)
+            if callable(close):
+                close()
+        _count("retries")
+        time.sleep(delay)
+
+async def async_call_with_retry(request: Callable[[], Awaitable[Any]], policy: RetryPolicy,
+                                tracker: Optional[LatencyTracker] = None, hedge: bool = False,
+                                name: str = "provider") -> Any:
+    """Like call_with_retry for a coroutine function, sleeping without blocking the event loop"""
+    _count("calls")
+    for attempt in range(policy.attempts):
+        last = attempt == policy.attempts - 1
+        try:
+            if hedge and policy.hedge and tracker is not None:
+                result = await _async_hedged(request, policy, tracker)
+            else:
+                result = await request()
+        except Exception as e:
+            if last or not is_retryable_error(e):
+                raise
+            delay = policy.backoff(attempt, retry_after(e))
+            if _out_of_time(delay):
+                raise DeadlineExceeded() from e
+            logger.warning(f"{name} call failed ({str(e)}), retrying in {delay:.2f}s")
+        else:
+            if last or not is_retryable_response(result):
+                return result
+            delay = policy.backoff(attempt, retry_after(result))
+            if _out_of_time(delay):
+                return result
+            logger.warning(f"{name} call returned {result.status_code}, retrying in {delay:.2f}s")
+            # httpx responses are closed asynchronously
+            close = getattr(result, "aclose", None)
+            if callable(close):
+                await close()
+        _count("retries")
+        await asyncio.sleep(delay)
+
+def get_retry_policy() -> RetryPolicy:
+    """Retry policy configured in GeneralConfig, with the attempts of the current retry_scope()"""
+    from configs import config
+    general = config.general
+    attempts = _attempts.get()
+    return RetryPolicy(
+        attempts=general.retry_attempts if attempts is None else attempts,
+        base_delay=general.retry_base_delay,
+        max_delay=general.retry_max_delay,
+        hedge=general.hedge_requests
+    )
+
+def retry_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+        trackers = dict(_trackers)
+    stats["p95_ms"] = {
+        f"{provider}/{model}": round(p95 * 1000, 3)
+        for (provider, model), tracker in trackers.items()
+        if (p95 := tracker.quantile(0.95)) is not None
+    }
+    return stats
@@ -0,0 +1,194 @@
+"""
+Cache of reasoning method selections made by a model.
+
+Questions are normalized (case, punctuation, whitespace) and keyed together
+with the scope of the selection: the provider, model and API key fingerprint
+it was made with, so one caller's selections never answer another's. Besides exact matches, near-
+identical questions are found with MinHash signatures over character
+shingles, indexed by locality-sensitive hashing bands: only questions
+sharing a band are compared, and a match needs an estimated Jaccard
+similarity of at least the configured threshold.
+"""
+import hashlib
+import random
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Any, Dict, Hashable, Iterator, Optional, Set, Tuple
+
+from caching import LRUCache
+
+_PRIME = (1 << 61) - 1
+_NON_WORD = re.compile(r'[^\w]+')
+
+def normalize_question(question: str) -> str:
+    """Canonical form of a question: NFKC, lower case, words separated by single spaces"""
+    text = unicodedata.normalize('NFKC', question).casefold()
+    return _NON_WORD.sub(' ', text).strip()
+
+class MinHasher:
+    """MinHash signatures of the character shingles of a text"""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 4, seed: int = 1):
+        rng = random.Random(seed)
+        self.shingle_size = shingle_size
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def shingles(self, text: str) -> Set[int]:
+        size = self.shingle_size
+        if len(text) <= size:
+            return {zlib.crc32(text.encode('utf-8'))}
+        return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = self.shingles(text)
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms)
+
+def estimate_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures"""
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+class SelectionCache:
+    """
+    Bounded, thread-safe cache of method selections by question and scope.
+
+    Entries are evicted least-recently-used first (and after ttl seconds);
+    evicted entries are removed from the similarity index as well.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 similarity: float = 0.7, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._hasher = MinHasher(num_perm)
+        self._entries = LRUCache(maxsize, ttl, on_evict=self._unindex)
+        self._signatures: Dict[Hashable, Tuple[int, ...]] = {}
+        self._buckets: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    @property
+    def fuzzy(self) -> bool:
+        return self.similarity < 1.0
+
+    @staticmethod
+    def _key(normalized: str, scope: Hashable) -> Tuple[Hashable, str]:
+        return (scope, hashlib.sha1(normalized.encode('utf-8')).hexdigest())
+
+    def _band_keys(self, scope: Hashable, signature: Tuple[int, ...]) -> Iterator[Hashable]:
+        for band in range(self.bands):
+            yield (scope, band, signature[band * self.rows:(band + 1) * self.rows])
+
+    def _unindex(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            signature = self._signatures.pop(key, None)
+            if signature is None:
+                return
+            for band_key in self._band_keys(key[0], signature):
+                bucket = self._buckets.get(band_key)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[band_key]
+
+    def _similar(self, scope: Hashable, signature: Tuple[int, ...]) -> Optional[Hashable]:
+        """Key of the most similar cached question above the threshold, if any"""
+        best_key, best_similarity = None, self.similarity
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(scope, signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            for key in candidates:
+                similarity = estimate_similarity(signature, self._signatures[key])
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+        return best_key
+
+    def get(self, question: str, scope: Hashable) -> Tuple[Optional[Any], Optional[str]]:
+        """Get (selection, 'exact' or 'fuzzy') made in a scope, or (None, None) on a miss"""
+        normalized = normalize_question(question)
+        value = self._entries.get(self._key(normalized, scope))
+        if value is not None:
+            with self._lock:
+                self.exact_hits += 1
+            return value, 'exact'
+
+        if self.fuzzy:
+            key = self._similar(scope, self._hasher.signature(normalized))
+            value = self._entries.get(key) if key is not None else None
+            if value is not None:
+                with self._lock:
+                    self.fuzzy_hits += 1
+                return value, 'fuzzy'
+
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def set(self, question: str, scope: Hashable, value: Any) -> None:
+        normalized = normalize_question(question)
+        key = self._key(normalized, scope)
+        # Replacing an entry unindexes it, so index only afterwards
+        self._entries.set(key, value)
+        if not self.fuzzy:
+            return
+        signature = self._hasher.signature(normalized)
+        with self._lock:
+            if key not in self._entries:
+                return  # Already evicted again by a concurrent store
+            self._signatures[key] = signature
+            for band_key in self._band_keys(scope, signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        with self._lock:
+            self._signatures.clear()
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries.stats()
+        with self._lock:
+            return {
+                "size": entries["size"],
+                "maxsize": entries["maxsize"],
+                "evictions": entries["evictions"],
+                "exact_hits": self.exact_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+                "similarity": self.similarity
+            }
+
+_cache: Optional[SelectionCache] = None
+_cache_lock = threading.Lock()
+
+def get_selection_cache() -> SelectionCache:
+    """Get the process-wide selection cache, creating it from the configuration on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                from configs import config
+                general = config.general
+                _cache = SelectionCache(general.selection_cache_size, general.selection_cache_ttl,
+                                        general.selection_cache_similarity)
+    return _cache
+
+def configure_selection_cache(cache: SelectionCache) -> SelectionCache:
+    """Replace the process-wide selection cache"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+    return _cache
+
+def reset_selection_cache() -> None:
+    """Drop the process-wide selection cache; it is created again from the configuration on next use"""
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -1,8 +1,17 @@
 import re
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict, Tuple
 from collections import Counter
 from cot_reasoning import CoTStep, CoTResponse, VisualizationConfig, wrap_text
+from tag_parser import tokenize, iter_elements, TagElement, TextEvent, ElementEvent
+
+logger = logging.getLogger(__name__)
+
+# Marker opening each reasoning path in the response
+_PATH_PATTERN = re.compile(r'Path\s+(\d+):')
 
 @dataclass
 class SCRPath:
@@ -31,40 +40,60 @@ def parse_scr_response(response_text: str, question: str, num_paths: int = 5) ->
     Returns:
         SCRResponse object containing all paths and aggregated answer
     """
-    # Split the response into individual paths
-    path_pattern = r'Path\s+(\d+):(.*?)(?=Path\s+\d+:|$)'
-    path_matches = re.finditer(path_pattern, response_text, re.DOTALL)
-    
     paths = []
-    answers = []
     
-    for match in path_matches:
-        path_id = int(match.group(1))
-        path_content = match.group(2).strip()
-        
-        # Extract steps for this path
-        step_pattern = r'<step number="(\d+)">\s*(.*?)\s*</step>'
-        steps = []
-        for step_match in re.finditer(step_pattern, path_content, re.DOTALL):
-            number = int(step_match.group(1))
-            content = step_match.group(2).strip()
-            steps.append(CoTStep(number=number, content=content))
-        
-        # Extract answer for this path
-        answer_pattern = r'<answer>\s*(.*?)\s*</answer>'
-        answer_match = re.search(answer_pattern, path_content, re.DOTALL)
-        answer = answer_match.group(1).strip() if answer_match else None
-        
-        if answer:
-            answers.append(answer)
+    # Split the response into individual paths: "Path N:" markers in top-level
+    # text open a new path, top-level elements belong to the current one
+    for event in tokenize(response_text):
+        if isinstance(event, TextEvent):
+            if event.depth == 0:
+                for match in _PATH_PATTERN.finditer(event.text):
+                    paths.append(SCRPath(path_id=int(match.group(1)), steps=[]))
+            continue
+        if not isinstance(event, ElementEvent) or not paths:
+            continue
         
+        if event.element.depth == 0:
+            _add_path_element(paths[-1], event.element)
+    
+    for path in paths:
         # Sort steps by number
-        steps.sort(key=lambda x: x.number)
-        
-        paths.append(SCRPath(path_id=path_id, steps=steps, answer=answer))
+        path.steps.sort(key=lambda x: x.number)
+    
+    return aggregate_paths(question, paths)
+
+def parse_scr_path(response_text: str, path_id: int) -> SCRPath:
+    """
+    Parse a response holding a single reasoning path.
     
-    # Determine final answer through voting
-    vote_counts = Counter(answers)
+    Args:
+        response_text: The raw response from the API for one path
+        path_id: Number of the path
+    
+    Returns:
+        SCRPath object containing the steps and answer of the path
+    """
+    path = SCRPath(path_id=path_id, steps=[])
+    for element in iter_elements(response_text):
+        if element.depth == 0:
+            _add_path_element(path, element)
+    path.steps.sort(key=lambda x: x.number)
+    return path
+
+def _add_path_element(path: SCRPath, element: TagElement) -> None:
+    """Add a top-level step or answer element to a path"""
+    if element.name == 'step':
+        # Extract steps for this path
+        number = element.int_attr('number')
+        if number is not None:
+            path.steps.append(CoTStep(number=number, content=element.content))
+    elif element.name == 'answer' and path.answer is None:
+        # Extract answer for this path
+        path.answer = element.content or None
+
+def aggregate_paths(question: str, paths: List[SCRPath]) -> SCRResponse:
+    """Determine the final answer of a set of paths through voting"""
+    vote_counts = Counter(path.answer for path in paths if path.answer)
     final_answer = vote_counts.most_common(1)[0][0] if vote_counts else None
     
     return SCRResponse(
@@ -74,6 +103,73 @@ def parse_scr_response(response_text: str, question: str, num_paths: int = 5) ->
         vote_counts=dict(vote_counts)
     )
 
+def vote_is_decided(vote_counts: Counter, remaining: int) -> bool:
+    """Whether the leading answer can no longer be overtaken by the remaining paths"""
+    if not vote_counts:
+        return False
+    ranked = vote_counts.most_common(2)
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    return ranked[0][1] > runner_up + remaining
+
+def generate_parallel_paths(generate_path: Callable[[], str], question: str, num_paths: int = 5,
+                            max_workers: int = 5, early_stopping: bool = True) -> Tuple[SCRResponse, str]:
+    """
+    Sample reasoning paths with independent concurrent provider calls.
+    
+    Args:
+        generate_path: Callable returning the raw response of one single-path completion
+        question: The original question
+        num_paths: Number of paths to sample
+        max_workers: Maximum number of provider calls in flight
+        early_stopping: Stop waiting once the majority answer can no longer change
+    
+    Returns:
+        Tuple of the aggregated SCRResponse and the raw output of the completed
+        paths, concatenated in the multi-path format parse_scr_response reads
+    """
+    raw_paths: Dict[int, str] = {}
+    paths: List[SCRPath] = []
+    vote_counts = Counter()
+    errors = []
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, num_paths)))
+    try:
+        # Paths run in the caller's context, e.g. its request deadline
+        futures = {
+            executor.submit(contextvars.copy_context().run, generate_path): path_id
+            for path_id in range(1, num_paths + 1)
+        }
+        remaining = num_paths
+        for future in as_completed(futures):
+            path_id = futures[future]
+            remaining -= 1
+            try:
+                raw_paths[path_id] = future.result()
+            except Exception as e:
+                logger.warning(f"Self-consistency path {path_id} failed: {str(e)}")
+                errors.append(e)
+                continue
+            
+            # Aggregate votes as results arrive
+            path = parse_scr_path(raw_paths[path_id], path_id)
+            paths.append(path)
+            if path.answer:
+                vote_counts[path.answer] += 1
+            
+            if early_stopping and remaining and vote_is_decided(vote_counts, remaining):
+                logger.info(f"Self-consistency majority decided after {len(paths)} of {num_paths} paths")
+                break
+    finally:
+        # Drop calls that have not started yet; calls in flight finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    if not paths and errors:
+        raise errors[0]
+    
+    paths.sort(key=lambda x: x.path_id)
+    raw_output = '\n\n'.join(f'Path {path.path_id}:\n{raw_paths[path.path_id]}' for path in paths)
+    return aggregate_paths(question, paths), raw_output
+
 def create_mermaid_diagram(scr_response: SCRResponse, config: VisualizationConfig) -> str:
     """
     Convert self-consistency paths to Mermaid diagram.
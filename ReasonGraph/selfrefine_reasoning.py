@@ -1,7 +1,7 @@
-import re
 from dataclasses import dataclass
 from typing import List, Optional
 from cot_reasoning import VisualizationConfig, wrap_text
+from tag_parser import iter_elements
 
 @dataclass
 class SelfRefineStep:
@@ -31,45 +31,39 @@ def parse_selfrefine_response(response_text: str, question: str) -> SelfRefineRe
     Returns:
         SelfRefineResponse object containing all components
     """
-    # Extract initial steps
-    step_pattern = r'<step number="(\d+)">\s*(.*?)\s*</step>'
     steps = []
-    for match in re.finditer(step_pattern, response_text, re.DOTALL):
-        number = int(match.group(1))
-        content = match.group(2).strip()
-        steps.append(SelfRefineStep(number=number, content=content))
-    
-    # Extract initial answer
-    answer_pattern = r'<answer>\s*(.*?)\s*</answer>'
-    answer_match = re.search(answer_pattern, response_text, re.DOTALL)
-    answer = answer_match.group(1).strip() if answer_match else None
-    
-    # Extract revision check
-    check_pattern = r'<revision_check>\s*(.*?)\s*</revision_check>'
-    check_match = re.search(check_pattern, response_text, re.DOTALL)
-    revision_check = check_match.group(1).strip() if check_match else None
-    
-    # Extract revised steps
-    revised_step_pattern = r'<revised_step number="(\d+)" revises="(\d+)">\s*(.*?)\s*</revised_step>'
-    for match in re.finditer(revised_step_pattern, response_text, re.DOTALL):
-        number = int(match.group(1))
-        revises = int(match.group(2))
-        content = match.group(3).strip()
-        steps.append(SelfRefineStep(
-            number=number,
-            content=content,
-            is_revised=True,
-            revision_of=revises
-        ))
-    
-    # Extract revised answer
-    revised_answer_pattern = r'<revised_answer>\s*(.*?)\s*</revised_answer>'
-    revised_answer_match = re.search(revised_answer_pattern, response_text, re.DOTALL)
-    revised_answer = revised_answer_match.group(1).strip() if revised_answer_match else None
+    revised_steps = []
+    # First occurrence of each single-valued section
+    sections = {'answer': None, 'revision_check': None, 'revised_answer': None}
+    
+    for element in iter_elements(response_text):
+        if element.name == 'step':
+            # Extract initial steps
+            number = element.int_attr('number')
+            if number is not None:
+                steps.append(SelfRefineStep(number=number, content=element.content))
+        elif element.name == 'revised_step':
+            # Extract revised steps
+            number = element.int_attr('number')
+            revises = element.int_attr('revises')
+            if number is not None and revises is not None:
+                revised_steps.append(SelfRefineStep(
+                    number=number,
+                    content=element.content,
+                    is_revised=True,
+                    revision_of=revises
+                ))
+        elif element.name in sections and sections[element.name] is None:
+            # Extract initial answer, revision check and revised answer
+            sections[element.name] = element.content
+    
+    answer = sections['answer']
+    revision_check = sections['revision_check']
+    revised_answer = sections['revised_answer']
     
     return SelfRefineResponse(
         question=question,
-        steps=steps,
+        steps=steps + revised_steps,
         answer=answer,
         revision_check=revision_check,
         revised_answer=revised_answer
@@ -0,0 +1,242 @@
+"""
+Static asset pipeline.
+
+Every file under static/ is served from memory under a content-hashed name
+(assets/idea.png -> /assets/assets/idea.3f2a9c1b7d4e.png), so it can be
+cached by browsers and proxies for a year and is re-fetched only when its
+content, and with it its URL, changes. Text assets are served gzip or
+brotli compressed when the client accepts it: the variants are read from
+.gz / .br files next to the source when those are up to date (written by
+`python static_assets.py build`), else compressed once in memory (brotli
+only if the brotli module is installed).
+
+Third-party scripts are vendored under static/vendor/, so the pages work
+without internet access. The Mermaid bundle is installed with
+`python static_assets.py vendor-mermaid --source <path>`, from a local copy
+of mermaid.min.js (offline installs) or a URL. Until it is installed, the
+pages load the same pinned version from its CDN (CDN_FALLBACKS), and a
+warning is logged when the assets are loaded.
+"""
+import argparse
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+MERMAID_VERSION = '10.6.1'
+MERMAID_PATH = 'vendor/mermaid.min.js'
+# Where the pinned bundle can be downloaded, e.g. on another machine for an offline install
+MERMAID_DOWNLOAD_URL = f'https://cdn.jsdelivr.net/npm/mermaid@{MERMAID_VERSION}/dist/mermaid.min.js'
+
+# Files the pages cannot work without
+REQUIRED_ASSETS = (MERMAID_PATH,)
+# Where the pages load a required asset from while it is not vendored
+CDN_FALLBACKS = {MERMAID_PATH: MERMAID_DOWNLOAD_URL}
+
+# Cache-Control of content-hashed assets: their URL changes with their content
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Content codings in order of preference
+ENCODINGS = ('br', 'gzip')
+_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+_COMPRESSIBLE = {'.js', '.mjs', '.css', '.html', '.svg', '.json', '.map', '.txt'}
+_MIN_COMPRESS_SIZE = 1024
+_HASH_LENGTH = 12
+
+def _compress(data: bytes, encoding: str, best: bool = False) -> Optional[bytes]:
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11 if best else 5)
+    return None
+
+def _compressible(path: str, data: bytes) -> bool:
+    return os.path.splitext(path)[1].lower() in _COMPRESSIBLE and len(data) >= _MIN_COMPRESS_SIZE
+
+@dataclass(frozen=True)
+class Asset:
+    """A static file or pre-rendered page, with its compressed variants"""
+    mimetype: str
+    etag: str  # Unquoted strong ETag of the uncompressed content
+    variants: Dict[str, bytes]  # Content coding ('identity', 'gzip', 'br') -> body
+
+    @classmethod
+    def from_bytes(cls, data: bytes, mimetype: str, compress: bool = True,
+                   precompressed: Optional[Dict[str, bytes]] = None) -> 'Asset':
+        variants = {'identity': data}
+        if compress:
+            for encoding in ENCODINGS:
+                body = (precompressed or {}).get(encoding) or _compress(data, encoding)
+                if body is not None and len(body) < len(data):
+                    variants[encoding] = body
+        return cls(mimetype=mimetype, etag=hashlib.sha256(data).hexdigest()[:32], variants=variants)
+
+    def negotiate(self, quality: Callable[[str], float]) -> Tuple[str, bytes]:
+        """(content coding, body) of the preferred variant the client accepts; quality(coding) from Accept-Encoding"""
+        for encoding in ENCODINGS:
+            if encoding in self.variants and quality(encoding) > 0:
+                return encoding, self.variants[encoding]
+        return 'identity', self.variants['identity']
+
+def hashed_name(path: str, data: bytes) -> str:
+    """assets/idea.png -> assets/idea.<content hash>.png"""
+    root, extension = os.path.splitext(path)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:_HASH_LENGTH]}{extension}'
+
+class AssetPipeline:
+    """The files of a static directory, served from memory under content-hashed names"""
+
+    def __init__(self, static_dir: str = STATIC_DIR, url_prefix: str = '/assets'):
+        self.static_dir = static_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self._lock = threading.Lock()
+        self._urls: Optional[Dict[str, str]] = None  # Source path -> hashed path
+        self._assets: Dict[str, Asset] = {}  # Hashed path -> asset
+
+    def _read_variant(self, file_path: str, encoding: str) -> Optional[bytes]:
+        """A precompressed variant written by build(), if it is newer than its source"""
+        variant_path = file_path + _SUFFIXES[encoding]
+        try:
+            if os.path.getmtime(variant_path) >= os.path.getmtime(file_path):
+                with open(variant_path, 'rb') as f:
+                    return f.read()
+        except OSError:
+            pass
+        return None
+
+    def _load(self) -> None:
+        urls, assets = {}, {}
+        for directory, _, files in os.walk(self.static_dir):
+            for name in files:
+                if name.endswith(tuple(_SUFFIXES.values())):
+                    continue
+                file_path = os.path.join(directory, name)
+                path = os.path.relpath(file_path, self.static_dir).replace(os.sep, '/')
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+                compress = _compressible(path, data)
+                precompressed = {encoding: self._read_variant(file_path, encoding)
+                                 for encoding in ENCODINGS} if compress else None
+                mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                url_path = hashed_name(path, data)
+                urls[path] = url_path
+                assets[url_path] = Asset.from_bytes(data, mimetype, compress, precompressed)
+        self._assets = assets
+        self._urls = urls
+        logger.info(f"Loaded {len(assets)} static assets from {self.static_dir}")
+        for path in self.missing():
+            logger.warning(f"Static asset {path} is not vendored, the pages load it from {CDN_FALLBACKS[path]} "
+                           f"and need internet access: run `python static_assets.py vendor-mermaid "
+                           f"--source <mermaid.min.js>`")
+
+    def _ensure_loaded(self) -> None:
+        if self._urls is None:
+            with self._lock:
+                if self._urls is None:
+                    self._load()
+
+    def url(self, path: str) -> str:
+        """URL of a static file: its hashed name, else its CDN fallback or the plain /static/ URL"""
+        self._ensure_loaded()
+        url_path = self._urls.get(path)
+        if url_path is not None:
+            return f'{self.url_prefix}/{url_path}'
+        return CDN_FALLBACKS.get(path, f'/static/{path}')
+
+    def missing(self) -> Tuple[str, ...]:
+        """The required assets that are not in the static directory"""
+        return tuple(path for path in REQUIRED_ASSETS if path not in self._urls)
+
+    def get(self, url_path: str) -> Optional[Asset]:
+        """The asset served under a hashed path, None if there is none"""
+        self._ensure_loaded()
+        return self._assets.get(url_path)
+
+    def reload(self) -> None:
+        """Re-read the static directory, e.g. after vendoring a file"""
+        with self._lock:
+            self._load()
+
+def build(static_dir: str = STATIC_DIR) -> None:
+    """Write best-compression .gz (and .br, with brotli installed) variants next to the text assets"""
+    for directory, _, files in os.walk(static_dir):
+        for name in files:
+            if name.endswith(tuple(_SUFFIXES.values())):
+                continue
+            file_path = os.path.join(directory, name)
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            if not _compressible(name, data):
+                continue
+            for encoding in ENCODINGS:
+                body = _compress(data, encoding, best=True)
+                if body is not None:
+                    with open(file_path + _SUFFIXES[encoding], 'wb') as f:
+                        f.write(body)
+                    print(f'{file_path}{_SUFFIXES[encoding]}: {len(data)} -> {len(body)} bytes')
+
+def vendor_mermaid(source: str, static_dir: str = STATIC_DIR) -> str:
+    """
+    Copy the Mermaid bundle from a local file or URL into static/vendor/.
+
+    Raises ValueError if it is not the pinned version, MERMAID_VERSION.
+    """
+    if source.startswith(('http://', 'https://')):
+        import requests
+        response = requests.get(source, timeout=60)
+        response.raise_for_status()
+        data = response.content
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    # The bundle embeds its version string
+    if MERMAID_VERSION.encode() not in data:
+        raise ValueError(f'{source} is not Mermaid {MERMAID_VERSION}')
+    target = os.path.join(static_dir, MERMAID_PATH)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as f:
+        f.write(data)
+    return target
+
+_pipeline: Optional[AssetPipeline] = None
+_pipeline_lock = threading.Lock()
+
+def get_asset_pipeline() -> AssetPipeline:
+    """Get the pipeline of the application's static directory"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = AssetPipeline()
+    return _pipeline
+
+def main():
+    parser = argparse.ArgumentParser(description='Prepare the static assets for serving')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='Write precompressed variants of the text assets')
+    vendor = commands.add_parser('vendor-mermaid', help=f'Vendor Mermaid {MERMAID_VERSION} into static/vendor/')
+    vendor.add_argument('--source', required=True,
+                        help=f'Local path (offline installs) or URL of mermaid.min.js {MERMAID_VERSION}, '
+                             f'available from {MERMAID_DOWNLOAD_URL}')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build()
+    else:
+        print(f'Vendored {args.source} to {vendor_mermaid(args.source)}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Finding which of many patterns occur in a text.
+
+An Aho-Corasick automaton over the patterns scans the text once: building
+it takes O(total pattern length) and a scan O(text length), however many
+patterns there are, where testing every pattern with a substring search
+takes O(patterns x text length). Tree parsers use it to find the nodes
+whose content is quoted in the final answer.
+"""
+from collections import deque
+from typing import Dict, Iterable, List
+
+class SubstringMatcher:
+    """Aho-Corasick automaton reporting the patterns that occur in a text"""
+
+    def __init__(self, patterns: Iterable[str]):
+        # Trie of the patterns: state 0 is the root (the empty prefix)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._terminals: List[int] = []  # State of every pattern, by pattern index
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                child = self._goto[state].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._goto[state][char] = child
+                state = child
+            self._terminals.append(state)
+
+        # Failure links: the state of the longest proper suffix that is also a trie prefix,
+        # set breadth-first so that a state's link is known before its children's
+        self._fail = [0] * len(self._goto)
+        self._order: List[int] = []
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._order.append(state)
+            for char, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                queue.append(child)
+
+    def __len__(self) -> int:
+        return len(self._terminals)
+
+    def occurring(self, text: str) -> List[int]:
+        """Indices of the patterns that occur in text, ascending"""
+        goto, fail = self._goto, self._fail
+        # States the scan passed through; a pattern occurs if its state is a suffix of one
+        visited = bytearray(len(goto))
+        visited[0] = 1
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            visited[state] = 1
+        # Deepest states first, so marks reach every suffix along the failure links
+        for state in reversed(self._order):
+            if visited[state]:
+                visited[fail[state]] = 1
+        return [index for index, state in enumerate(self._terminals) if visited[state]]
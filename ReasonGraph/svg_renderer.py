@@ -0,0 +1,211 @@
+"""
+Server-side rendering of Mermaid diagrams to SVG.
+
+Laying out a large ToT or Beam Search diagram takes the browser seconds, so
+requests with "render": "svg" get the diagram rendered here by the Mermaid
+CLI (mmdc, from @mermaid-js/mermaid-cli) with the settings the page uses.
+SVGs are cached by a hash of the diagram code, in memory and optionally in
+a directory shared by worker processes, so each diagram is rendered once.
+Concurrent requests for the same diagram wait for a single render. Without
+the CLI, or when it fails, render() returns None and the page renders the
+Mermaid code itself as before.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from caching import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Same as mermaid.initialize() in templates/index.html
+MERMAID_CONFIG = {
+    "theme": "default",
+    "securityLevel": "loose",
+    "flowchart": {"curve": "basis", "padding": 15}
+}
+
+# Element the diagram builders wrap the Mermaid code in for the page, which the CLI cannot parse
+_DIAGRAM_OPEN = '<div class="mermaid">'
+_DIAGRAM_CLOSE = '</div>'
+
+def mermaid_code(diagram: str) -> str:
+    """The Mermaid code of a diagram, without the page's <div class="mermaid"> wrapper"""
+    code = diagram.strip()
+    if code.startswith(_DIAGRAM_OPEN) and code.endswith(_DIAGRAM_CLOSE):
+        code = code[len(_DIAGRAM_OPEN):-len(_DIAGRAM_CLOSE)].strip('\n')
+    return code
+
+class SVGRenderer:
+    """Render Mermaid code to SVG with the Mermaid CLI, caching the output by content hash"""
+
+    def __init__(self, command: str = "mmdc", timeout: float = 60.0, cache_size: int = 256,
+                 cache_dir: Optional[str] = None, mermaid_config: Optional[Dict[str, Any]] = None):
+        self.command = command
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.mermaid_config = mermaid_config or MERMAID_CONFIG
+        self._config_json = json.dumps(self.mermaid_config, sort_keys=True)
+        self._cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._executable: Optional[str] = None
+        self._resolved = False
+        self.renders = 0
+        self.failures = 0
+        self.disk_hits = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def executable(self) -> Optional[str]:
+        """Path of the Mermaid CLI, None if it is not installed"""
+        if not self._resolved:
+            self._executable = shutil.which(self.command)
+            self._resolved = True
+            if self._executable is None:
+                logger.warning(f"Mermaid CLI '{self.command}' not found, diagrams are rendered by the browser")
+        return self._executable
+
+    def available(self) -> bool:
+        return self.executable is not None
+
+    def key(self, code: str) -> str:
+        """Content hash of a diagram, including the rendering settings"""
+        digest = hashlib.sha256(self._config_json.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(code.encode('utf-8'))
+        return digest.hexdigest()[:32]
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.svg")
+
+    def _load(self, key: str) -> Optional[str]:
+        svg = self._cache.get(key)
+        if svg is None and self.cache_dir:
+            try:
+                with open(self._disk_path(key), encoding='utf-8') as f:
+                    svg = f.read()
+            except OSError:
+                return None
+            self.disk_hits += 1
+            self._cache.set(key, svg)
+        return svg
+
+    def _store(self, key: str, svg: str) -> None:
+        self._cache.set(key, svg)
+        if self.cache_dir:
+            # Written under a temporary name so other processes never read a partial file
+            path = self._disk_path(key)
+            try:
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir,
+                                                 suffix='.tmp', delete=False) as f:
+                    f.write(svg)
+                os.replace(f.name, path)
+            except OSError as e:
+                logger.error(f"Failed to store rendered SVG {path}: {str(e)}")
+
+    def _run(self, code: str) -> Optional[str]:
+        """Render with the CLI, None on failure"""
+        with tempfile.TemporaryDirectory(prefix="reasongraph-svg-") as directory:
+            input_path = os.path.join(directory, "diagram.mmd")
+            output_path = os.path.join(directory, "diagram.svg")
+            config_path = os.path.join(directory, "config.json")
+            with open(input_path, 'w', encoding='utf-8') as f:
+                f.write(code)
+            with open(config_path, 'w', encoding='utf-8') as f:
+                f.write(self._config_json)
+            try:
+                subprocess.run(
+                    [self.executable, "-i", input_path, "-o", output_path, "-c", config_path,
+                     "-b", "transparent", "-q"],
+                    capture_output=True, text=True, timeout=self.timeout, check=True
+                )
+                with open(output_path, encoding='utf-8') as f:
+                    return f.read()
+            except subprocess.TimeoutExpired:
+                logger.error(f"Mermaid CLI timed out after {self.timeout}s")
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Mermaid CLI failed: {e.stderr.strip()[-500:]}")
+            except OSError as e:
+                logger.error(f"Mermaid CLI could not be run: {str(e)}")
+        return None
+
+    def render(self, code: str) -> Optional[str]:
+        """SVG of a Mermaid diagram (code, or a diagram as built for the page), None if it cannot be rendered here"""
+        code = mermaid_code(code)
+        key = self.key(code)
+        svg = self._load(key)
+        if svg is not None or not self.available():
+            return svg
+
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+        if not owner:
+            # Another request is rendering the same diagram
+            event.wait(self.timeout)
+            return self._cache.get(key)
+
+        try:
+            svg = self._run(code)
+            if svg is None:
+                self.failures += 1
+            else:
+                self.renders += 1
+                self._store(key, svg)
+            return svg
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def clear(self) -> None:
+        """Drop the in-memory cache (the disk cache is kept)"""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "available": self.available(),
+            "renders": self.renders,
+            "failures": self.failures,
+            "disk_hits": self.disk_hits,
+            "cache_dir": self.cache_dir,
+            "cache": self._cache.stats()
+        }
+
+def _renderer_from_config() -> SVGRenderer:
+    from configs import config
+    general = config.general
+    return SVGRenderer(
+        command=general.mermaid_cli,
+        timeout=general.svg_render_timeout,
+        cache_size=general.svg_cache_size,
+        cache_dir=general.svg_cache_dir
+    )
+
+_renderer: Optional[SVGRenderer] = None
+_renderer_lock = threading.Lock()
+
+def get_svg_renderer() -> SVGRenderer:
+    """Get the process-wide renderer, creating it from the configuration on first use"""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = _renderer_from_config()
+    return _renderer
+
+def reset_svg_renderer() -> None:
+    """Drop the process-wide renderer; it is created again from the configuration on next use"""
+    global _renderer
+    with _renderer_lock:
+        _renderer = None
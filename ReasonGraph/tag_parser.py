@@ -0,0 +1,225 @@
+"""
+Single-pass, resumable tokenizer for the ReasonGraph tag vocabulary.
+
+The reasoning methods ask the model to wrap its output in a small set of
+XML-like tags (<step>, <node>, <answer>, ...). TagTokenizer scans the text
+once, left to right, and can be fed a response chunk by chunk while it is
+still streaming. It emits typed events:
+
+    TextEvent     text between tags, coalesced up to the next tag
+    StartTagEvent a vocabulary tag was opened
+    ElementEvent  a vocabulary tag was closed; carries the complete element
+
+Anything that is not a well-formed vocabulary tag (e.g. "3 < 5" or "<br>")
+is kept as text, so the parse cost stays linear in the response length.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Union
+
+# Tags produced by the reasoning method prompt formats
+TAG_VOCABULARY = frozenset({
+    'step',
+    'answer',
+    'node',
+    'question',
+    'reasoning',
+    'final_answer',
+    'revision_check',
+    'revised_step',
+    'revised_answer',
+    'selected_method',
+})
+
+# An incomplete tag is held back at most this many characters before being treated as text
+MAX_TAG_LENGTH = 512
+
+_TAG_PATTERN = re.compile(r'<(/?)([a-z_]+)((?:\s+[\w-]+="[^"]*")*)\s*>')
+_TAG_PREFIX_PATTERN = re.compile(r'</?[a-z_]*(?:\s[^<>]*)?$')
+_ATTR_PATTERN = re.compile(r'([\w-]+)="([^"]*)"')
+
+@dataclass
+class TagElement:
+    """A closed vocabulary tag with its content and nested elements"""
+    name: str
+    attrs: Dict[str, str]
+    content: str
+    children: List['TagElement'] = field(default_factory=list)
+    depth: int = 0
+
+    def int_attr(self, key: str) -> Optional[int]:
+        """Get an integer attribute, None if missing or not an integer"""
+        try:
+            return int(self.attrs[key])
+        except (KeyError, ValueError):
+            return None
+
+    def float_attr(self, key: str) -> Optional[float]:
+        """Get a float attribute, None if missing or not a number"""
+        try:
+            return float(self.attrs[key])
+        except (KeyError, ValueError):
+            return None
+
+    def child(self, name: str) -> Optional['TagElement']:
+        """Get the first nested element with the given name"""
+        for element in self.children:
+            if element.name == name:
+                return element
+        return None
+
+    def to_dict(self) -> dict:
+        return {'tag': self.name, 'attrs': self.attrs, 'content': self.content}
+
+@dataclass
+class TextEvent:
+    text: str
+    depth: int
+
+@dataclass
+class StartTagEvent:
+    name: str
+    attrs: Dict[str, str]
+    depth: int
+
+@dataclass
+class ElementEvent:
+    element: TagElement
+
+TagEvent = Union[TextEvent, StartTagEvent, ElementEvent]
+
+class _OpenElement:
+    """An element whose closing tag has not been seen yet"""
+    __slots__ = ('name', 'attrs', 'open_tag', 'parts', 'children')
+
+    def __init__(self, name: str, attrs: Dict[str, str], open_tag: str):
+        self.name = name
+        self.attrs = attrs
+        self.open_tag = open_tag
+        self.parts: List[str] = []
+        self.children: List[TagElement] = []
+
+class TagTokenizer:
+    """
+    Incremental state machine over the ReasonGraph tag vocabulary.
+
+    Call feed() with each chunk of text and close() at the end of the
+    response; both return the events completed so far. Only an incomplete
+    tag at the very end of a chunk is buffered between calls.
+    """
+
+    def __init__(self, vocabulary=TAG_VOCABULARY):
+        self.vocabulary = vocabulary
+        self._buffer = ''
+        self._text: List[str] = []
+        self._stack: List[_OpenElement] = []
+
+    @property
+    def depth(self) -> int:
+        """Number of currently open elements"""
+        return len(self._stack)
+
+    def feed(self, chunk: str) -> List[TagEvent]:
+        """Consume a chunk of text and return the events it completed"""
+        events: List[TagEvent] = []
+        buffer = self._buffer + chunk
+        pos = 0
+        end = len(buffer)
+
+        while pos < end:
+            lt = buffer.find('<', pos)
+            if lt == -1:
+                self._add_text(buffer[pos:])
+                pos = end
+                break
+            if lt > pos:
+                self._add_text(buffer[pos:lt])
+                pos = lt
+
+            match = _TAG_PATTERN.match(buffer, lt)
+            if match and match.group(2) in self.vocabulary:
+                self._flush_text(events)
+                self._handle_tag(match, events)
+                pos = match.end()
+            elif (not match and end - lt < MAX_TAG_LENGTH
+                  and _TAG_PREFIX_PATTERN.match(buffer, lt)):
+                # Possibly a tag cut off by the chunk boundary, wait for more text
+                break
+            else:
+                self._add_text('<')
+                pos = lt + 1
+
+        self._buffer = buffer[pos:]
+        return events
+
+    def close(self) -> List[TagEvent]:
+        """Flush buffered text at the end of the response"""
+        events: List[TagEvent] = []
+        if self._buffer:
+            self._add_text(self._buffer)
+            self._buffer = ''
+        self._flush_text(events)
+        return events
+
+    def _add_text(self, text: str) -> None:
+        self._text.append(text)
+        if self._stack:
+            self._stack[-1].parts.append(text)
+
+    def _flush_text(self, events: List[TagEvent]) -> None:
+        if self._text:
+            events.append(TextEvent(''.join(self._text), len(self._stack)))
+            self._text = []
+
+    def _handle_tag(self, match, events: List[TagEvent]) -> None:
+        tag = match.group(0)
+        name = match.group(2)
+
+        if not match.group(1):
+            attrs = dict(_ATTR_PATTERN.findall(match.group(3)))
+            events.append(StartTagEvent(name, attrs, len(self._stack)))
+            self._stack.append(_OpenElement(name, attrs, tag))
+            return
+
+        # Closing tag: match it with the innermost open element of that name
+        index = len(self._stack) - 1
+        while index >= 0 and self._stack[index].name != name:
+            index -= 1
+        if index < 0:
+            # Stray closing tag, keep it as text
+            self._add_text(tag)
+            return
+
+        # Elements opened inside but never closed become plain text
+        while len(self._stack) - 1 > index:
+            unclosed = self._stack.pop()
+            parent = self._stack[-1]
+            parent.parts.append(unclosed.open_tag)
+            parent.parts.extend(unclosed.parts)
+            parent.children.extend(unclosed.children)
+
+        open_element = self._stack.pop()
+        content = ''.join(open_element.parts)
+        element = TagElement(
+            name=name,
+            attrs=open_element.attrs,
+            content=content.strip(),
+            children=open_element.children,
+            depth=len(self._stack)
+        )
+        if self._stack:
+            parent = self._stack[-1]
+            parent.parts.append(open_element.open_tag + content + tag)
+            parent.children.append(element)
+        events.append(ElementEvent(element))
+
+def tokenize(text: str) -> List[TagEvent]:
+    """Tokenize a complete response"""
+    tokenizer = TagTokenizer()
+    return tokenizer.feed(text) + tokenizer.close()
+
+def iter_elements(text: str) -> Iterator[TagElement]:
+    """Iterate over every closed element of a complete response, in closing order"""
+    for event in tokenize(text):
+        if isinstance(event, ElementEvent):
+            yield event.element
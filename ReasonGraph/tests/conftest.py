@@ -0,0 +1,49 @@
+import http.server
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+# The application modules are top-level modules of the ReasonGraph directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class ProviderHandler(http.server.BaseHTTPRequestHandler):
+    """Answers every POST like an OpenAI-compatible chat completions endpoint"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+        server = self.server
+        with server.lock:
+            server.requests.append(body)
+        status, payload = server.respond(body)
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def provider_server():
+    """
+    A local provider on a keep-alive HTTP server. Set server.reply to the text
+    every completion returns, or server.respond(body) -> (status, payload).
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ProviderHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.reply = 'ok'
+    server.respond = lambda body: (200, {'choices': [{'message': {'content': server.reply}}]})
+    server.url = f'http://127.0.0.1:{server.server_port}/'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
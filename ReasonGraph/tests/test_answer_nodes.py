@@ -0,0 +1,59 @@
+"""Substring matching of many patterns, and the answer nodes of the tree parsers found with it"""
+import random
+
+import pytest
+
+from bs_reasoning import parse_bs_arena, to_bs_response
+from substring_matcher import SubstringMatcher
+from tot_reasoning import find_answer_nodes, parse_tot_response
+from tree_arena import MARKED
+
+def brute_force(patterns, text):
+    return [index for index, pattern in enumerate(patterns) if pattern in text]
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matcher_agrees_with_substring_tests(seed):
+    rng = random.Random(seed)
+    alphabet = 'ab' if seed % 2 else 'abc '
+    patterns = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 6))) for _ in range(50)]
+    text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+    assert SubstringMatcher(patterns).occurring(text) == brute_force(patterns, text)
+
+def test_overlapping_and_repeated_patterns():
+    patterns = ['he', 'she', 'his', 'hers', 'she', 'x', '']
+    matcher = SubstringMatcher(patterns)
+    assert len(matcher) == 7
+    assert matcher.occurring('ushers') == [0, 1, 3, 4, 6]
+    assert matcher.occurring('') == [6]
+
+def test_find_answer_nodes_matches_substring_test():
+    rng = random.Random(0)
+    words = ['alpha', 'beta', 'gamma', 'delta', 'epsilon']
+    contents = [' '.join(rng.choice(words) for _ in range(rng.randint(1, 5))) for _ in range(300)]
+    answer = ' '.join(rng.choice(words) for _ in range(40))
+    expected = [index for index, content in enumerate(contents) if content.strip() in answer.strip()]
+    assert list(find_answer_nodes(contents, answer)) == expected
+
+def test_bs_best_path_marked():
+    text = '\n'.join([
+        '<node id="root" score="0.9">A</node>',
+        '<node id="node1" parent="root" score="0.5" path_score="1.4">B</node>',
+        '<node id="result1" parent="node1" score="0.5" path_score="1.9">C</node>',
+        '<node id="result2" parent="root" score="0.2" path_score="1.1">D</node>',
+        '<answer>Best path (path_score: 1.90):\nC</answer>',
+    ])
+    parsed = parse_bs_arena(text)
+    arena = parsed.arena
+    assert [arena.ids[index] for index in range(len(arena)) if arena.has_flag(index, MARKED)] == \
+        ['root', 'node1', 'result1']
+    response = to_bs_response(parsed, 'Q')
+    assert [node.id for node in response.result_nodes] == ['result1', 'result2']
+    assert response.root.children[0].is_best_path and not response.root.children[1].is_best_path
+
+def test_tot_answer_nodes():
+    text = ('<node id="root">Start</node>\n<node id="node1" parent="root">Go left</node>\n'
+            '<node id="node2" parent="root">Go right</node>\n<answer>We go left.</answer>')
+    response = parse_tot_response(text, 'Q')
+    assert [child.is_answer for child in response.root.children] == [False, False]
+    response = parse_tot_response(text.replace('We go left.', 'Go left'), 'Q')
+    assert [child.is_answer for child in response.root.children] == [True, False]
@@ -0,0 +1,89 @@
+"""Async provider classes and the ASGI routes sharing the Flask request handling"""
+import asyncio
+
+from api_base import APIFactory, BaseAPI, DeepSeekAPI
+from async_api import AsyncDeepSeekAPI, AsyncOpenAIAPI, AsyncThreadAPI, create_async_api
+from rate_limit import get_rate_limiter
+import asgi
+
+class EchoAPI(BaseAPI):
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Echo'
+        self.calls = []
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        self.calls.append((prompt, max_tokens, prompt_format, temperature))
+        return f'<reasoning><step number="1">{prompt}</step><answer>{temperature}</answer></reasoning>'
+
+def run(coroutine_function, *args):
+    async def main():
+        return await coroutine_function(*args)
+    return asyncio.run(main())
+
+def test_provider_name_and_limit_key():
+    APIFactory.register_provider('deepseek-direct', DeepSeekAPI, 'deepseek-chat')
+
+    async def create():
+        return AsyncDeepSeekAPI('key', 'deepseek-chat'), create_async_api('deepseek-direct', 'key')
+
+    api, factory_api = asyncio.run(create())
+    assert api.provider_name == 'DeepSeek'
+    assert api.provider is None and api.limit_key == 'DeepSeek'
+    assert get_rate_limiter(api.limit_key, api.model) is get_rate_limiter('DeepSeek', 'deepseek-chat')
+    assert factory_api.provider_name == 'DeepSeek' and factory_api.limit_key == 'deepseek-direct'
+    assert isinstance(factory_api, AsyncDeepSeekAPI)
+
+def test_openai_compatible_call_sends_temperature(provider_server):
+    class LocalAPI(AsyncOpenAIAPI):
+        provider_label = 'Local'
+        base_url = provider_server.url
+
+    async def generate(temperature):
+        return await LocalAPI('key', 'model').generate_response('Q', max_tokens=5, temperature=temperature)
+
+    provider_server.reply = 'answer'
+    assert asyncio.run(generate(0.3)) == 'answer'
+    assert asyncio.run(generate(None)) == 'answer'
+    first, second = provider_server.requests
+    assert first['temperature'] == 0.3 and first['max_tokens'] == 5
+    assert 'temperature' not in second
+
+def test_thread_api_passes_temperature():
+    APIFactory.register_provider('echo-async', EchoAPI, 'model')
+
+    async def generate():
+        api = create_async_api('echo-async', 'key')
+        assert isinstance(api, AsyncThreadAPI)
+        try:
+            return await api.generate_response('Q', max_tokens=7, temperature=0.5), api.sync_api.calls
+        finally:
+            await api.close()
+
+    response, calls = asyncio.run(generate())
+    assert calls == [('Q', 7, None, 0.5)]
+    assert '<answer>0.5</answer>' in response
+
+def test_process_route_validates_like_flask():
+    payload, status = run(asgi.process, {'question': 'Q'})
+    assert status == 400 and payload['error'] == 'API key is required'
+    payload, status = run(asgi.process, None)
+    assert status == 400 and payload['error'] == 'No data provided'
+
+def test_process_route_answers_from_the_provider():
+    APIFactory.register_provider('echo-async', EchoAPI, 'model')
+    payload, status, headers = run(asgi.process, {
+        'api_key': 'key', 'provider': 'echo-async', 'model': 'model', 'question': 'Q',
+        'temperature': 0.2, 'cache': False
+    })
+    assert status == 200 and headers == {'X-Cache': 'BYPASS'}
+    assert payload['success'] and '<answer>0.2</answer>' in payload['raw_output']
+    assert payload['visualization']
+
+def test_select_method_route_uses_the_local_classifier():
+    payload, status = run(asgi.select_method, {'question': 'What is 2 + 2?', 'selector': 'local'})
+    assert status == 200 and payload['selector'] == 'local'
+    payload, status = run(asgi.select_method, {'question': 'Q', 'selector': 'llm'})
+    assert status == 400 and payload['error'] == 'Missing required parameters'
+    payload, status = run(asgi.select_method, {'question': 'Q', 'selector': 'unknown'})
+    assert status == 400
@@ -0,0 +1,100 @@
+"""Batch runs over JSONL files and the /batch route"""
+import json
+import threading
+
+import pytest
+
+import batch
+from api_base import APIFactory, BaseAPI
+from app import app
+from batch import BatchSettings, completed_ids, read_questions, run_batch, run_batch_file
+
+class BatchAPI(BaseAPI):
+    """Answers every question; questions containing 'fail' raise"""
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Batch'
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            if 'fail' in prompt:
+                raise ValueError('bad question')
+            return f'<step number="1">{prompt}</step><answer>done</answer>'
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+@pytest.fixture
+def settings():
+    APIFactory.register_provider('batch', BatchAPI, 'model')
+    return BatchSettings(method='cot', provider='batch', model='model', api_key='key', concurrency=2, retries=0)
+
+def write_lines(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+
+def test_settings_validation():
+    with pytest.raises(ValueError):
+        BatchSettings(method='unknown', provider='p', model='m', api_key='k')
+    with pytest.raises(ValueError):
+        BatchSettings(method='cot', provider='p', model='m', api_key='k', concurrency=0)
+    assert BatchSettings(method='cot', provider='p', model='m', api_key='k').prompt_format
+
+def test_read_questions(tmp_path):
+    path = tmp_path / 'questions.jsonl'
+    write_lines(path, ['{"id": "a", "question": "Q1", "level": 2}', '', '"Q2"'])
+    assert list(read_questions(str(path))) == [
+        {'id': 'a', 'question': 'Q1', 'level': 2},
+        {'question': 'Q2', 'id': 3}
+    ]
+    write_lines(path, ['{"id": "a"}'])
+    with pytest.raises(ValueError, match='question is required'):
+        list(read_questions(str(path)))
+
+def test_run_batch_bounds_concurrency_and_reports_errors(settings):
+    items = [{'id': index, 'question': 'fail' if index == 3 else f'Q{index}'} for index in range(10)]
+    records = {record['id']: record for record in run_batch(items, settings, skip_ids={'0'})}
+    assert sorted(records) == list(range(1, 10))
+    assert records[3]['status'] == 'error' and 'bad question' in records[3]['error']
+    assert records[1]['status'] == 'ok' and records[1]['result']['answer'] == 'done'
+    assert BatchAPI.max_in_flight <= settings.concurrency
+
+def test_run_batch_file_resumes_from_its_output(settings, tmp_path):
+    questions, output = tmp_path / 'questions.jsonl', tmp_path / 'results.jsonl'
+    write_lines(questions, [json.dumps({'id': name, 'question': name}) for name in ('a', 'b', 'fail')])
+    # A successful result and a line cut short by a crash
+    output.write_text(json.dumps({'id': 'a', 'status': 'ok'}) + '\n{"id": "b", "sta', encoding='utf-8')
+    assert completed_ids(str(output)) == {'a'}
+
+    counts = run_batch_file(str(questions), str(output), settings)
+    assert counts == {'ok': 1, 'error': 1, 'skipped': 1}
+    assert completed_ids(str(output)) == {'a', 'b'}
+    assert batch.main([str(questions), str(output), '--provider', 'batch', '--model', 'model',
+                       '--api-key', 'key', '--retries', '0']) == 2
+
+def test_batch_route_streams_results(settings):
+    response = app.test_client().post('/batch', json={
+        'api_key': 'key', 'provider': 'batch', 'model': 'model',
+        'questions': ['Q1', {'question': 'Q2', 'topic': 'math'}, 'Q3'], 'skip_ids': [3]
+    })
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(record['id'] for record in records) == [1, 2]
+    assert next(record for record in records if record['id'] == 2)['metadata'] == {'topic': 'math'}
+
+@pytest.mark.parametrize('body,error', [
+    ({'questions': ['Q']}, 'API key is required'),
+    ({'api_key': 'key', 'questions': []}, 'Questions are required'),
+    ({'api_key': 'key', 'questions': ['Q', {'id': 2}]}, 'Question 2 is invalid'),
+    ({'api_key': 'key', 'questions': ['Q'], 'reasoning_method': 'x'}, 'Unknown reasoning method: x'),
+])
+def test_batch_route_validation(body, error):
+    response = app.test_client().post('/batch', json=body)
+    assert response.status_code == 400 and response.get_json()['error'] == error
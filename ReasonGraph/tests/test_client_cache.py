@@ -0,0 +1,60 @@
+"""Cached API clients and their leases"""
+from api_base import APIFactory, BaseAPI
+from client_cache import ClientCache, key_fingerprint
+
+class Client:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class EchoAPI(BaseAPI):
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Echo'
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        return prompt
+
+def test_key_fingerprint_hides_the_key():
+    key = ClientCache.make_key('Anthropic', 'model', 'sk-secret')
+    assert key == ('anthropic', 'model', key_fingerprint('sk-secret'))
+    assert 'sk-secret' not in repr(key)
+    assert key_fingerprint('a') != key_fingerprint('b')
+
+def test_get_reuses_the_instance():
+    cache = ClientCache()
+    key = ClientCache.make_key('p', 'm', 'k')
+    first = cache.get(key, Client)
+    assert cache.get(key, Client) is first
+    assert cache.get(ClientCache.make_key('p', 'm', 'other'), Client) is not first
+
+def test_eviction_closes_idle_clients():
+    cache = ClientCache(maxsize=1)
+    first = cache.get(('p', 'm', 'a'), Client)
+    cache.get(('p', 'm', 'b'), Client)
+    assert first.closed
+
+def test_leased_client_is_closed_only_after_release():
+    cache = ClientCache(maxsize=1)
+    lease = cache.lease(('p', 'm', 'a'), Client)
+    with lease as client:
+        cache.get(('p', 'm', 'b'), Client)
+        assert not client.closed
+    assert client.closed
+    lease.release()  # Releasing twice is harmless
+
+def test_evict_provider():
+    cache = ClientCache()
+    clients = [cache.get(('p', 'm', key), Client) for key in 'ab'] + [cache.get(('q', 'm', 'a'), Client)]
+    assert cache.evict_provider('P') == 2
+    assert [client.closed for client in clients] == [True, True, False]
+
+def test_factory_leases_cached_clients_and_creates_uncached_ones():
+    APIFactory.register_provider('echo-cache', EchoAPI, 'model')
+    with APIFactory.lease_api('echo-cache', 'key') as first, APIFactory.lease_api('echo-cache', 'key') as second:
+        assert first is second
+        assert first.provider == 'echo-cache'
+    assert APIFactory.create_api('echo-cache', 'key') is not first
+    assert APIFactory.evict_client('echo-cache', 'key')
@@ -0,0 +1,64 @@
+"""Pre-serialized /config and /method-config payloads and their ETags"""
+import json
+
+from app import app
+from config_payloads import ConfigPayloads, JSONPayload, get_config_payloads
+from configs import ReasoningConfig, config
+
+def test_payload_body_and_etag():
+    payload = JSONPayload.from_data({'b': 1, 'a': [1, 2]})
+    assert payload.body == b'{"a":[1,2],"b":1}\n'
+    assert payload.etag == JSONPayload.from_data({'a': [1, 2], 'b': 1}).etag
+    assert payload.etag != JSONPayload.from_data({'a': [1, 2], 'b': 2}).etag
+    assert len(payload.etag) == 32
+
+def test_payloads_are_rebuilt_when_the_version_moves():
+    snapshot = ReasoningConfig()
+    payloads = ConfigPayloads(snapshot)
+    initial, cot = payloads.initial(), payloads.method('cot')
+    assert json.loads(cot.body) == snapshot.get_method_config('cot')
+    assert payloads.method('unknown') is None
+    assert payloads.initial() is initial and payloads.builds == 1
+
+    snapshot.methods['cot'].example_question = 'Changed?'
+    snapshot.changed()
+    assert payloads.method('cot').etag != cot.etag
+    assert json.loads(payloads.method('cot').body)['example_question'] == 'Changed?'
+    assert payloads.builds == 2
+
+def test_config_routes_serve_the_payloads():
+    client = app.test_client()
+    response = client.get('/config')
+    assert response.status_code == 200 and response.mimetype == 'application/json'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.get_data() == get_config_payloads().initial().body
+    assert response.get_etag() == (get_config_payloads().initial().etag, False)
+
+    response = client.get('/method-config/tot')
+    assert response.status_code == 200
+    assert response.get_json() == config.get_method_config('tot')
+    assert client.get('/method-config/unknown').status_code == 404
+
+def test_matching_if_none_match_is_not_modified():
+    client = app.test_client()
+    for path in ('/config', '/method-config/cot'):
+        etag = client.get(path).headers['ETag']
+        response = client.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 304 and response.get_data() == b''
+        assert response.headers['ETag'] == etag
+        assert client.get(path, headers={'If-None-Match': '"stale"'}).status_code == 200
+
+def test_changed_config_gets_a_new_etag():
+    client = app.test_client()
+    etag = client.get('/method-config/cot').headers['ETag']
+    method = config.methods['cot']
+    original = method.example_question
+    try:
+        method.example_question = 'A new example?'
+        config.changed()
+        response = client.get('/method-config/cot', headers={'If-None-Match': etag})
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+        assert response.get_json()['example_question'] == 'A new example?'
+    finally:
+        method.example_question = original
+        config.changed()
@@ -0,0 +1,147 @@
+"""Configuration snapshots, the ConfigProxy and the hot-reloading watcher"""
+import contextvars
+import json
+import threading
+import time
+
+import pytest
+
+import config_watcher
+from config_watcher import ConfigWatcher, invalidate_derived_caches
+from configs import ConfigProxy, ReasoningConfig, build_config
+
+def write_json(path, data):
+    path.write_text(json.dumps(data))
+    return str(path)
+
+def test_proxy_forwards_to_the_current_snapshot():
+    snapshot = ReasoningConfig()
+    proxy = ConfigProxy(snapshot)
+    assert proxy.general is snapshot.general and proxy.methods is snapshot.methods
+    proxy.extra = 'value'
+    assert snapshot.extra == 'value'
+    assert proxy.version == (0, 0)
+    proxy.changed()
+    assert proxy.version == (0, 1)
+
+def test_swap_replaces_the_snapshot_and_notifies():
+    first, second = ReasoningConfig(), ReasoningConfig()
+    proxy = ConfigProxy(first)
+    calls = []
+    proxy.on_reload(lambda old, new: calls.append((old, new)))
+
+    @proxy.on_reload
+    def broken(old, new):
+        raise RuntimeError('callback failed')
+
+    assert proxy.swap(second) is first
+    assert proxy.snapshot() is second and calls == [(first, second)]
+    assert second.generation == 1 and proxy.version == (1, 0)
+
+def test_pinned_snapshot_survives_swaps():
+    first, second = ReasoningConfig(), ReasoningConfig()
+    proxy = ConfigProxy(first)
+    with proxy.pinned() as pinned:
+        assert pinned is first
+        proxy.swap(second)
+        assert proxy.snapshot() is first and proxy.general is first.general
+        # Other contexts, like other requests, read the current snapshot
+        assert contextvars.Context().run(proxy.snapshot) is second
+    assert proxy.snapshot() is second
+
+    token = proxy.pin(first)
+    assert proxy.snapshot() is first
+    proxy.unpin(token)
+    assert proxy.snapshot() is second
+
+def test_unpin_from_another_context_clears_the_pin():
+    first, second = ReasoningConfig(), ReasoningConfig()
+    proxy = ConfigProxy(second)
+    context = contextvars.copy_context()
+    token = context.run(proxy.pin, first)
+    context.run(proxy.unpin, token)  # Same context: restored
+    assert context.run(proxy.snapshot) is second
+
+    token = context.run(proxy.pin, first)
+    proxy.unpin(token)  # A different context: nothing raised, and no pin left there
+    assert proxy.snapshot() is second
+
+def test_build_config_applies_overrides(tmp_path):
+    config_file = tmp_path / 'config.toml'
+    config_file.write_text('[general]\nmax_tokens = 4096\n\n[methods.cot]\nprompt_format = "Think: {question}"\n')
+    keys_file = write_json(tmp_path / 'keys.json', {'openai': 'sk-file'})
+    snapshot = build_config(str(config_file), keys_file)
+    assert snapshot.general.max_tokens == 4096
+    assert snapshot.methods['cot'].prompt_format == 'Think: {question}'
+    assert snapshot.general.get_default_api_key('openai') == 'sk-file'
+    assert ReasoningConfig().general.max_tokens != 4096  # Defaults untouched
+
+@pytest.mark.parametrize('data,message', [
+    ({'unknown': {}}, 'Unknown config sections: unknown'),
+    ({'general': {'no_such_setting': 1}}, 'Unknown general settings: no_such_setting'),
+    ({'general': {'max_tokens': 'many'}}, 'Invalid general setting max_tokens: expected int'),
+    ({'general': {'max_tokens': True}}, 'Invalid general setting max_tokens: expected int'),
+    ({'methods': {'xyz': {}}}, 'Unknown reasoning method: xyz'),
+])
+def test_build_config_rejects_invalid_files(tmp_path, data, message):
+    with pytest.raises(ValueError, match=message):
+        build_config(write_json(tmp_path / 'config.json', data))
+
+def test_watcher_reloads_changed_files(tmp_path):
+    config_file = write_json(tmp_path / 'config.json', {'general': {'max_tokens': 1000}})
+    keys_file = write_json(tmp_path / 'keys.json', {})
+    proxy = ConfigProxy(ReasoningConfig())
+    watcher = ConfigWatcher(proxy, config_file, keys_file, interval=0).start()
+    assert proxy.general.max_tokens == 1000 and watcher.reloads == 1
+    assert not watcher.check()
+
+    write_json(tmp_path / 'keys.json', {'anthropic': 'sk-new'})
+    assert watcher.check()
+    assert proxy.general.get_default_api_key('anthropic') == 'sk-new' and proxy.general.max_tokens == 1000
+
+    # An invalid file is reported and the current snapshot stays
+    current = proxy.snapshot()
+    (tmp_path / 'config.json').write_text('{not json')
+    assert not watcher.check()
+    assert proxy.snapshot() is current and watcher.errors == 1
+    assert watcher.stats() == {'config_file': config_file, 'api_keys_file': keys_file,
+                               'reloads': 2, 'errors': 1, 'watching': False}
+
+def test_watcher_thread_polls_for_changes(tmp_path):
+    config_file = write_json(tmp_path / 'config.json', {})
+    proxy = ConfigProxy(ReasoningConfig())
+    reloaded = threading.Event()
+    proxy.on_reload(lambda old, new: reloaded.set() if new.general.max_tokens == 777 else None)
+    watcher = ConfigWatcher(proxy, config_file, None, interval=0.02).start()
+    try:
+        assert watcher.stats()['watching']
+        time.sleep(0.05)
+        write_json(tmp_path / 'config.json', {'general': {'max_tokens': 777}})
+        assert reloaded.wait(2)
+    finally:
+        watcher.stop()
+    assert not watcher.stats()['watching']
+
+def test_reload_resets_only_the_caches_whose_settings_changed(monkeypatch):
+    import rate_limit
+    import response_cache
+    import selection_cache
+    import svg_renderer
+    resets = []
+    for module, name in ((rate_limit, 'reset_rate_limiters'), (response_cache, 'reset_response_cache'),
+                         (selection_cache, 'reset_selection_cache'), (svg_renderer, 'reset_svg_renderer')):
+        monkeypatch.setattr(module, name, lambda name=name: resets.append(name))
+
+    old, new = ReasoningConfig(), ReasoningConfig()
+    invalidate_derived_caches(old, new)
+    assert resets == []
+
+    new.general.rate_limits = {'default': {'max_concurrency': 1}}
+    new.tree_search.max_depth = old.tree_search.max_depth + 1
+    invalidate_derived_caches(old, new)
+    assert resets == ['reset_rate_limiters', 'reset_response_cache']
+
+def test_process_wide_watcher_is_registered():
+    from configs import config
+    assert invalidate_derived_caches in config._callbacks
+    assert config_watcher.get_config_watcher() is None or config_watcher.get_config_watcher().proxy is config
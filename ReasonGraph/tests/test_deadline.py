@@ -0,0 +1,68 @@
+"""Request deadlines and the timeout errors of the routes"""
+import time
+
+import pytest
+
+from api_base import APIFactory, BaseAPI
+from app import app
+from deadline import (DeadlineExceeded, check_deadline, clip_timeout, clip_timeouts, deadline_scope,
+                      expired, remaining, request_timeout)
+
+class SlowAPI(BaseAPI):
+    """Ignores the deadline, like a provider SDK without per-call timeouts"""
+    delay = 0.3
+
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Slow'
+        self.calls = 0
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        return '<step number="1">Slow</step><answer>late</answer>'
+
+def test_no_deadline():
+    assert remaining() is None and not expired()
+    check_deadline()
+    assert clip_timeout(5.0) == 5.0 and clip_timeout(None) is None
+
+def test_timeouts_are_clipped_to_the_deadline():
+    with deadline_scope(1.0):
+        assert 0.9 < remaining() <= 1.0
+        assert clip_timeout(10.0) <= 1.0 and clip_timeout(0.5) == 0.5
+        assert clip_timeout(None) <= 1.0
+        connect, read = clip_timeouts(0.1, 30.0)
+        assert connect == 0.1 and read <= 1.0
+    assert remaining() is None
+
+def test_expired_deadline_raises_with_the_timeout():
+    with pytest.raises(DeadlineExceeded) as error:
+        with deadline_scope(0.01):
+            time.sleep(0.02)
+            assert expired()
+            clip_timeout(1.0)
+    assert error.value.timeout == 0.01 and str(error.value) == 'Request timed out after 0.01s'
+
+def test_request_timeout():
+    assert request_timeout({'timeout': '2.5'}) == 2.5
+    assert 9 < request_timeout({'deadline': time.time() + 10}) <= 10
+    for body in ({'timeout': 0}, {'deadline': time.time() - 1}, {'timeout': 'soon'}):
+        with pytest.raises(ValueError):
+            request_timeout(body)
+
+def test_late_provider_response_is_a_timeout_and_not_cached():
+    APIFactory.register_provider('slow', SlowAPI, 'model')
+    client = app.test_client()
+    body = {'api_key': 'deadline-key', 'provider': 'slow', 'model': 'model', 'question': 'Deadline?'}
+
+    response = client.post('/process', json=dict(body, timeout=0.1))
+    assert response.status_code == 504
+    data = response.get_json()
+    assert data['error_type'] == 'timeout' and data['timeout'] == 0.1
+
+    # The late response was not stored, so the next request asks the provider again
+    response = client.post('/process', json=dict(body, timeout=5))
+    assert response.status_code == 200 and response.headers['X-Cache'] == 'MISS'
+    with APIFactory.lease_api('slow', 'deadline-key', 'model') as api:
+        assert api.calls == 2
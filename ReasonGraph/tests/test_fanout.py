@@ -0,0 +1,103 @@
+"""Self-consistency fan-out over concurrent provider calls"""
+import itertools
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from api_base import APIFactory, BaseAPI
+from app import MAX_NUM_PATHS, ProcessRequest, app, parse_num_paths
+from selfconsistency_reasoning import generate_parallel_paths, parse_scr_response, vote_is_decided
+
+def path_text(answer):
+    return f'<step number="1">Think</step><answer>{answer}</answer>'
+
+class FanoutAPI(BaseAPI):
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Fanout'
+        self.calls = []
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        self.calls.append(temperature)
+        return path_text('4')
+
+def test_parse_num_paths():
+    assert parse_num_paths({}) is None
+    assert parse_num_paths({'num_paths': '3'}) == 3
+    assert parse_num_paths({'num_paths': 1000}) == MAX_NUM_PATHS
+    for value in (0, -2, 'many'):
+        with pytest.raises(ValueError):
+            parse_num_paths({'num_paths': value})
+
+def test_fanout_is_only_accepted_for_self_consistency():
+    body = {'api_key': 'key', 'question': 'Q', 'execution_mode': 'fanout'}
+    assert ProcessRequest.from_json(dict(body, reasoning_method='scr')).execution_mode == 'fanout'
+    with pytest.raises(ValueError):
+        ProcessRequest.from_json(dict(body, reasoning_method='cot'))
+
+def test_paths_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def generate_path():
+        barrier.wait()  # Deadlocks unless all three calls are in flight at once
+        return path_text('4')
+
+    result, raw_output = generate_parallel_paths(generate_path, 'Q', num_paths=3, max_workers=3,
+                                                 early_stopping=False)
+    assert [path.path_id for path in result.paths] == [1, 2, 3]
+    assert result.final_answer == '4' and result.vote_counts == {'4': 3}
+    assert parse_scr_response(raw_output, 'Q').final_answer == '4'
+
+def test_early_stopping_once_the_majority_is_decided():
+    started = Counter()
+    lock = threading.Lock()
+
+    def generate_path():
+        with lock:
+            started['calls'] += 1
+            call = started['calls']
+        if call > 3:
+            time.sleep(0.5)
+        return path_text('4')
+
+    begin = time.monotonic()
+    result, _ = generate_parallel_paths(generate_path, 'Q', num_paths=5, max_workers=5)
+    assert time.monotonic() - begin < 0.5
+    assert len(result.paths) == 3 and result.final_answer == '4'
+
+def test_failed_paths_are_skipped_unless_all_fail():
+    calls = itertools.count()
+
+    def flaky():
+        if next(calls) % 2:
+            raise RuntimeError('provider error')
+        return path_text('4')
+
+    result, _ = generate_parallel_paths(flaky, 'Q', num_paths=4, max_workers=1, early_stopping=False)
+    assert len(result.paths) == 2
+
+    def failing():
+        raise RuntimeError('provider error')
+
+    with pytest.raises(RuntimeError):
+        generate_parallel_paths(failing, 'Q', num_paths=2)
+
+def test_vote_is_decided():
+    assert not vote_is_decided(Counter(), 3)
+    assert vote_is_decided(Counter({'a': 3}), 2)
+    assert not vote_is_decided(Counter({'a': 3, 'b': 1}), 2)
+
+def test_process_fans_out_with_the_requested_temperature():
+    APIFactory.register_provider('fanout', FanoutAPI, 'model')
+    response = app.test_client().post('/process', json={
+        'api_key': 'key', 'provider': 'fanout', 'model': 'model', 'question': 'Q',
+        'reasoning_method': 'scr', 'execution_mode': 'fanout', 'num_paths': 4,
+        'early_stopping': False, 'temperature': 0.9, 'cache': False
+    })
+    data = response.get_json()
+    assert response.status_code == 200 and data['success']
+    assert data['raw_output'].count('Path ') == 4
+    with APIFactory.lease_api('fanout', 'key', 'model') as api:
+        assert api.calls[-4:] == [0.9] * 4
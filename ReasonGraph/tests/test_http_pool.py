@@ -0,0 +1,52 @@
+"""The shared keep-alive HTTP transport"""
+import threading
+
+import pytest
+
+from deadline import DeadlineExceeded, deadline_scope
+from http_pool import HTTPPool, HTTPPoolConfig
+
+def test_connections_are_reused(provider_server):
+    pool = HTTPPool()
+    for _ in range(5):
+        assert pool.post(provider_server.url, json={}).status_code == 200
+    stats = pool.stats()
+    assert (stats['requests'], stats['misses'], stats['hits']) == (5, 1, 4)
+    assert list(stats['hosts'].values())[0]['idle_connections'] == 1
+    pool.close()
+
+def test_threads_share_connections_but_not_sessions(provider_server):
+    pool = HTTPPool()
+    sessions = []
+
+    def work():
+        sessions.append(pool.session())
+        pool.post(provider_server.url, json={})
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(session) for session in sessions}) == 3
+    assert pool.stats()['requests'] == 3
+    assert pool.session() is pool.session()
+    pool.close()
+
+def test_keep_alive_disabled(provider_server):
+    pool = HTTPPool(HTTPPoolConfig(keep_alive=False))
+    pool.post(provider_server.url, json={})
+    assert pool.session().headers['Connection'] == 'close'
+    pool.close()
+
+def test_default_timeouts_are_bounded_by_the_deadline(monkeypatch):
+    pool = HTTPPool(HTTPPoolConfig(connect_timeout=10, read_timeout=300))
+    sent = {}
+    monkeypatch.setattr(pool.session(), 'request', lambda method, url, **kwargs: sent.update(kwargs))
+    pool.post('http://example.invalid/')
+    assert sent['timeout'] == (10, 300)
+    with deadline_scope(2):
+        pool.post('http://example.invalid/')
+    assert all(0 < timeout <= 2 for timeout in sent['timeout'])
+    with deadline_scope(0), pytest.raises(DeadlineExceeded):
+        pool.post('http://example.invalid/')
@@ -0,0 +1,70 @@
+"""Mermaid diagrams of Tree of Thoughts and Beam Search responses"""
+import io
+
+from bs_reasoning import (BSNode, BSResponse, create_mermaid_diagram as bs_diagram,
+                          iter_mermaid_lines as bs_lines, write_mermaid_diagram as write_bs_diagram)
+from cot_reasoning import VisualizationConfig
+from tot_reasoning import (ToTNode, ToTResponse, create_mermaid_diagram as tot_diagram,
+                           iter_mermaid_lines as tot_lines, write_mermaid_diagram as write_tot_diagram)
+
+DEPTH = 50_000
+
+def tot_chain(depth):
+    root = node = ToTNode('root', 'Start')
+    for number in range(1, depth):
+        child = ToTNode(f'node{number}', f'Step {number}', node.id)
+        node.children.append(child)
+        node = child
+    return ToTResponse('Q', root, 'done'), node
+
+def bs_chain(depth):
+    root = node = BSNode('root', 'Start', 0.9, is_best_path=True, path_score=1.0)
+    for number in range(1, depth):
+        child = BSNode(f'node{number}', f'Step {number}', 0.5, node.id, is_best_path=True, path_score=1.0)
+        node.children.append(child)
+        node = child
+    node.id = 'result'
+    return BSResponse('Q', root, 'done', best_score=1.0, result_nodes=[node]), node
+
+def test_tot_lines_are_depth_first_in_child_order():
+    root = ToTNode('root', 'Start')
+    first, second = ToTNode('a', 'First', 'root'), ToTNode('b', 'Second', 'root')
+    first.children.append(ToTNode('a1', 'Deeper', 'a'))
+    root.children.extend([first, second])
+    lines = list(tot_lines(ToTResponse('Q', root, 'done'), VisualizationConfig()))
+    nodes = [line.split('[', 1)[0].strip() for line in lines if '["' in line]
+    assert nodes == ['Q', 'root', 'a', 'a1', 'b', 'Answer']
+    assert '    a1 --> Answer' in lines and '    b --> Answer' in lines
+    assert '    a --> Answer' not in lines
+    assert lines[0] == '<div class="mermaid">' and lines[-1] == '</div>'
+
+def test_bs_lines_style_the_best_path():
+    root = BSNode('root', 'Start', 0.9, is_best_path=True)
+    best = BSNode('result1', 'Best', 0.8, 'root', is_best_path=True, path_score=0.72)
+    other = BSNode('result2', 'Other', 0.3, 'root', path_score=0.27)
+    root.children.extend([best, other])
+    lines = list(bs_lines(BSResponse('Q', root, 'done', 0.72, [best]), VisualizationConfig()))
+    assert '    class root best_intermediate;' in lines
+    assert '    class result1 best_result;' in lines and '    class result2 result;' in lines
+    assert '    result1 --> Answer' in lines and '    result2 --> Answer' not in lines
+
+def test_deep_tot_chain_renders_without_recursion():
+    response, leaf = tot_chain(DEPTH)
+    diagram = tot_diagram(response, VisualizationConfig())
+    assert f'    {leaf.id} --> Answer' in diagram
+    assert diagram.count(' --> ') == DEPTH + 1  # Q to root, the chain, the leaf to the answer
+
+def test_deep_bs_chain_renders_without_recursion():
+    response, leaf = bs_chain(DEPTH)
+    diagram = bs_diagram(response, VisualizationConfig())
+    assert '    class result best_result;' in diagram
+    assert diagram.count(' --> ') == DEPTH + 1
+
+def test_written_diagram_matches_the_created_one():
+    config = VisualizationConfig()
+    for response, write, create in ((tot_chain(50)[0], write_tot_diagram, tot_diagram),
+                                    (bs_chain(50)[0], write_bs_diagram, bs_diagram)):
+        out = io.StringIO()
+        write(response, config, out)
+        assert out.getvalue() == create(response, config)
+        assert not out.getvalue().endswith('\n')
@@ -0,0 +1,87 @@
+"""Offline method selection and the /select-method route"""
+import pytest
+
+from api_base import APIFactory, BaseAPI
+from app import app
+from method_selector import DEFAULT_METHOD, score_methods, select_method_locally
+
+@pytest.mark.parametrize('question,method', [
+    ('Using the numbers 4, 7, 8, 8 make 24 with arithmetic operations.', 'tot'),
+    ('How many r letters are in strawberry?', 'scr'),
+    ('Write a poem about autumn and then improve it.', 'srf'),
+    ('How do I set up a home network? Break it down into steps.', 'l2m'),
+    ('What career transition strategies do you recommend for switching to data science?', 'bs'),
+    ('John has 5 apples and buys 3 more. How many apples does he have in total?', 'cot'),
+])
+def test_distinctive_questions(question, method):
+    selection = select_method_locally(question)
+    assert selection.method == method and selection.source == 'local'
+    assert 0.5 < selection.confidence <= 1.0
+
+def test_featureless_question_defaults_with_low_confidence():
+    selection = select_method_locally('Hello there')
+    assert selection.method == DEFAULT_METHOD
+    assert selection.confidence < 0.5
+    assert set(selection.scores) == {'cot', 'tot', 'scr', 'srf', 'l2m', 'bs'}
+
+def test_candidates_restrict_the_selection():
+    question = 'Using the numbers 4, 7, 8, 8 make 24 with arithmetic operations.'
+    assert set(score_methods(question, ['tot', 'bs', 'unknown'])) == {'tot', 'bs'}
+    assert select_method_locally(question, ['cot', 'bs']).method == 'cot'
+    with pytest.raises(ValueError):
+        select_method_locally(question, ['unknown'])
+
+class SelectingAPI(BaseAPI):
+    """Selects the method named in the question after 'pick:'"""
+
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Selecting'
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        if 'pick:fail' in prompt:
+            raise RuntimeError('provider down')
+        method = prompt.split('pick:', 1)[1].split('"', 1)[0]
+        return f'<selected_method>{method}</selected_method>'
+
+@pytest.fixture
+def select():
+    APIFactory.register_provider('selecting', SelectingAPI, 'model')
+    client = app.test_client()
+
+    def post(question, **fields):
+        body = {'question': question, 'api_key': 'key', 'provider': 'selecting', 'model': 'model',
+                'cache': False}
+        response = client.post('/select-method', json=dict(body, **fields))
+        return response.status_code, response.get_json()
+
+    return post
+
+def test_confident_local_selection_skips_the_model(select):
+    status, data = select('How many r letters are in strawberry? pick:bs')
+    assert status == 200 and data['selected_method'] == 'scr' and data['selector'] == 'local'
+
+def test_unsure_local_selection_asks_the_model(select):
+    status, data = select('Hello pick:bs')
+    assert status == 200 and data['selected_method'] == 'bs' and data['selector'] == 'llm'
+    assert data['raw_response'] == '<selected_method>bs</selected_method>'
+
+def test_model_failures_fall_back_to_the_local_selection(select):
+    status, data = select('Hello pick:fail')
+    assert status == 200 and data['selector'] == 'local' and data['selected_method'] == DEFAULT_METHOD
+    status, data = select('Hello pick:nonsense')
+    assert status == 200 and data['selector'] == 'local'
+
+def test_llm_selector_reports_model_failures(select):
+    status, data = select('Hello pick:fail', selector='llm')
+    assert status == 500 and data['error'] == 'API call failed: provider down'
+    status, data = select('Hello pick:nonsense', selector='llm')
+    assert status == 400 and data['error'] == 'Invalid method selection in response'
+
+def test_local_selector_needs_no_credentials(select):
+    status, data = select('Hello', selector='local', api_key=None, model=None)
+    assert status == 200 and data['selector'] == 'local'
+    status, data = select('Hello', selector='auto', api_key=None)
+    assert status == 200 and data['selector'] == 'local'
+    status, data = select('Hello', selector='unknown')
+    assert status == 400
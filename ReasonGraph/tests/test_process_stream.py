@@ -0,0 +1,86 @@
+"""Server-sent events of /process-stream"""
+import json
+
+import pytest
+
+from api_base import APIFactory, BaseAPI
+from app import DiagramThrottle, app
+from configs import config
+
+STEPS = [f'<step number="{number}">Step {number}</step>' for number in range(1, 21)] + ['<answer>42</answer>']
+
+class StreamingAPI(BaseAPI):
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Streaming'
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        return ''.join(STEPS)
+
+    def stream_response(self, prompt, max_tokens=1024, prompt_format=None):
+        # Every chunk closes one element
+        yield from STEPS
+
+@pytest.fixture
+def client():
+    APIFactory.register_provider('streaming', StreamingAPI, 'model')
+    return app.test_client()
+
+def events(response):
+    parsed = []
+    for block in response.get_data(as_text=True).strip().split('\n\n'):
+        event, data = block.split('\n', 1)
+        parsed.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return parsed
+
+def stream(client, **fields):
+    body = {'api_key': 'key', 'provider': 'streaming', 'model': 'model', 'question': 'Q', 'cache': False}
+    return events(client.post('/process-stream', json=dict(body, **fields)))
+
+def test_throttle_spaces_rebuilds():
+    now = [0.0]
+    throttle = DiagramThrottle(1.0, clock=lambda: now[0])
+    build = lambda: 'diagram'
+    assert throttle.render(build) is None  # Nothing new yet
+    throttle.pending = True
+    assert throttle.render(build) == 'diagram'
+    throttle.pending = True
+    now[0] = 0.5
+    assert throttle.render(build) is None
+    now[0] = 1.0
+    assert throttle.render(build) == 'diagram'
+    assert not throttle.pending
+
+def test_throttle_backs_off_after_slow_rebuilds():
+    now = [0.0]
+    throttle = DiagramThrottle(0.1, clock=lambda: now[0])
+
+    def slow_build():
+        now[0] += 0.5
+        return 'diagram'
+
+    throttle.pending = True
+    assert throttle.render(slow_build) == 'diagram'
+    throttle.pending = True
+    now[0] = 4.0
+    assert throttle.render(slow_build) is None
+    now[0] = 5.5
+    assert throttle.render(slow_build) == 'diagram'
+
+def test_stream_reports_every_step_and_throttles_diagrams(client, monkeypatch):
+    monkeypatch.setattr(config.general, 'stream_diagram_interval', 3600.0)
+    received = stream(client)
+    names = [name for name, _ in received]
+    assert names.count('text') == len(STEPS)
+    assert names.count('step') == len(STEPS)
+    # The first element is drawn at once, the rest only in the final payload
+    assert names.count('diagram') == 1
+    name, done = received[-1]
+    assert name == 'done' and done['raw_output'] == ''.join(STEPS)
+    assert 'S20' in done['visualization']
+
+def test_stream_without_throttling_draws_after_every_element(client, monkeypatch):
+    monkeypatch.setattr(config.general, 'stream_diagram_interval', 0.0)
+    monkeypatch.setattr(DiagramThrottle, 'BUILD_TIME_FACTOR', 0)
+    names = [name for name, _ in stream(client)]
+    assert names.count('diagram') == len(STEPS)
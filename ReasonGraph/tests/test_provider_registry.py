@@ -0,0 +1,69 @@
+"""The provider registry of APIFactory and the lazy imports behind it"""
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+from api_base import APIError, APIFactory, BaseAPI, TyAPI
+from async_api import AsyncAPIFactory, AsyncTyAPI
+
+class LazyAPI(BaseAPI):
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        return prompt
+
+@pytest.fixture
+def lazy_module(monkeypatch):
+    """A module that only exists once the registry imports it"""
+    module = types.ModuleType('lazy_provider')
+    module.LazyAPI = LazyAPI
+    imported = []
+
+    def import_module(name, package=None):
+        imported.append(name)
+        monkeypatch.setitem(sys.modules, name, module)
+        return module
+
+    monkeypatch.setattr('importlib.import_module', import_module)
+    return imported
+
+def test_built_in_providers_are_references_resolved_on_use():
+    for provider in ('anthropic', 'openai', 'google', 'together', 'deepseek', 'qwen', 'grok'):
+        assert provider in APIFactory.supported_providers()
+        _, api_class, model = APIFactory._resolve(provider.upper(), None)
+        assert api_class is TyAPI and model == APIFactory._providers[provider]['default_model']
+        assert APIFactory._providers[provider]['class'] is TyAPI
+
+def test_resolved_built_ins_keep_their_async_class():
+    assert AsyncAPIFactory._async_classes[APIFactory._resolve('qwen', None)[1]] is AsyncTyAPI
+
+def test_registered_reference_is_imported_once_on_first_use(lazy_module):
+    APIFactory.register_provider('Lazy', 'lazy_provider:LazyAPI', 'lazy-model')
+    try:
+        assert lazy_module == []
+        api = APIFactory.create_api('lazy', 'key')
+        assert isinstance(api, LazyAPI) and api.model == 'lazy-model' and api.provider == 'lazy'
+        APIFactory.create_api('lazy', 'key', 'other-model')
+        assert lazy_module == ['lazy_provider']
+    finally:
+        APIFactory._providers.pop('lazy')
+
+def test_broken_reference_is_an_api_error():
+    APIFactory.register_provider('broken', 'api_base:NoSuchAPI', 'model')
+    try:
+        with pytest.raises(APIError) as error:
+            APIFactory.create_api('broken', 'key')
+        assert error.value.provider == 'broken' and 'api_base:NoSuchAPI' in str(error.value)
+    finally:
+        APIFactory._providers.pop('broken')
+
+def test_unknown_provider():
+    with pytest.raises(ValueError, match='Unsupported provider: nobody'):
+        APIFactory.create_api('nobody', 'key')
+
+def test_importing_the_app_imports_no_provider_sdk():
+    code = 'import sys, app; print(sorted({"openai", "anthropic", "google.generativeai", "together"} & set(sys.modules)))'
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip().splitlines()[-1] == '[]'
@@ -0,0 +1,124 @@
+"""AdaptiveLimiter throttling and the per-provider limiter registry"""
+import asyncio
+import time
+
+import pytest
+
+import rate_limit
+from api_base import APIFactory, BaseAPI
+from deadline import DeadlineExceeded, deadline_scope
+from rate_limit import AdaptiveLimiter, RateLimitTimeout, configure_rate_limit, get_rate_limiter, retry_after
+
+class Throttled(Exception):
+    """A provider error carrying an HTTP response"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f'HTTP {status_code}')
+        self.response = type('Response', (), {'status_code': status_code, 'headers': headers or {}})()
+
+class EchoAPI(BaseAPI):
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Echo'  # Shared by every provider using this class
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        return prompt
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(monkeypatch):
+    monkeypatch.setattr(rate_limit, '_overrides', {})
+    rate_limit.reset_rate_limiters()
+    yield
+    rate_limit.reset_rate_limiters()
+
+def test_token_bucket_spaces_calls():
+    limiter = AdaptiveLimiter('test', requests_per_second=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+        limiter.release()
+    assert time.monotonic() - start >= 0.09  # Five refills of 20 ms
+
+def test_concurrency_limit_queues_then_times_out():
+    limiter = AdaptiveLimiter('test', max_concurrency=2)
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(timeout=0.05)
+    limiter.release()
+    limiter.acquire(timeout=0.05)
+    assert limiter.stats()['in_flight'] == 2
+
+def test_call_gives_up_at_the_deadline():
+    limiter = AdaptiveLimiter('test', max_concurrency=1)
+    limiter.acquire()
+    with deadline_scope(0.05), pytest.raises(DeadlineExceeded):
+        limiter.call(lambda: 'never')
+
+def test_throttling_halves_the_limit_and_pauses():
+    limiter = AdaptiveLimiter('test', max_concurrency=8)
+
+    def throttled():
+        raise Throttled(429, {'Retry-After': '0.2'})
+
+    with pytest.raises(Throttled):
+        limiter.call(throttled)
+    stats = limiter.stats()
+    assert stats['throttled'] == 1
+    assert stats['concurrency_limit'] == 4
+    assert 0 < stats['paused_for'] <= 0.2
+    assert limiter.acquire() >= 0.1  # Waited out the pause
+
+def test_raw_429_response_throttles():
+    limiter = AdaptiveLimiter('test', max_concurrency=4)
+    response = type('Response', (), {'status_code': 429, 'headers': {'retry-after': '0'}})()
+    assert limiter.call(lambda: response) is response
+    assert limiter.stats()['concurrency_limit'] == 2
+
+def test_success_increases_the_limit_back():
+    limiter = AdaptiveLimiter('test', max_concurrency=4)
+    limiter.limit = 1.0
+    for _ in range(3):
+        limiter.call(lambda: None)
+    assert 1.0 < limiter.limit <= 4
+
+def test_retry_after_forms():
+    assert retry_after(Throttled(429, {'Retry-After': '3'})) == 3.0
+    assert retry_after(Throttled(429, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0.0
+    assert retry_after(Throttled(429)) is None
+    assert retry_after(ValueError()) is None
+
+def test_async_calls_share_the_concurrency_limit():
+    limiter = AdaptiveLimiter('test', max_concurrency=1)
+    running = []
+    peak = []
+
+    async def request():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+        return 'ok'
+
+    async def main():
+        return await asyncio.gather(*(limiter.call_async(request) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['ok'] * 5
+    assert max(peak) == 1
+    assert limiter.stats()['admitted'] == 5
+
+def test_limiters_keyed_by_factory_provider():
+    APIFactory.register_provider('echo-a', EchoAPI, 'model')
+    APIFactory.register_provider('echo-b', EchoAPI, 'model')
+    api_a = APIFactory.create_api('echo-a', 'key')
+    api_b = APIFactory.create_api('echo-b', 'key')
+    assert (api_a.limit_key, api_b.limit_key) == ('echo-a', 'echo-b')
+    assert get_rate_limiter(api_a.limit_key, 'model') is not get_rate_limiter(api_b.limit_key, 'model')
+    assert get_rate_limiter('ECHO-A', 'model') is get_rate_limiter('echo-a', 'model')
+
+def test_configure_rate_limit_replaces_limiters():
+    before = get_rate_limiter('echo-a', 'model')
+    configure_rate_limit('echo-a', requests_per_second=5, max_concurrency=3)
+    limiter = get_rate_limiter('echo-a', 'model')
+    assert limiter is not before
+    assert (limiter.max_rate, limiter.max_concurrency) == (5, 3)
@@ -0,0 +1,46 @@
+"""Re-visualizing stored raw outputs with /render"""
+import pytest
+
+from app import ProcessRequest, app, parse_positive_int
+
+RAW_OUTPUT = '<step number="1">Add the numbers</step><answer>4</answer>'
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+def test_render_returns_the_diagram_and_timings(client):
+    response = client.post('/render', json={'raw_output': RAW_OUTPUT, 'question': 'What is 2 + 2?',
+                                            'chars_per_line': 10, 'max_lines': 2})
+    data = response.get_json()
+    assert response.status_code == 200 and data['success']
+    assert 'Add the' in data['visualization'] and data['svg'] is None
+    assert set(data['timings']) == {'parse_ms', 'render_ms', 'svg_ms'}
+    assert response.headers['Server-Timing'].startswith('parse;dur=')
+
+@pytest.mark.parametrize('field,value', [
+    ('chars_per_line', 0), ('chars_per_line', -5), ('max_lines', 0), ('max_lines', 'many'),
+    ('max_lines', [3]), ('chars_per_line', True)
+])
+def test_invalid_visualization_settings_are_rejected(client, field, value):
+    response = client.post('/render', json={'raw_output': RAW_OUTPUT, field: value})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'{field} must be a positive integer'
+
+    with pytest.raises(ValueError):
+        ProcessRequest.from_json({'api_key': 'key', 'question': 'Q', field: value})
+
+@pytest.mark.parametrize('body,error', [
+    ({'reasoning_method': 'cot'}, 'Raw output is required'),
+    ({'raw_output': RAW_OUTPUT, 'reasoning_method': 'unknown'}, 'Unknown reasoning method: unknown'),
+    ({'raw_output': RAW_OUTPUT, 'render': 'png'}, 'Render mode must be one of: mermaid, svg'),
+])
+def test_invalid_requests(client, body, error):
+    response = client.post('/render', json=body)
+    assert response.status_code == 400 and response.get_json()['error'] == error
+
+def test_parse_positive_int():
+    assert parse_positive_int({}, 'max_lines', 8) == 8
+    assert parse_positive_int({'max_lines': '3'}, 'max_lines', 8) == 3
+    with pytest.raises(ValueError):
+        parse_positive_int({'max_lines': '-1'}, 'max_lines', 8)
@@ -0,0 +1,94 @@
+"""The tiered response cache and the request fields it is keyed by"""
+import time
+
+import pytest
+
+import response_cache
+from app import ProcessRequest, parse_flag
+from response_cache import MemoryStore, ResponseCache, ResponseStore, SQLiteStore
+
+class BrokenStore(ResponseStore):
+    name = 'broken'
+
+    def get(self, key):
+        raise OSError('unavailable')
+
+    def set(self, key, value):
+        raise OSError('unavailable')
+
+    def clear(self):
+        pass
+
+@pytest.fixture
+def disk(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'responses.db'), maxsize=3, ttl=None)
+    yield store
+    store.close()
+
+def test_store_must_implement_the_tier_interface():
+    with pytest.raises(TypeError):
+        ResponseStore()
+
+def test_memory_tier():
+    cache = ResponseCache(MemoryStore(maxsize=2))
+    assert cache.get('a') == (None, None)
+    cache.set('a', 'A')
+    assert cache.get('a') == ('A', 'memory')
+
+def test_disk_hits_are_promoted_to_memory(disk):
+    ResponseCache(MemoryStore(), disk).set('a', 'A')
+    memory = MemoryStore()
+    cache = ResponseCache(memory, disk)
+    assert cache.get('a') == ('A', 'disk')
+    assert cache.get('a') == ('A', 'memory')
+
+def test_disk_tier_evicts_least_recently_used(disk):
+    for key in 'abc':
+        disk.set(key, key.upper())
+        time.sleep(0.001)
+    disk.get('a')
+    disk.set('d', 'D')
+    assert [disk.get(key) for key in 'abcd'] == ['A', None, 'C', 'D']
+
+def test_disk_tier_ttl(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'responses.db'), ttl=0.05)
+    store.set('a', 'A')
+    assert store.get('a') == 'A'
+    time.sleep(0.1)
+    assert store.get('a') is None
+    store.close()
+
+def test_failing_tier_is_skipped():
+    cache = ResponseCache(BrokenStore(), MemoryStore())
+    cache.set('a', 'A')
+    assert cache.get('a') == ('A', 'memory')
+
+def test_reset_leaves_the_old_cache_open(disk, monkeypatch):
+    cache = response_cache.configure_response_cache(ResponseCache(MemoryStore(), disk))
+    response_cache.reset_response_cache()
+    cache.set('a', 'A')  # A request still holding the old cache can use it
+    assert cache.get('a') == ('A', 'memory')
+    assert response_cache.get_response_cache() is not cache
+
+def make_request(**fields):
+    return ProcessRequest.from_json({'api_key': 'key-1', 'question': 'What is 2 + 2?', **fields})
+
+def test_cache_key_depends_on_the_api_key_and_prompt():
+    key = make_request().cache_key
+    assert make_request(api_key='key-2').cache_key != key
+    assert make_request(max_tokens=10).cache_key != key
+    assert make_request(prompt_format='{question}?').cache_key != key
+    # Visualization settings do not change the model output
+    assert make_request(chars_per_line=10, max_lines=2).cache_key == key
+
+@pytest.mark.parametrize('value,expected', [
+    (None, True), (True, True), (False, False), (0, False), (1, True),
+    ('false', False), (' TRUE ', True), ('0', False)
+])
+def test_parse_flag(value, expected):
+    assert parse_flag({'cache': value}, 'cache') is expected
+
+@pytest.mark.parametrize('value', ['no', 'off', 2, [], {}])
+def test_parse_flag_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        parse_flag({'cache': value}, 'cache')
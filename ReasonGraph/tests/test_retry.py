@@ -0,0 +1,192 @@
+"""Retries, hedging and retry scopes of provider calls"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import retry
+from deadline import DeadlineExceeded, deadline_scope
+from retry import (LatencyTracker, RetryPolicy, async_call_with_retry, call_with_retry, get_retry_policy,
+                   is_retryable_error, retry_scope)
+
+NO_DELAY = RetryPolicy(attempts=3, base_delay=0.0, max_delay=0.0)
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def failing(*outcomes):
+    """A request returning or raising outcomes in turn, counting its calls"""
+    calls = []
+
+    def request():
+        outcome = outcomes[len(calls)]
+        calls.append(threading.current_thread())
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return request, calls
+
+def test_transient_errors_are_retried():
+    request, calls = failing(ConnectionError(), StatusError(503), 'ok')
+    assert call_with_retry(request, NO_DELAY) == 'ok'
+    assert len(calls) == 3
+
+def test_other_errors_are_not_retried():
+    request, calls = failing(StatusError(400), 'ok')
+    with pytest.raises(StatusError):
+        call_with_retry(request, NO_DELAY)
+    assert len(calls) == 1
+
+def test_last_retryable_response_is_returned():
+    responses = [Response(502), Response(502), Response(502)]
+    request, calls = failing(*responses)
+    assert call_with_retry(request, NO_DELAY) is responses[-1]
+    assert [response.closed for response in responses] == [True, True, False]
+
+def test_no_retry_past_the_deadline():
+    throttled = StatusError(429)
+    throttled.response = Response(429)
+    throttled.response.headers = {'Retry-After': '1'}
+    request, calls = failing(throttled, 'ok')
+    with deadline_scope(0.05), pytest.raises(DeadlineExceeded):
+        call_with_retry(request, RetryPolicy(attempts=3, base_delay=0.0, max_delay=1.0))
+    assert len(calls) == 1
+
+def test_backoff_honours_retry_after():
+    policy = RetryPolicy(base_delay=0.1, max_delay=2.0)
+    assert all(0 <= policy.backoff(attempt) <= 2.0 for attempt in range(10))
+    assert policy.backoff(0, retry_after=1.5) >= 1.5
+    assert policy.backoff(0, retry_after=60) == 2.0
+
+def test_is_retryable_error():
+    assert is_retryable_error(TimeoutError())
+    assert is_retryable_error(StatusError(504))
+    assert not is_retryable_error(StatusError(401))
+    assert not is_retryable_error(ValueError())
+
+def test_retry_scope_overrides_attempts():
+    configured = get_retry_policy().attempts
+    with retry_scope(7):
+        assert get_retry_policy().attempts == 7
+        with retry_scope(0):
+            assert get_retry_policy().attempts == 1
+    assert get_retry_policy().attempts == configured
+
+def hedging_tracker():
+    tracker = LatencyTracker()
+    for _ in range(5):
+        tracker.record(0.01)
+    return tracker
+
+HEDGING = RetryPolicy(attempts=1, hedge=True, hedge_min_samples=5)
+
+def test_fast_first_attempt_is_not_hedged():
+    request, calls = failing('ok')
+    hedged = retry.retry_stats()['hedged']
+    assert call_with_retry(request, HEDGING, tracker=hedging_tracker(), hedge=True) == 'ok'
+    assert len(calls) == 1
+    assert retry.retry_stats()['hedged'] == hedged
+
+def test_hedge_answers_when_the_slow_first_attempt_fails():
+    calls = []
+
+    def request():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.2)
+            raise StatusError(400)
+        return 'hedge'
+
+    wins = retry.retry_stats()['hedge_wins']
+    assert call_with_retry(request, HEDGING, tracker=hedging_tracker(), hedge=True) == 'hedge'
+    assert len(calls) == 2
+    assert retry.retry_stats()['hedge_wins'] == wins + 1
+
+def test_first_success_wins_and_the_loser_is_discarded():
+    slow = Response(200)
+    done = threading.Event()
+
+    def request():
+        if not done.is_set():
+            done.set()
+            time.sleep(0.3)
+            return slow
+        return 'hedge'
+
+    start = time.monotonic()
+    assert call_with_retry(request, HEDGING, tracker=hedging_tracker(), hedge=True) == 'hedge'
+    assert time.monotonic() - start < 0.25
+    time.sleep(0.4)
+    assert slow.closed
+
+def test_both_attempts_failing_surface_the_first_failure():
+    calls = []
+
+    def request():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            raise StatusError(400)
+        raise StatusError(401)
+
+    with pytest.raises(StatusError) as error:
+        call_with_retry(request, HEDGING, tracker=hedging_tracker(), hedge=True)
+    assert error.value.status_code == 400
+
+def test_async_hedge_cancels_the_slow_attempt():
+    cancelled = []
+
+    async def main():
+        calls = []
+
+        async def request():
+            calls.append(None)
+            if len(calls) == 1:
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+                return 'first'
+            return 'hedge'
+
+        result = await async_call_with_retry(request, HEDGING, tracker=hedging_tracker(), hedge=True)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == 'hedge'
+    assert cancelled == [True]
+
+def test_async_latencies_are_tracked():
+    tracker = LatencyTracker()
+
+    async def request():
+        return 'ok'
+
+    assert asyncio.run(tracker.timed_async(request)()) == 'ok'
+    assert tracker.quantile(0.5) is not None
+
+def test_async_retry():
+    outcomes = [ConnectionError(), 'ok']
+
+    async def request():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert asyncio.run(async_call_with_retry(request, NO_DELAY)) == 'ok'
+    assert outcomes == []
@@ -0,0 +1,107 @@
+"""Speculative solving in /select-and-solve and the cancel scopes that stop it"""
+import threading
+import time
+
+import pytest
+
+import app as app_module
+from api_base import APIFactory, BaseAPI
+from app import ProcessRequest, Speculation, app, lookup_cached_response, params_for_method
+from configs import config
+from deadline import RequestCancelled, cancel_scope, check_deadline, clip_timeout, deadline_scope, remaining
+
+class SolvingAPI(BaseAPI):
+    """Selects the method after 'pick:' in the question; solving takes solve_delay seconds"""
+    solve_delay = 0.0
+    started = []
+    solved = []
+
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Solving'
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        if '<selected_method>' in prompt:
+            method = prompt.split('pick:', 1)[1].split('"', 1)[0]
+            return f'<selected_method>{method}</selected_method>'
+        # Through the rate limiter, which checks the deadline before every call
+        return self._call(self._solve, prompt_format)
+
+    def _solve(self, prompt_format):
+        self.started.append(prompt_format)
+        time.sleep(self.solve_delay)
+        self.solved.append(prompt_format)
+        return '<step number="1">Solved</step><answer>done</answer>'
+
+@pytest.fixture
+def solve(monkeypatch):
+    APIFactory.register_provider('solving', SolvingAPI, 'model')
+    monkeypatch.setattr(SolvingAPI, 'started', [])
+    monkeypatch.setattr(SolvingAPI, 'solved', [])
+    client = app.test_client()
+
+    def post(question, **fields):
+        body = {'question': question, 'api_key': 'key', 'provider': 'solving', 'model': 'model',
+                'selector': 'llm', 'cache': False}
+        response = client.post('/select-and-solve', json=dict(body, **fields))
+        return response.status_code, response.get_json()
+
+    return post
+
+def test_cancel_scope_ends_the_deadline():
+    event = threading.Event()
+    with deadline_scope(10), cancel_scope(event):
+        assert remaining() > 0
+        event.set()
+        assert remaining() == 0.0
+        with pytest.raises(RequestCancelled) as error:
+            clip_timeout(1.0)
+    assert str(error.value) == 'Request cancelled'
+    check_deadline()  # Outside the scope nothing is cancelled
+
+def test_speculation_hit(solve):
+    status, data = solve('Hello pick:cot')
+    assert status == 200
+    assert data['speculation'] == 'hit' and data['selected_method'] == 'cot'
+    assert len(SolvingAPI.solved) == 1
+
+def test_speculation_miss_cancels_the_speculative_run(solve, monkeypatch):
+    monkeypatch.setattr(SolvingAPI, 'solve_delay', 0.2)
+    status, data = solve('Hello pick:tot', api_key='miss-key', cache=True)
+    assert status == 200
+    assert data['speculation'] == 'miss' and data['selected_method'] == 'tot'
+    assert SolvingAPI.solved[-1] == data['prompt_format']
+
+    # The speculative CoT run stopped: even a call that was in flight left no cached response
+    time.sleep(0.3)
+    params = ProcessRequest.from_json({'api_key': 'miss-key', 'provider': 'solving', 'model': 'model',
+                                       'question': 'Hello pick:tot'})
+    assert lookup_cached_response(params_for_method(params, 'cot'))[0] is None
+    assert lookup_cached_response(params_for_method(params, 'tot'))[0] is not None
+
+def test_cancelled_run_stops_at_its_next_provider_call(monkeypatch):
+    APIFactory.register_provider('solving', SolvingAPI, 'model')
+    monkeypatch.setattr(SolvingAPI, 'started', [])
+    monkeypatch.setattr(SolvingAPI, 'solved', [])
+    monkeypatch.setattr(SolvingAPI, 'solve_delay', 0.1)
+    monkeypatch.setattr(config.methods['scr'], 'max_workers', 1)
+    params = ProcessRequest.from_json({
+        'api_key': 'key', 'provider': 'solving', 'model': 'model', 'question': 'Q', 'cache': False,
+        'reasoning_method': 'scr', 'execution_mode': 'fanout', 'num_paths': 5, 'early_stopping': False
+    })
+    speculative = Speculation.start(params)
+    time.sleep(0.15)
+    speculative.cancel()
+    started = len(SolvingAPI.started)
+    with pytest.raises(RequestCancelled):
+        speculative.result()
+    # The path in flight when cancelled finished, but no further path started
+    assert 1 <= started < 5 and len(SolvingAPI.started) == started
+
+def test_speculation_is_skipped_at_capacity(solve, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(app_module, '_speculation_slots', slots)
+    status, data = solve('Hello pick:cot')
+    assert status == 200 and data['speculation'] == 'skipped'
+    assert len(SolvingAPI.solved) == 1
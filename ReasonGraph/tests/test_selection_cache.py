@@ -0,0 +1,80 @@
+"""Method selections cached by normalized question and scope (provider, model and API key)"""
+import pytest
+
+from api_base import APIFactory, BaseAPI
+from app import app, selection_scope
+from selection_cache import SelectionCache, normalize_question, reset_selection_cache
+
+QUESTION = 'A train leaves at 3 pm travelling at 60 km/h. When does it arrive 180 km away?'
+
+def test_exact_hit_after_normalization():
+    cache = SelectionCache()
+    cache.set(QUESTION, 'model', 'cot')
+    assert normalize_question(QUESTION.upper() + '  ') == normalize_question(QUESTION)
+    assert cache.get('  ' + QUESTION.upper(), 'model') == ('cot', 'exact')
+
+def test_keyed_by_scope():
+    cache = SelectionCache()
+    cache.set(QUESTION, selection_scope('OpenAI', 'model', 'key-a'), 'cot')
+    assert cache.get(QUESTION, selection_scope('openai', 'model', 'key-a')) == ('cot', 'exact')
+    for scope in (selection_scope('openai', 'model', 'key-b'), selection_scope('openai', 'other', 'key-a'),
+                  selection_scope('grok', 'model', 'key-a')):
+        assert cache.get(QUESTION, scope) == (None, None)
+        # Near-duplicates of other scopes are not found either
+        assert cache.get(QUESTION.replace('3 pm', '4 pm'), scope) == (None, None)
+    assert 'key-a' not in repr(selection_scope('openai', 'model', 'key-a'))
+
+def test_fuzzy_hit_for_a_near_duplicate():
+    cache = SelectionCache(similarity=0.7)
+    cache.set(QUESTION, 'model', 'l2m')
+    assert cache.get(QUESTION.replace('3 pm', '4 pm'), 'model') == ('l2m', 'fuzzy')
+    assert cache.get('Name three prime numbers larger than one hundred.', 'model') == (None, None)
+
+def test_fuzzy_matching_disabled():
+    cache = SelectionCache(similarity=1.0)
+    cache.set(QUESTION, 'model', 'l2m')
+    assert cache.get(QUESTION.replace('3 pm', '4 pm'), 'model') == (None, None)
+
+def test_eviction_removes_the_similarity_index():
+    cache = SelectionCache(maxsize=1)
+    cache.set(QUESTION, 'model', 'cot')
+    cache.set('Name three prime numbers larger than one hundred.', 'model', 'tot')
+    assert cache.get(QUESTION.replace('3 pm', '4 pm'), 'model') == (None, None)
+    assert set(cache._signatures) == set(cache._entries.keys())
+    stats = cache.stats()
+    assert (stats['size'], stats['evictions']) == (1, 1)
+
+class SelectingAPI(BaseAPI):
+    def __init__(self, api_key, model, http_pool=None):
+        super().__init__(api_key, model, http_pool=http_pool)
+        self.provider_name = 'Selecting'
+        self.calls = 0
+
+    def generate_response(self, prompt, max_tokens=1024, prompt_format=None, temperature=None):
+        self.calls += 1
+        return f'Thinking about it for {self.api_key}: <selected_method>tot</selected_method>'
+
+@pytest.fixture
+def select():
+    reset_selection_cache()
+    APIFactory.register_provider('selecting-cache', SelectingAPI, 'model')
+    client = app.test_client()
+
+    def post(api_key):
+        return client.post('/select-method', json={
+            'question': 'Hello there', 'selector': 'llm', 'api_key': api_key,
+            'provider': 'selecting-cache', 'model': 'model'
+        }).get_json()
+
+    yield post
+    reset_selection_cache()
+
+def test_route_shares_selections_only_within_a_tenant(select):
+    first = select('tenant-a')
+    assert first['raw_response'] == 'Thinking about it for tenant-a: <selected_method>tot</selected_method>'
+    repeated = select('tenant-a')
+    assert repeated['cache'] == 'exact' and repeated['selected_method'] == 'tot'
+    assert 'raw_response' not in repeated
+
+    other = select('tenant-b')
+    assert 'cache' not in other and 'tenant-b' in other['raw_response']
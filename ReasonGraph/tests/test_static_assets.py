@@ -0,0 +1,116 @@
+"""The static asset pipeline, the vendored Mermaid bundle and the pages linking them"""
+import gzip
+import os
+import re
+
+import pytest
+
+import app as app_module
+import static_assets
+from app import app
+from static_assets import (IMMUTABLE_CACHE_CONTROL, MERMAID_DOWNLOAD_URL, MERMAID_PATH, MERMAID_VERSION, Asset,
+                           AssetPipeline, build, get_asset_pipeline, hashed_name, vendor_mermaid)
+
+BUNDLE = f'/* mermaid {MERMAID_VERSION} */\n'.encode() + b'var mermaid = {initialize() {}};\n' * 100
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'assets' / 'idea.png').write_bytes(b'\x89PNG' + bytes(2000))
+    (tmp_path / 'assets' / 'style.css').write_text('body { margin: 0; }\n' * 200)
+    return tmp_path
+
+@pytest.fixture
+def bundle(tmp_path):
+    path = tmp_path / 'mermaid.min.js'
+    path.write_bytes(BUNDLE)
+    return str(path)
+
+def test_hashed_name_follows_the_content():
+    assert re.fullmatch(r'assets/idea\.[0-9a-f]{12}\.png', hashed_name('assets/idea.png', b'a'))
+    assert hashed_name('assets/idea.png', b'a') != hashed_name('assets/idea.png', b'b')
+
+def test_assets_are_served_under_hashed_urls(static_dir):
+    pipeline = AssetPipeline(str(static_dir))
+    url = pipeline.url('assets/style.css')
+    assert url.startswith('/assets/assets/style.') and url.endswith('.css')
+    asset = pipeline.get(url[len('/assets/'):])
+    assert asset.mimetype == 'text/css' and set(asset.variants) >= {'identity', 'gzip'}
+    assert gzip.decompress(asset.variants['gzip']) == asset.variants['identity']
+    # Binary files are not compressed
+    assert set(pipeline.get(pipeline.url('assets/idea.png')[len('/assets/'):]).variants) == {'identity'}
+    assert pipeline.url('assets/unknown.js') == '/static/assets/unknown.js'
+
+def test_precompressed_variants_are_used_when_up_to_date(static_dir):
+    build(str(static_dir))
+    assert os.path.exists(static_dir / 'assets' / 'style.css.gz')
+    with open(static_dir / 'assets' / 'style.css.gz', 'rb') as f:
+        built = f.read()
+    pipeline = AssetPipeline(str(static_dir))
+    assert pipeline.get(pipeline.url('assets/style.css')[len('/assets/'):]).variants['gzip'] == built
+    assert 'assets/style.css.gz' not in pipeline._urls
+
+def test_negotiate_prefers_accepted_encodings():
+    asset = Asset.from_bytes(b'x' * 4000, 'text/plain')
+    assert asset.negotiate(lambda encoding: 1.0 if encoding == 'gzip' else 0)[0] == 'gzip'
+    assert asset.negotiate(lambda encoding: 0) == ('identity', b'x' * 4000)
+
+def test_vendored_mermaid_resolves_to_a_hashed_asset(static_dir, bundle):
+    pipeline = AssetPipeline(str(static_dir))
+    assert pipeline.url(MERMAID_PATH) == MERMAID_DOWNLOAD_URL
+    assert pipeline.missing() == (MERMAID_PATH,)
+
+    target = vendor_mermaid(bundle, str(static_dir))
+    assert target == os.path.join(str(static_dir), MERMAID_PATH)
+    pipeline.reload()
+    url = pipeline.url(MERMAID_PATH)
+    assert re.fullmatch(r'/assets/vendor/mermaid\.min\.[0-9a-f]{12}\.js', url)
+    assert pipeline.get(url[len('/assets/'):]).variants['identity'] == BUNDLE
+    assert pipeline.missing() == ()
+
+def test_vendor_mermaid_rejects_other_versions(static_dir, tmp_path):
+    other = tmp_path / 'other.js'
+    other.write_text('/* mermaid 11.0.0 */')
+    with pytest.raises(ValueError, match=f'is not Mermaid {MERMAID_VERSION}'):
+        vendor_mermaid(str(other), str(static_dir))
+    assert not os.path.exists(os.path.join(str(static_dir), MERMAID_PATH))
+
+@pytest.fixture
+def pipeline(static_dir, monkeypatch):
+    """The application's pipeline on a temporary static directory, with the page cache cleared"""
+    pipeline = AssetPipeline(str(static_dir))
+    monkeypatch.setattr(static_assets, '_pipeline', pipeline)
+    monkeypatch.setattr(app_module, '_pages', {})
+    return pipeline
+
+def test_index_page_loads_mermaid_from_the_cdn_until_vendored(pipeline, static_dir, bundle, monkeypatch):
+    client = app.test_client()
+    page = client.get('/').get_data(as_text=True)
+    assert f'<script src="{MERMAID_DOWNLOAD_URL}"></script>' in page
+
+    vendor_mermaid(bundle, str(static_dir))
+    pipeline.reload()
+    monkeypatch.setattr(app_module, '_pages', {})
+    page = client.get('/').get_data(as_text=True)
+    script = re.search(r'<script src="(/assets/vendor/mermaid\.min\.[0-9a-f]{12}\.js)"></script>', page)
+    assert script and MERMAID_DOWNLOAD_URL not in page
+
+    response = client.get(script.group(1))
+    assert response.status_code == 200 and response.get_data() == BUNDLE
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert client.get(script.group(1), headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_assets_route_negotiates_encodings(pipeline):
+    client = app.test_client()
+    url = get_asset_pipeline().url('assets/style.css')
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in response.vary
+    plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+    assert response.headers['ETag'] != plain.headers['ETag']
+    assert client.get('/assets/assets/style.000000000000.css').status_code == 404
+
+def test_mermaid_url_of_the_repository_never_404s():
+    url = AssetPipeline().url(MERMAID_PATH)
+    assert url == MERMAID_DOWNLOAD_URL or url.startswith('/assets/vendor/mermaid.min.')
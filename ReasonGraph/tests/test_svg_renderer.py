@@ -0,0 +1,133 @@
+"""Server-side SVG rendering of diagrams with a stand-in for the Mermaid CLI"""
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+import svg_renderer
+from app import app
+from configs import config
+from svg_renderer import SVGRenderer, get_svg_renderer, mermaid_code
+
+# Writes an SVG of the diagram code, logging every run; "FAIL" in the code fails, "SLOW" sleeps
+FAKE_MMDC = '''#!{python}
+import sys, time
+args = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+with open(args["-i"]) as f:
+    code = f.read()
+with open({log!r}, "a") as f:
+    f.write("run\\n")
+if "FAIL" in code:
+    sys.stderr.write("Parse error on line 1")
+    sys.exit(1)
+if "SLOW" in code:
+    time.sleep(float(code.split("SLOW", 1)[1].split()[0]))
+with open(args["-o"], "w") as f:
+    f.write("<svg>" + code.replace("\\n", " ") + "</svg>")
+'''
+
+DIAGRAM = 'graph TD\n    A["Start"] --> B["End"]'
+
+@pytest.fixture
+def mmdc(tmp_path):
+    """Path of the fake CLI; mmdc.runs() counts its runs"""
+    log = tmp_path / 'runs.log'
+    path = tmp_path / 'mmdc'
+    path.write_text(FAKE_MMDC.format(python=sys.executable, log=str(log)))
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+
+    class Command(str):
+        def runs(self):
+            return len(log.read_text().splitlines()) if log.exists() else 0
+
+    return Command(path)
+
+def test_render_runs_the_cli_once_per_diagram(mmdc):
+    renderer = SVGRenderer(command=mmdc)
+    assert renderer.available()
+    svg = renderer.render(DIAGRAM)
+    assert svg == '<svg>graph TD     A["Start"] --> B["End"]</svg>'
+    assert renderer.render(DIAGRAM) == svg
+    assert mmdc.runs() == 1 and renderer.stats()['renders'] == 1
+
+def test_page_wrapper_is_not_passed_to_the_cli(mmdc):
+    wrapped = f'<div class="mermaid">\n{DIAGRAM}\n</div>'
+    assert mermaid_code(wrapped) == DIAGRAM and mermaid_code(DIAGRAM) == DIAGRAM
+    renderer = SVGRenderer(command=mmdc)
+    assert renderer.render(wrapped) == renderer.render(DIAGRAM) == f'<svg>{DIAGRAM.replace(chr(10), " ")}</svg>'
+    assert mmdc.runs() == 1
+
+def test_key_covers_the_code_and_the_settings():
+    renderer = SVGRenderer()
+    assert renderer.key(DIAGRAM) == SVGRenderer().key(DIAGRAM)
+    assert renderer.key(DIAGRAM) != renderer.key(DIAGRAM + ' ')
+    assert renderer.key(DIAGRAM) != SVGRenderer(mermaid_config={'theme': 'dark'}).key(DIAGRAM)
+
+def test_missing_cli_leaves_rendering_to_the_browser(tmp_path):
+    renderer = SVGRenderer(command=str(tmp_path / 'no-mmdc'))
+    assert not renderer.available() and renderer.render(DIAGRAM) is None
+
+def test_cli_found_on_the_path(mmdc, monkeypatch):
+    monkeypatch.setenv('PATH', os.path.dirname(mmdc) + os.pathsep + os.environ.get('PATH', ''))
+    renderer = SVGRenderer(command='mmdc')
+    assert renderer.executable == mmdc and renderer.render(DIAGRAM).startswith('<svg>')
+
+def test_failed_or_slow_renders_are_not_cached(mmdc):
+    renderer = SVGRenderer(command=mmdc, timeout=0.5)
+    assert renderer.render('graph TD\n FAIL') is None
+    assert renderer.render('graph TD\n SLOW 2') is None
+    assert renderer.failures == 2 and renderer.renders == 0
+    assert renderer.render('graph TD\n FAIL') is None and mmdc.runs() == 3
+
+def test_disk_cache_is_shared_between_renderers(mmdc, tmp_path):
+    cache_dir = str(tmp_path / 'svg-cache')
+    svg = SVGRenderer(command=mmdc, cache_dir=cache_dir).render(DIAGRAM)
+    assert os.listdir(cache_dir) == [f'{SVGRenderer().key(DIAGRAM)}.svg']
+
+    other = SVGRenderer(command=mmdc, cache_dir=cache_dir)
+    assert other.render(DIAGRAM) == svg
+    assert other.disk_hits == 1 and mmdc.runs() == 1
+    other.clear()
+    assert other.render(DIAGRAM) == svg and other.disk_hits == 2
+
+def test_concurrent_requests_share_one_render(mmdc):
+    renderer = SVGRenderer(command=mmdc)
+    code = 'graph TD\n SLOW 0.3'
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(renderer.render(code))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 4 and len(set(results)) == 1 and results[0].startswith('<svg>')
+    assert mmdc.runs() == 1
+
+@pytest.fixture
+def app_renderer(mmdc, monkeypatch):
+    renderer = SVGRenderer(command=mmdc)
+    monkeypatch.setattr(svg_renderer, '_renderer', renderer)
+    monkeypatch.setattr(config.general, 'svg_min_lines', 15)
+    return renderer
+
+def test_render_route_returns_svg_for_large_diagrams(app_renderer):
+    client = app.test_client()
+    raw_output = ''.join(f'<step number="{n}">Step {n}</step>' for n in range(1, 9)) + '<answer>4</answer>'
+    data = client.post('/render', json={'raw_output': raw_output, 'render': 'svg'}).get_json()
+    assert data['success'] and data['svg'].startswith('<svg>graph TD')
+    assert get_svg_renderer() is app_renderer and app_renderer.renders == 1
+
+    # Small diagrams, and requests without render=svg, are left to the browser
+    data = client.post('/render', json={'raw_output': '<step number="1">One</step>', 'render': 'svg'}).get_json()
+    assert data['success'] and data['svg'] is None
+    data = client.post('/render', json={'raw_output': raw_output}).get_json()
+    assert data['svg'] is None and app_renderer.renders == 1
+
+def test_reset_recreates_the_renderer_from_the_config(monkeypatch):
+    monkeypatch.setattr(config.general, 'svg_render_timeout', 12.5)
+    svg_renderer.reset_svg_renderer()
+    try:
+        assert get_svg_renderer().timeout == 12.5
+    finally:
+        svg_renderer.reset_svg_renderer()
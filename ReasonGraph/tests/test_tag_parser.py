@@ -0,0 +1,239 @@
+"""
+The tag tokenizer and the method parsers built on it, checked against the
+regex parsers they replaced on well-formed responses.
+"""
+import re
+from collections import Counter
+from dataclasses import asdict
+
+import pytest
+
+from bs_reasoning import parse_bs_response
+from cot_reasoning import parse_cot_response
+from l2m_reasoning import parse_l2m_response
+from selfconsistency_reasoning import parse_scr_response
+from selfrefine_reasoning import parse_selfrefine_response
+from tag_parser import ElementEvent, TagTokenizer, TextEvent, iter_elements, tokenize
+from tot_reasoning import parse_tot_response
+
+COT = '''Let me think.
+<step number="2">
+Then add 3 < 5 to it.
+</step>
+<step number="1">
+Start from <br> the beginning.
+</step>
+<answer>
+8
+</answer>'''
+
+TOT = '''<node id="root">
+Approach the problem
+</node>
+<node id="node1" parent="root">
+Try factoring
+</node>
+<node id="node2" parent="root">
+Try substitution
+</node>
+<node id="node1.1" parent="node1">
+Factor into primes
+</node>
+<answer>
+Factor into primes, so the answer is 6.
+</answer>'''
+
+BS = '''<node id="root" score="0.90">
+Start
+</node>
+<node id="node1" parent="root" score="0.80" path_score="1.70">
+Left branch
+</node>
+<node id="node2" parent="root" score="0.40" path_score="1.30">
+Right branch
+</node>
+<node id="result1" parent="node1" score="0.70" path_score="2.40">
+Left result
+</node>
+<node id="result2" parent="node2" score="0.90" path_score="2.20">
+Right result
+</node>
+<answer>
+Best path (path_score: 2.40):
+Left result
+</answer>'''
+
+L2M = '''<step number="1">
+<question>What is 2 + 2?</question>
+<reasoning>Count up.</reasoning>
+<answer>4</answer>
+</step>
+<step number="2">
+<question>What is 4 * 2?</question>
+<reasoning>Double it.</reasoning>
+<answer>8</answer>
+</step>
+<final_answer>
+8
+</final_answer>'''
+
+SCR = '''Path 1:
+<step number="1">
+Add first.
+</step>
+<answer>
+8
+</answer>
+Path 2:
+<step number="1">
+Multiply first.
+</step>
+<answer>
+10
+</answer>
+Path 3:
+<step number="1">
+Add again.
+</step>
+<answer>
+8
+</answer>'''
+
+SRF = '''<step number="1">
+Guess 7.
+</step>
+<answer>
+7
+</answer>
+<revision_check>
+The guess ignores the carry.
+</revision_check>
+<revised_step number="2" revises="1">
+Carry the one: 8.
+</revised_step>
+<revised_answer>
+8
+</revised_answer>'''
+
+# The regex parsers the tokenizer replaced, reduced to the fields they extracted
+
+def _match(pattern, text):
+    match = re.search(pattern, text, re.DOTALL)
+    return match.group(1).strip() if match else None
+
+def _steps(text):
+    steps = [(int(number), content.strip())
+             for number, content in re.findall(r'<step number="(\d+)">\s*(.*?)\s*</step>', text, re.DOTALL)]
+    return sorted(steps)
+
+def regex_cot(text):
+    return _steps(text), _match(r'<answer>\s*(.*?)\s*</answer>', text)
+
+def regex_tree(text, pattern):
+    return [tuple(group.strip() if group else None for group in match)
+            for match in re.findall(pattern, text, re.DOTALL)]
+
+def regex_l2m(text):
+    pattern = (r'<step number="(\d+)">\s*<question>(.*?)</question>\s*<reasoning>(.*?)</reasoning>'
+               r'\s*<answer>(.*?)</answer>\s*</step>')
+    steps = sorted((int(number), question.strip(), reasoning.strip(), answer.strip())
+                   for number, question, reasoning, answer in re.findall(pattern, text, re.DOTALL))
+    return steps, _match(r'<final_answer>\s*(.*?)\s*</final_answer>', text)
+
+def regex_scr(text):
+    paths = []
+    for path_id, content in re.findall(r'Path\s+(\d+):(.*?)(?=Path\s+\d+:|$)', text, re.DOTALL):
+        paths.append((int(path_id), _steps(content), _match(r'<answer>\s*(.*?)\s*</answer>', content)))
+    return paths, Counter(answer for _, _, answer in paths if answer)
+
+def regex_srf(text):
+    revised = [(int(number), int(revises), content.strip()) for number, revises, content in re.findall(
+        r'<revised_step number="(\d+)" revises="(\d+)">\s*(.*?)\s*</revised_step>', text, re.DOTALL)]
+    return (_steps(text), _match(r'<answer>\s*(.*?)\s*</answer>', text),
+            _match(r'<revision_check>\s*(.*?)\s*</revision_check>', text), revised,
+            _match(r'<revised_answer>\s*(.*?)\s*</revised_answer>', text))
+
+def _tree_nodes(root):
+    nodes, stack = [], [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node.children))
+    return nodes
+
+def test_cot_matches_regex_parser():
+    response = parse_cot_response(COT, 'Q')
+    steps, answer = regex_cot(COT)
+    assert [(step.number, step.content) for step in response.steps] == steps
+    assert response.answer == answer
+
+def test_tot_matches_regex_parser():
+    response = parse_tot_response(TOT, 'Q')
+    expected = regex_tree(TOT, r'<node id="([^"]+)"(?:\s+parent="([^"]+)")?\s*>\s*(.*?)\s*</node>')
+    nodes = sorted((node.id, node.parent_id, node.content) for node in _tree_nodes(response.root))
+    assert nodes == sorted(expected)
+    assert response.answer == _match(r'<answer>\s*(.*?)\s*</answer>', TOT)
+    # The regex parser marked every node whose content the answer contains
+    assert {node.id for node in _tree_nodes(response.root) if node.is_answer} == {'node1.1'}
+
+def test_bs_matches_regex_parser():
+    response = parse_bs_response(BS, 'Q')
+    pattern = (r'<node id="([^"]+)"(?:\s+parent="([^"]+)")?\s*score="([^"]+)"'
+               r'(?:\s+path_score="([^"]+)")?\s*>\s*(.*?)\s*</node>')
+    expected = [(node_id, parent_id, float(score), float(path_score) if path_score else None, content)
+                for node_id, parent_id, score, path_score, content in regex_tree(BS, pattern)]
+    nodes = [(node.id, node.parent_id, node.score, node.path_score, node.content)
+             for node in _tree_nodes(response.root)]
+    assert sorted(nodes, key=str) == sorted(expected, key=str)
+    assert [node.id for node in response.result_nodes] == ['result1', 'result2']
+    assert response.best_score == 2.40
+    assert response.answer == 'Left result'
+    assert {node.id for node in _tree_nodes(response.root) if node.is_best_path} == {'root', 'node1', 'result1'}
+
+def test_l2m_matches_regex_parser():
+    response = parse_l2m_response(L2M, 'Q')
+    steps, final_answer = regex_l2m(L2M)
+    assert [(step.number, step.question, step.reasoning, step.answer) for step in response.steps] == steps
+    assert response.final_answer == final_answer
+
+def test_scr_matches_regex_parser():
+    response = parse_scr_response(SCR, 'Q')
+    paths, votes = regex_scr(SCR)
+    assert [(path.path_id, [(step.number, step.content) for step in path.steps], path.answer)
+            for path in response.paths] == paths
+    assert response.vote_counts == dict(votes)
+    assert response.final_answer == '8'
+
+def test_selfrefine_matches_regex_parser():
+    response = parse_selfrefine_response(SRF, 'Q')
+    steps, answer, revision_check, revised, revised_answer = regex_srf(SRF)
+    assert [(step.number, step.content) for step in response.steps if not step.is_revised] == steps
+    assert [(step.number, step.revision_of, step.content) for step in response.steps if step.is_revised] == revised
+    assert (response.answer, response.revision_check, response.revised_answer) == (answer, revision_check, revised_answer)
+
+@pytest.mark.parametrize('text', [COT, TOT, BS, L2M, SCR, SRF])
+@pytest.mark.parametrize('chunk_size', [1, 3, 17])
+def test_chunked_feed_matches_single_pass(text, chunk_size):
+    tokenizer = TagTokenizer()
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events.extend(tokenizer.feed(text[start:start + chunk_size]))
+    events.extend(tokenizer.close())
+    elements = [asdict(event.element) for event in events if isinstance(event, ElementEvent)]
+    assert elements == [asdict(element) for element in iter_elements(text)]
+    text_of = lambda evs: ''.join(event.text for event in evs if isinstance(event, TextEvent))
+    assert text_of(events) == text_of(tokenize(text))
+
+def test_attributes_in_any_order():
+    text = '<node parent="root" score="0.5" id="node1" path_score="1.5">\nStep\n</node>'
+    [element] = iter_elements(text)
+    assert element.attrs == {'id': 'node1', 'parent': 'root', 'score': '0.5', 'path_score': '1.5'}
+    assert element.content == 'Step'
+
+def test_non_vocabulary_tags_are_text():
+    [element] = iter_elements('<step number="1">if a < b then <br> swap</step>')
+    assert element.content == 'if a < b then <br> swap'
+
+def test_malformed_score_is_none():
+    [element] = iter_elements('<node id="n" score="high">x</node>')
+    assert element.float_attr('score') is None
@@ -0,0 +1,48 @@
+"""wrap_text's early-exit wrapping against textwrap over the whole text"""
+import random
+import textwrap
+
+import pytest
+
+from cot_reasoning import VisualizationConfig, wrap_text as cot_wrap_text
+from text_wrap import wrap_lines, wrap_text
+
+def full_wrap_text(text: str, max_chars: int = 40, max_lines: int = 4, suffix: str = '...') -> str:
+    """The wrap_text of the ToT and BS builders before the rewrite"""
+    text = text.replace('\n', ' ').replace('"', "'")
+    wrapped_lines = textwrap.wrap(text, width=max_chars)
+    if len(wrapped_lines) > max_lines:
+        wrapped_lines = wrapped_lines[:max_lines]
+        wrapped_lines[-1] = wrapped_lines[-1][:max_chars - len(suffix)] + suffix
+    return '<br>'.join(wrapped_lines)
+
+def make_text(words: int, rng: random.Random) -> str:
+    vocabulary = ['the', 'answer', 'is', 'therefore', 'consider', 'well-known', 'step', '42', 'a',
+                  'so', 'supercalifragilisticexpialidocious-and-then-some', 'x' * 90, '"quoted"', 'line\nbreak']
+    return ' '.join(rng.choice(vocabulary) for _ in range(words))
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('max_chars,max_lines', [(40, 4), (10, 1), (25, 3), (80, 10)])
+def test_matches_full_wrap(seed, max_chars, max_lines):
+    rng = random.Random(seed)
+    text = make_text(rng.choice([0, 1, 5, 30, 300, 3000]), rng)
+    assert wrap_text.__wrapped__(text, max_chars, max_lines) == full_wrap_text(text, max_chars, max_lines)
+
+def test_wrap_lines_are_exact_prefix():
+    text = make_text(2000, random.Random(1)).replace('\n', ' ')
+    assert wrap_lines(text, 30, 5) == textwrap.wrap(text, width=30)[:6]
+
+def test_short_text_is_not_truncated():
+    assert wrap_text('Two words') == 'Two words'
+    assert wrap_text('') == ''
+
+def test_memoized():
+    wrap_text.cache_clear()
+    text = make_text(500, random.Random(2))
+    assert wrap_text(text) == wrap_text(text)
+    assert wrap_text.cache_info().hits == 1
+
+def test_cot_wrapper_uses_config():
+    config = VisualizationConfig(max_chars_per_line=20, max_lines=2)
+    text = make_text(100, random.Random(3))
+    assert cot_wrap_text(text, config) == full_wrap_text(text, 20, 2)
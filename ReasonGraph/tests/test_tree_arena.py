@@ -0,0 +1,60 @@
+"""TreeArena storage and the tree parsers built on it"""
+from bs_reasoning import BSArena, to_bs_response
+from tree_arena import FINAL, MARKED, NO_NODE, TreeArena
+
+def make_arena(parent_ids):
+    arena = TreeArena()
+    for number, parent_id in enumerate(parent_ids):
+        arena.add(f'n{number}', f'content {number}', parent_id)
+    return arena, arena.link()
+
+def test_link_keeps_child_order():
+    arena, root = make_arena([None, 'n0', 'n0', 'n1', 'n0'])
+    assert root == 0
+    assert list(arena.children(0)) == [1, 2, 4]
+    assert list(arena.children(1)) == [3]
+    assert arena.is_leaf(3) and not arena.is_leaf(1)
+    assert list(arena.ancestors(3)) == [3, 1, 0]
+
+def test_unknown_parent_stays_unlinked():
+    arena, root = make_arena([None, 'missing'])
+    assert arena.parents[1] == NO_NODE
+    assert list(arena.children(root)) == []
+
+def test_repeated_id_replaces_fields_and_keeps_index():
+    arena = TreeArena()
+    first = arena.add('a', 'old', score=0.1)
+    assert arena.add('a', 'new', score=0.7) == first
+    assert len(arena) == 1
+    assert arena.contents[first] == 'new'
+    assert arena.score(first) == 0.7
+    assert arena.path_score(first) is None
+
+def test_ancestors_stop_on_parent_cycle():
+    arena, _ = make_arena(['n1', 'n0'])
+    assert len(list(arena.ancestors(0))) == len(arena)
+
+def test_mark_path_and_clear_flag():
+    arena, _ = make_arena([None, 'n0', 'n1', 'n0'])
+    arena.set_flag(3, FINAL)
+    arena.mark_path(2, MARKED)
+    assert [arena.has_flag(index, MARKED) for index in range(4)] == [True, True, True, False]
+    arena.clear_flag(MARKED)
+    assert not any(arena.has_flag(index, MARKED) for index in range(4))
+    assert arena.has_flag(3, FINAL)
+
+def test_convert_deep_chain_without_recursion():
+    depth = 20000
+    arena, root = make_arena([None] + [f'n{number}' for number in range(depth - 1)])
+    converted = arena.convert(root, lambda index, children: (arena.ids[index], children))
+    for _ in range(depth - 1):
+        converted = converted[1][0]
+    assert converted == (f'n{depth - 1}', [])
+
+def test_result_nodes_outside_the_tree_are_converted():
+    arena = TreeArena()
+    root = arena.add('root', 'A', score=0.5)
+    arena.add('result9', 'orphan', 'missing', score=0.1)
+    arena.link()
+    response = to_bs_response(BSArena(arena=arena, root=root), 'Q')
+    assert [node.content for node in response.result_nodes] == ['orphan']
@@ -0,0 +1,77 @@
+"""TreeSearchEngine snapshots, checked against a fresh conversion of the arena"""
+import hashlib
+import random
+from dataclasses import asdict
+
+import pytest
+
+from bs_reasoning import BSArena, BSNode, BSResponse, parse_bs_response, to_bs_response
+from configs import TreeSearchConfig
+from tot_reasoning import ToTNode, ToTResponse
+from tree_arena import MARKED
+from tree_search import TreeSearchEngine, serialize_tree
+
+def generate(prompt: str, max_tokens: int) -> str:
+    """Deterministic proposals per prompt, some of them final"""
+    rng = random.Random(hashlib.md5(prompt.encode()).hexdigest())
+    nodes = []
+    for _ in range(rng.randint(1, 3)):
+        final = ' final="true"' if rng.random() < 0.2 else ''
+        nodes.append(f'<node score="{rng.random():.2f}"{final}>step {rng.randint(0, 99)}</node>')
+    return '\n'.join(nodes)
+
+def reference(engine: TreeSearchEngine, snapshot):
+    """The snapshot converted from scratch, from the arena"""
+    return to_bs_response(BSArena(arena=engine.arena, root=engine.root, answer=snapshot.answer,
+                                  best_score=snapshot.best_score), engine.question)
+
+def tot_reference(snapshot):
+    """The snapshot converted from scratch to a ToT response; the best leaf is the answer node"""
+    def convert(node):
+        return ToTNode(
+            id=node.id,
+            content=node.content,
+            parent_id=node.parent_id,
+            children=[convert(child) for child in node.children],
+            is_answer=snapshot.answer is not None and node.is_best_path and not node.children
+        )
+
+    return ToTResponse(question=snapshot.question, root=convert(snapshot.root), answer=snapshot.answer)
+
+@pytest.mark.parametrize('max_depth,beam_width', [(1, 1), (2, 2), (3, 2), (4, 3)])
+def test_snapshots_match_fresh_conversion(max_depth, beam_width):
+    config = TreeSearchConfig(max_depth=max_depth, beam_width=beam_width, branching=3, max_workers=1)
+    engine = TreeSearchEngine(generate, 'Q?', config)
+    snapshots = 0
+    for snapshot in engine.run():
+        snapshots += 1
+        # Snapshots share their nodes with the engine, so they are compared before it resumes
+        assert asdict(snapshot) == asdict(reference(engine, snapshot))
+        assert asdict(engine.tot_response(snapshot)) == asdict(tot_reference(snapshot))
+    assert snapshots > 1
+    assert snapshot.answer is not None
+    best = [index for index in range(len(engine.arena)) if engine.arena.has_flag(index, MARKED)]
+    assert engine.arena.ids[best[0]] == 'root'
+
+def test_serialized_tree_round_trips():
+    engine = TreeSearchEngine(generate, 'Q?', TreeSearchConfig(max_depth=3, beam_width=2, branching=3, max_workers=1))
+    for snapshot in engine.run():
+        pass
+    parsed = parse_bs_response(serialize_tree(snapshot), 'Q?')
+    assert parsed.answer == snapshot.answer
+    # Serialized depth-first, so the order of the result nodes may differ
+    assert {node.id for node in parsed.result_nodes} == {node.id for node in snapshot.result_nodes}
+
+def test_serialize_deep_tree():
+    root = node = BSNode(id='root', content='step 0', score=1.0)
+    for depth in range(1, 5000):
+        child = BSNode(id=f'node{depth}', content=f'step {depth}', score=0.5, parent_id=node.id)
+        node.children.append(child)
+        node = child
+    lines = serialize_tree(BSResponse(question='Q?', root=root), 'tot').split('\n')
+    assert lines[0] == '<node id="root">' and lines[-4] == '<node id="node4999" parent="node4998">'
+
+def test_budget_too_small():
+    engine = TreeSearchEngine(generate, 'Q?', TreeSearchConfig(token_budget=1, node_max_tokens=2))
+    with pytest.raises(ValueError):
+        list(engine.run())
@@ -0,0 +1,59 @@
+"""
+Text wrapping for diagram node boxes.
+
+Every diagram builder wraps node text to at most max_lines lines of
+max_chars characters, joined with <br>, and marks cut-off text with a
+truncation suffix on the last line. Only those first lines are computed:
+textwrap runs on a growing prefix of the text until it yields more lines
+than are kept, instead of on the whole text. Results are memoized, since
+the question and repeated answers are wrapped many times per diagram.
+"""
+import textwrap
+from functools import lru_cache
+from typing import List
+
+# Wrapped texts memoized per (text, max_chars, max_lines, suffix)
+CACHE_SIZE = 4096
+
+def _clean(text: str) -> str:
+    """Newlines and double quotes would break a Mermaid node label"""
+    return text.replace('\n', ' ').replace('"', "'")
+
+def wrap_lines(text: str, max_chars: int, max_lines: int) -> List[str]:
+    """
+    The first max_lines + 1 lines textwrap.wrap() makes of the text, or all of them if fewer.
+
+    Lines are exact: a prefix of the text is wrapped, and only lines that
+    end before the last two lines of its wrapping are used, since those
+    two can depend on the text after the prefix (a word cut in half, a
+    hyphenation lookahead). The prefix doubles until enough lines are exact.
+    """
+    wanted = max_lines + 1
+    length = (max_lines + 2) * (max_chars + 1)
+    while length < len(text):
+        lines = textwrap.wrap(text[:length], width=max_chars)
+        if len(lines) >= wanted + 2:
+            return lines[:wanted]
+        length *= 2
+    return textwrap.wrap(text, width=max_chars)[:wanted]
+
+@lru_cache(maxsize=CACHE_SIZE)
+def wrap_text(text: str, max_chars: int = 40, max_lines: int = 4, suffix: str = '...') -> str:
+    """
+    Wrap text to fit within box constraints with proper line breaks.
+
+    Args:
+        text: The text to wrap
+        max_chars: Maximum characters per line
+        max_lines: Maximum number of lines; longer text is cut off
+        suffix: Appended to the last line when the text is cut off
+
+    Returns:
+        Wrapped text with <br> line breaks
+    """
+    lines = wrap_lines(_clean(text), max_chars, max(max_lines, 1))
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        if lines:
+            lines[-1] = lines[-1][:max_chars - len(suffix)] + suffix
+    return '<br>'.join(lines)
@@ -1,10 +1,12 @@
 from dataclasses import dataclass
-from typing import List, Optional
-import re
-import textwrap
-from cot_reasoning import VisualizationConfig, AnthropicAPI
+from typing import Iterator, List, Optional, TextIO, Tuple
+import io
+from cot_reasoning import VisualizationConfig, wrap_text, AnthropicAPI, write_lines
+from substring_matcher import SubstringMatcher
+from tag_parser import iter_elements
+from tree_arena import MARKED, NO_NODE, TreeArena
 
-@dataclass
+@dataclass(slots=True)
 class ToTNode:
     """Data class representing a node in the Tree of Thoughts"""
     id: str
@@ -24,114 +26,141 @@ class ToTResponse:
     root: ToTNode
     answer: Optional[str] = None
 
-def parse_tot_response(response_text: str, question: str) -> ToTResponse:
-    """Parse ToT response text to extract nodes and build the tree"""
-    # Parse nodes
-    node_pattern = r'<node id="([^"]+)"(?:\s+parent="([^"]+)")?\s*>\s*(.*?)\s*</node>'
-    nodes_dict = {}
+# Candidates from which one Aho-Corasick scan beats a (C speed) substring search per candidate
+MATCHER_MIN_CANDIDATES = 128
+
+def find_answer_nodes(contents: List[str], answer: str) -> Iterator[int]:
+    """
+    Indices of the node contents that occur in the answer text.
+
+    A content can only occur if its inner words (all but the first and last,
+    which may be cut off) are words of the answer, so a set lookup per word
+    rules out most nodes first. Few remaining candidates are searched for one
+    by one; many are found with one Aho-Corasick scan of the answer (see
+    substring_matcher), in O(candidate length + answer length) rather than
+    O(candidates x answer length).
+    """
+    stripped_answer = answer.strip()
+    answer_words = set(stripped_answer.split())
+    candidates = []
+    for index, content in enumerate(contents):
+        words = content.split()
+        if len(words) <= 2 or answer_words.issuperset(words[1:-1]):
+            candidates.append(index)
+
+    if len(candidates) < MATCHER_MIN_CANDIDATES:
+        for index in candidates:
+            if contents[index].strip() in stripped_answer:
+                yield index
+        return
+    matcher = SubstringMatcher(contents[index].strip() for index in candidates)
+    for position in matcher.occurring(stripped_answer):
+        yield candidates[position]
+
+def parse_tot_arena(response_text: str) -> Tuple[TreeArena, int, Optional[str]]:
+    """Parse ToT response text into (arena, root index, answer); answer nodes are MARKED"""
+    arena = TreeArena()
+    answer = None
     
-    # First pass: create all nodes
-    for match in re.finditer(node_pattern, response_text, re.DOTALL):
-        node_id = match.group(1)
-        parent_id = match.group(2)
-        content = match.group(3).strip()
-        
-        node = ToTNode(id=node_id, content=content, parent_id=parent_id)
-        nodes_dict[node_id] = node
+    # First pass: store all nodes and find the answer
+    for element in iter_elements(response_text):
+        if element.name == 'node':
+            node_id = element.attrs.get('id')
+            if node_id:
+                arena.add(node_id, element.content, element.attrs.get('parent'))
+        elif element.name == 'answer' and answer is None:
+            answer = element.content
 
     # Second pass: build tree relationships
-    root = None
-    for node in nodes_dict.values():
-        if node.parent_id is None:
-            root = node
-        else:
-            parent = nodes_dict.get(node.parent_id)
-            if parent:
-                parent.children.append(node)
-
-    # Parse answer if present
-    answer_pattern = r'<answer>\s*(.*?)\s*</answer>'
-    answer_match = re.search(answer_pattern, response_text, re.DOTALL)
-    answer = answer_match.group(1).strip() if answer_match else None
-    
+    root = arena.link()
+
     if answer:
         # Mark the node leading to the answer
-        for node in nodes_dict.values():
-            if node.content.strip() in answer.strip():
-                node.is_answer = True
+        for index in find_answer_nodes(arena.contents, answer):
+            arena.set_flag(index, MARKED)
 
-    return ToTResponse(question=question, root=root, answer=answer)
+    return arena, root, answer
 
-def create_mermaid_diagram(tot_response: ToTResponse, config: VisualizationConfig) -> str:
-    """Convert ToT response to Mermaid diagram"""
-    diagram = ['<div class="mermaid">', 'graph TD']
+def arena_to_tot_node(arena: TreeArena, index: int) -> ToTNode:
+    """Convert the subtree of an arena node to ToTNode objects"""
+    return arena.convert(index, lambda node, children: ToTNode(
+        id=arena.ids[node],
+        content=arena.contents[node],
+        parent_id=arena.parent_ids[node],
+        children=children,
+        is_answer=arena.has_flag(node, MARKED)
+    ))
+
+def parse_tot_response(response_text: str, question: str) -> ToTResponse:
+    """Parse ToT response text to extract nodes and build the tree"""
+    arena, root, answer = parse_tot_arena(response_text)
+    return ToTResponse(
+        question=question,
+        root=arena_to_tot_node(arena, root) if root != NO_NODE else None,
+        answer=answer
+    )
+
+def iter_mermaid_lines(tot_response: ToTResponse, config: VisualizationConfig) -> Iterator[str]:
+    """Generate the lines of the Mermaid diagram of a ToT response"""
+    yield '<div class="mermaid">'
+    yield 'graph TD'
     
     # Add question node
     question_content = wrap_text(tot_response.question, config)
-    diagram.append(f'    Q["{question_content}"]')
+    yield f'    Q["{question_content}"]'
     
     # Track leaf nodes for connecting to answer
     leaf_nodes = []
     
-    def add_node_and_children(node: ToTNode, parent_id: Optional[str] = None):
-        content = wrap_text(node.content, config)
-        node_style = 'answer' if node.is_answer else 'default'
-        
-        # Add node
-        diagram.append(f'    {node.id}["{content}"]')
-        
-        # Add connection from parent
-        if parent_id:
-            diagram.append(f'    {parent_id} --> {node.id}')
-        
-        # Process children
-        if node.children:
-            for child in node.children:
-                add_node_and_children(child, node.id)
-        else:
-            # This is a leaf node
-            leaf_nodes.append(node.id)
-    
-    # Build tree structure
+    # Build tree structure depth-first with an explicit stack, so deep trees need no recursion
     if tot_response.root:
-        diagram.append(f'    Q --> {tot_response.root.id}')
-        add_node_and_children(tot_response.root)
+        yield f'    Q --> {tot_response.root.id}'
+        stack = [(tot_response.root, None)]
+        while stack:
+            node, parent_id = stack.pop()
+            content = wrap_text(node.content, config)
+            
+            # Add node
+            yield f'    {node.id}["{content}"]'
+            
+            # Add connection from parent
+            if parent_id:
+                yield f'    {parent_id} --> {node.id}'
+            
+            # Process children, first child on top
+            if node.children:
+                stack.extend((child, node.id) for child in reversed(node.children))
+            else:
+                # This is a leaf node
+                leaf_nodes.append(node.id)
     
     # Add final answer node if answer exists
     if tot_response.answer:
         answer_content = wrap_text(tot_response.answer, config)
-        diagram.append(f'    Answer["{answer_content}"]')
+        yield f'    Answer["{answer_content}"]'
         # Connect all leaf nodes to the answer
         for leaf_id in leaf_nodes:
-            diagram.append(f'    {leaf_id} --> Answer')
-        diagram.append('    class Answer final_answer;')
+            yield f'    {leaf_id} --> Answer'
+        yield '    class Answer final_answer;'
     
     # Add styles
-    diagram.extend([
+    yield from [
         '    classDef default fill:#f9f9f9,stroke:#333,stroke-width:2px;',
         '    classDef question fill:#e3f2fd,stroke:#1976d2,stroke-width:2px;',
         '    classDef answer fill:#d4edda,stroke:#28a745,stroke-width:2px;',
         '    classDef final_answer fill:#d4edda,stroke:#28a745,stroke-width:2px;',
         '    class Q question;',
         '    linkStyle default stroke:#666,stroke-width:2px;'
-    ])
+    ]
     
-    diagram.append('</div>')
-    return '\n'.join(diagram)
+    yield '</div>'
 
-def wrap_text(text: str, config: VisualizationConfig) -> str:
-    """Wrap text to fit within box constraints"""
-    text = text.replace('\n', ' ').replace('"', "'")
-    wrapped_lines = textwrap.wrap(text, width=config.max_chars_per_line)
-    
-    if len(wrapped_lines) > config.max_lines:
-        # Option 1: Simply truncate and add ellipsis to the last line
-        wrapped_lines = wrapped_lines[:config.max_lines]
-        wrapped_lines[-1] = wrapped_lines[-1][:config.max_chars_per_line-3] + "..."
-        
-        # Option 2 (alternative): Include part of the next line to show continuity
-        # original_next_line = wrapped_lines[config.max_lines] if len(wrapped_lines) > config.max_lines else ""
-        # wrapped_lines = wrapped_lines[:config.max_lines-1]
-        # wrapped_lines.append(original_next_line[:config.max_chars_per_line-3] + "...")
-    
-    return "<br>".join(wrapped_lines)
\ No newline at end of file
+def write_mermaid_diagram(tot_response: ToTResponse, config: VisualizationConfig, out: TextIO) -> None:
+    """Write the Mermaid diagram of a ToT response to a text buffer, line by line"""
+    write_lines(iter_mermaid_lines(tot_response, config), out)
+
+def create_mermaid_diagram(tot_response: ToTResponse, config: VisualizationConfig) -> str:
+    """Convert ToT response to Mermaid diagram"""
+    out = io.StringIO()
+    write_mermaid_diagram(tot_response, config, out)
+    return out.getvalue()
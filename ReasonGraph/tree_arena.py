@@ -0,0 +1,181 @@
+"""
+Struct-of-arrays storage for reasoning trees.
+
+A TreeArena keeps every node attribute in its own column: typed arrays for
+the links and scores, plain lists for the strings. Nodes are addressed by
+index and linked through their parent, first child and next sibling, so a
+tree of thousands of nodes costs a few machine words per node instead of
+an object with a __dict__ and a list of children. convert() builds the
+dataclass trees (ToTNode, BSNode) the renderers take.
+"""
+import math
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+
+NO_NODE = -1
+
+# Node flags
+MARKED = 1  # On the best path (Beam Search) or leading to the answer (Tree of Thoughts)
+FINAL = 2   # Proposed as a final answer, not expanded further
+
+T = TypeVar('T')
+
+class TreeArena:
+    """Index-linked tree nodes stored column-wise"""
+
+    __slots__ = ('ids', 'contents', 'parent_ids', 'parents', 'first_child', 'last_child',
+                 'next_sibling', 'scores', 'path_scores', 'flags', '_index')
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.contents: List[str] = []
+        self.parent_ids: List[Optional[str]] = []  # As named in the source, resolved by link()
+        self.parents = array('i')
+        self.first_child = array('i')
+        self.last_child = array('i')
+        self.next_sibling = array('i')
+        self.scores = array('d')  # NaN when absent
+        self.path_scores = array('d')
+        self.flags = bytearray()
+        self._index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._index
+
+    def index(self, node_id: Optional[str]) -> int:
+        """Index of a node id, NO_NODE if unknown"""
+        return self._index.get(node_id, NO_NODE)
+
+    def add(self, node_id: str, content: str, parent_id: Optional[str] = None,
+            score: Optional[float] = None, path_score: Optional[float] = None) -> int:
+        """
+        Store a node and return its index.
+
+        A node with an id that is already stored replaces the earlier one's
+        fields but keeps its index. Links are made by link() or attach().
+        """
+        score = math.nan if score is None else score
+        path_score = math.nan if path_score is None else path_score
+        index = self._index.get(node_id)
+        if index is not None:
+            self.contents[index] = content
+            self.parent_ids[index] = parent_id
+            self.scores[index] = score
+            self.path_scores[index] = path_score
+            return index
+
+        index = len(self.ids)
+        self._index[node_id] = index
+        self.ids.append(node_id)
+        self.contents.append(content)
+        self.parent_ids.append(parent_id)
+        self.parents.append(NO_NODE)
+        self.first_child.append(NO_NODE)
+        self.last_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        self.scores.append(score)
+        self.path_scores.append(path_score)
+        self.flags.append(0)
+        return index
+
+    def attach(self, index: int, parent: int) -> None:
+        """Link a node as the last child of parent"""
+        self.parents[index] = parent
+        last = self.last_child[parent]
+        if last == NO_NODE:
+            self.first_child[parent] = index
+        else:
+            self.next_sibling[last] = index
+        self.last_child[parent] = index
+
+    def link(self) -> int:
+        """
+        Link every node to its named parent, in node order.
+
+        Nodes naming an unknown parent stay unlinked. Returns the root: the
+        last node without a parent id, NO_NODE if there is none.
+        """
+        root = NO_NODE
+        for index, parent_id in enumerate(self.parent_ids):
+            if parent_id is None:
+                root = index
+                continue
+            parent = self._index.get(parent_id)
+            if parent is not None:
+                self.attach(index, parent)
+        return root
+
+    def children(self, index: int) -> Iterator[int]:
+        child = self.first_child[index]
+        while child != NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+    def is_leaf(self, index: int) -> bool:
+        return self.first_child[index] == NO_NODE
+
+    def ancestors(self, index: int) -> Iterator[int]:
+        """The node itself, then its linked ancestors up to the root"""
+        for _ in range(len(self.ids)):  # Bounded in case of a parent cycle
+            if index == NO_NODE:
+                return
+            yield index
+            index = self.parents[index]
+
+    def score(self, index: int) -> Optional[float]:
+        score = self.scores[index]
+        return None if math.isnan(score) else score
+
+    def path_score(self, index: int) -> Optional[float]:
+        score = self.path_scores[index]
+        return None if math.isnan(score) else score
+
+    def has_flag(self, index: int, flag: int) -> bool:
+        return bool(self.flags[index] & flag)
+
+    def set_flag(self, index: int, flag: int) -> None:
+        self.flags[index] |= flag
+
+    def mark_path(self, index: int, flag: int) -> None:
+        """
+        Set a flag on a node and its ancestors.
+
+        The walk stops at the first node already flagged, whose ancestors
+        were flagged by an earlier call, so marking many paths costs time
+        linear in the number of nodes overall.
+        """
+        while index != NO_NODE and not self.flags[index] & flag:
+            self.flags[index] |= flag
+            index = self.parents[index]
+
+    def clear_flag(self, flag: int) -> None:
+        """Clear a flag on every node"""
+        mask = ~flag & 0xFF
+        self.flags = bytearray(value & mask for value in self.flags)
+
+    def convert(self, index: int, make_node: Callable[[int, List[T]], T],
+                built: Optional[Dict[int, T]] = None) -> T:
+        """
+        Build an object tree below a node, children first.
+
+        make_node(index, children) creates the object of one node from the
+        objects of its children. Every created object is also recorded in
+        built, if given, by node index.
+        """
+        built = {} if built is None else built
+        order = []
+        seen = set()
+        stack = [index]
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue  # Only reachable through a parent cycle
+            seen.add(node)
+            order.append(node)
+            stack.extend(self.children(node))
+        for node in reversed(order):
+            built[node] = make_node(node, [built[child] for child in self.children(node) if child in built])
+        return built[index]
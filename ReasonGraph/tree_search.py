@@ -0,0 +1,240 @@
+"""
+Multi-call Tree of Thoughts / Beam Search engine.
+
+Instead of asking one completion to write out the whole tree, the engine
+grows it level by level: every node of the frontier is expanded by its own
+provider call, all calls of a level run concurrently, and only the best
+beam_width children (by cumulative path_score) are expanded further.
+The tree is stored in a TreeArena, mirrored node by node in BSNode objects
+as it grows, so a snapshot costs nothing to take and renders directly with
+bs_reasoning.create_mermaid_diagram, or after tot_response with the Tree of
+Thoughts one. Snapshots share those objects with the engine: each one is
+current until the engine is resumed.
+"""
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional
+
+from bs_reasoning import BSNode, BSResponse
+from tot_reasoning import ToTNode, ToTResponse
+from configs import TreeSearchConfig
+from tag_parser import iter_elements
+from tree_arena import FINAL, MARKED, NO_NODE, TreeArena
+
+logger = logging.getLogger(__name__)
+
+# generate(prompt, max_tokens) -> raw response text
+GenerateFn = Callable[[str, int], str]
+
+class TreeSearchEngine:
+    """Expand a reasoning tree with concurrent provider calls per node"""
+
+    def __init__(self, generate: GenerateFn, question: str, config: Optional[TreeSearchConfig] = None):
+        self.generate = generate
+        self.question = question
+        self.config = config or TreeSearchConfig()
+        self.arena = TreeArena()
+        self.root = NO_NODE
+        self.tokens_reserved = 0
+        # Node objects of the arena nodes, by index, kept in step with the arena
+        self._nodes: List[BSNode] = []
+        self._result_nodes: List[BSNode] = []
+        self._tot_nodes: Optional[List[ToTNode]] = None  # Built on the first tot_response()
+        self._best = NO_NODE
+
+    def run(self) -> Iterator[BSResponse]:
+        """Grow the tree, yielding a snapshot every time it changes; the last one carries the answer"""
+        config = self.config
+
+        if not self._reserve():
+            raise ValueError('Token budget is too small for a single call')
+        prompt = config.root_prompt_format.format(question=self.question)
+        root_children = self._parse_children(self.generate(prompt, config.node_max_tokens), limit=1)
+        if not root_children:
+            raise ValueError('No root node in the model response')
+        content, score, _ = root_children[0]
+        self.root = self._add_node('root', content, score, NO_NODE)
+        yield self.snapshot()
+
+        frontier = [self.root]
+        for depth in range(1, config.max_depth + 1):
+            if not frontier:
+                break
+            children = yield from self._expand_level(frontier, depth)
+            # Keep the top-k beams by cumulative score; final answers are not expanded
+            candidates = [node for node in children if not self.arena.has_flag(node, FINAL)]
+            candidates.sort(key=lambda node: self.arena.path_scores[node], reverse=True)
+            frontier = candidates[:config.beam_width]
+
+        yield self.snapshot(final=True)
+
+    def _expand_level(self, frontier: List[int], depth: int):
+        """Expand every frontier node concurrently, returning the indices of the new children"""
+        config = self.config
+        children = []
+        executor = ThreadPoolExecutor(max_workers=max(1, min(config.max_workers, len(frontier))))
+        try:
+            futures = {}
+            for node in frontier:
+                if not self._reserve():
+                    logger.info(f"Tree search token budget exhausted at depth {depth}")
+                    break
+                # Expansions run in the caller's context, e.g. its request deadline
+                futures[executor.submit(contextvars.copy_context().run, self.generate,
+                                        self._expansion_prompt(node), config.node_max_tokens)] = node
+
+            for future in as_completed(futures):
+                parent = futures[future]
+                parent_id = self.arena.ids[parent]
+                try:
+                    proposals = self._parse_children(future.result(), limit=config.branching)
+                except Exception as e:
+                    logger.warning(f"Expansion of node {parent_id} failed: {str(e)}")
+                    continue
+                parent_suffix = parent_id[len(self._id_prefix(parent_id)):]
+                for index, (content, score, final) in enumerate(proposals, 1):
+                    suffix = f'{parent_suffix}.{index}' if parent_suffix else str(index)
+                    is_leaf = final or depth == config.max_depth
+                    node_id = f"{'result' if is_leaf else 'node'}{suffix}"
+                    child = self._add_node(node_id, content, score, parent)
+                    if final:
+                        self.arena.set_flag(child, FINAL)
+                    children.append(child)
+                if proposals:
+                    yield self.snapshot()
+        finally:
+            executor.shutdown(wait=True)
+        return children
+
+    def _reserve(self) -> bool:
+        """Reserve the token allowance of one call within the total budget"""
+        if self.tokens_reserved + self.config.node_max_tokens > self.config.token_budget:
+            return False
+        self.tokens_reserved += self.config.node_max_tokens
+        return True
+
+    @staticmethod
+    def _id_prefix(node_id: str) -> str:
+        for prefix in ('root', 'result', 'node'):
+            if node_id.startswith(prefix):
+                return prefix
+        return ''
+
+    def _expansion_prompt(self, node: int) -> str:
+        path = [self.arena.contents[index] for index in self.arena.ancestors(node)]
+        steps = '\n'.join(f'{number}. {content}' for number, content in enumerate(reversed(path), 1))
+        return self.config.expansion_prompt_format.format(
+            question=self.question, path=steps, width=self.config.branching
+        )
+
+    @staticmethod
+    def _parse_children(response_text: str, limit: int) -> List[tuple]:
+        """Extract (content, score, final) of the proposed nodes"""
+        proposals = []
+        for element in iter_elements(response_text or ''):
+            if element.name != 'node' or element.depth != 0 or not element.content:
+                continue
+            score = element.float_attr('score')
+            score = min(max(score, 0.0), 1.0) if score is not None else 0.0
+            final = element.attrs.get('final', '').strip().lower() == 'true'
+            proposals.append((element.content, score, final))
+            if len(proposals) == limit:
+                break
+        return proposals
+
+    def _add_node(self, node_id: str, content: str, score: float, parent: int) -> int:
+        """Store a node below parent (NO_NODE for the root) and return its index"""
+        arena = self.arena
+        path_score = score + (arena.path_scores[parent] if parent != NO_NODE else 0.0)
+        parent_id = arena.ids[parent] if parent != NO_NODE else None
+        index = arena.add(node_id, content, parent_id, score, path_score)
+        if index < len(self._nodes):
+            # A repeated id replaces the stored node's fields, keeping its place in the tree
+            node = self._nodes[index]
+            node.content, node.score, node.path_score = content, score, arena.path_score(index)
+            if self._tot_nodes is not None:
+                self._tot_nodes[index].content = content
+            return index
+
+        if parent != NO_NODE:
+            arena.attach(index, parent)
+        node = BSNode(id=node_id, content=content, score=score, parent_id=parent_id,
+                      path_score=arena.path_score(index))
+        self._nodes.append(node)
+        if parent != NO_NODE:
+            self._nodes[parent].children.append(node)
+        if node_id.startswith('result'):
+            self._result_nodes.append(node)
+        if self._tot_nodes is not None:
+            self._add_tot_node(index)
+        return index
+
+    def _add_tot_node(self, index: int) -> None:
+        node = ToTNode(id=self.arena.ids[index], content=self.arena.contents[index],
+                       parent_id=self.arena.parent_ids[index])
+        self._tot_nodes.append(node)
+        parent = self.arena.parents[index]
+        if parent != NO_NODE:
+            self._tot_nodes[parent].children.append(node)
+
+    def snapshot(self, final: bool = False) -> BSResponse:
+        """Current tree as a BSResponse; the final one names the best leaf as answer and marks its path"""
+        arena = self.arena
+        answer = None
+        best_score = None
+
+        if final and len(arena):
+            leaves = [index for index in range(len(arena)) if arena.is_leaf(index)]
+            result_nodes = [index for index in leaves if arena.ids[index].startswith('result')]
+            best = max(result_nodes or leaves, key=lambda index: arena.path_scores[index])
+            answer = arena.contents[best]
+            best_score = arena.path_scores[best]
+            arena.mark_path(best, MARKED)
+            for index in arena.ancestors(best):
+                self._nodes[index].is_best_path = True
+            self._best = best
+
+        return BSResponse(
+            question=self.question,
+            root=self._nodes[self.root] if self.root != NO_NODE else None,
+            answer=answer,
+            best_score=best_score,
+            result_nodes=self._result_nodes
+        )
+
+    def tot_response(self, snapshot: BSResponse) -> ToTResponse:
+        """A snapshot of this engine as a Tree of Thoughts response, without converting the tree"""
+        if self._tot_nodes is None:
+            self._tot_nodes = []
+            for index in range(len(self.arena)):
+                self._add_tot_node(index)
+        if snapshot.answer is not None and self._best != NO_NODE:
+            self._tot_nodes[self._best].is_answer = True
+        root = self._tot_nodes[self.root] if self.root != NO_NODE else None
+        return ToTResponse(question=snapshot.question, root=root, answer=snapshot.answer)
+
+def serialize_tree(bs_response: BSResponse, method: str = 'bs') -> str:
+    """Write an engine tree in the tag format parse_bs_response / parse_tot_response read"""
+    lines = []
+
+    # Depth-first with an explicit stack, so deep trees cannot exhaust the recursion limit
+    stack = [bs_response.root] if bs_response.root else []
+    while stack:
+        node = stack.pop()
+        attrs = f'id="{node.id}"'
+        if node.parent_id:
+            attrs += f' parent="{node.parent_id}"'
+        if method == 'bs':
+            attrs += f' score="{node.score:.2f}"'
+            if node.id.startswith('result'):
+                attrs += f' path_score="{node.path_score:.2f}"'
+        lines.append(f'<node {attrs}>\n{node.content}\n</node>\n')
+        stack.extend(reversed(node.children))
+
+    if bs_response.answer is not None:
+        if method == 'bs':
+            lines.append(f'<answer>\nBest path (path_score: {bs_response.best_score:.2f}):\n{bs_response.answer}\n</answer>')
+        else:
+            lines.append(f'<answer>\n{bs_response.answer}\n</answer>')
+    return '\n'.join(lines)